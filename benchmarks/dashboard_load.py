@@ -0,0 +1,369 @@
+"""
+Multi-session load test for the dashboard: how many clinicians one server holds.
+
+    python -m benchmarks.dashboard_load [--max-sessions 256] [--think 5] [--duration 60]
+    python -m benchmarks.dashboard_load --sessions 8 32 --json load.json
+    python -m benchmarks.dashboard_load --sessions 8 32 --baseline load.json   # exits 1 on a >25% slowdown
+
+Each simulated session is its own AppTest of app.py (its own session state
+and widget tree) replaying a seeded interaction trace: typed number inputs,
+runs of neutrophil slider adjustments, the occasional sex or age change,
+with exponential think time between interactions.
+
+A Streamlit server runs every session's reruns on one interpreter, so
+CPU-bound reruns are effectively serialised. The harness therefore drives
+all sessions from one thread through a discrete-event queue: every rerun is
+executed and timed for real, while arrivals and think time advance a
+simulated clock, and a rerun's latency is its wait behind other sessions'
+reruns plus its own run time. (AppTest is not thread-safe, and the run takes
+far less wall time than the simulated duration when the server is idle.)
+
+Every session count runs --repeats times, each in a fresh process, and
+reports the median of rerun latency p50/p95/p99, reruns/s, server
+utilisation, CPU per rerun and per session and RSS per session (an upper
+bound: it includes AppTest's element tree). The saturation point is the
+first count whose p95 exceeds --slo-ms or whose utilisation reaches
+--max-utilisation; the count below it is the capacity, narrowed by
+bisection. With --baseline, the median CPU and wall time per rerun at each
+session count are compared as in benchmarks.suite. The baseline must have
+run the same session counts, duration, think time, seed and repeats, so
+pin the counts with --sessions; a mismatched baseline is refused.
+"""
+
+import argparse
+import heapq
+import json
+import multiprocessing
+import os
+import random
+import statistics
+import sys
+import time
+
+from benchmarks.suite import APP_PATH, compare, environment
+from benchmarks.synthetic import wide_panel
+
+# (widget label prefix, lower bound, upper bound, decimals) for typed inputs.
+NUMBER_INPUTS = (
+    ("Haemoglobin", 1.0, 20.0, 1),
+    ("MCV", 50, 140, 0),
+    ("WBC", 0.1, 100.0, 1),
+    ("Platelets", 1, 2000, 0),
+)
+PANEL_INDEX = {"Haemoglobin": 0, "MCV": 1, "WBC": 2, "Platelets": 4}
+
+# Relative frequency of each interaction in a trace.
+ACTIONS = (("type", 0.55), ("drag", 0.30), ("sex", 0.10), ("age", 0.05))
+
+DRAG_THINK_SECONDS = 0.3      # pause between successive slider adjustments
+
+
+# ──────────────────────────────────────────────
+# SESSIONS
+# ──────────────────────────────────────────────
+
+def widget(widgets, prefix):
+    return next(w for w in widgets if w.label.startswith(prefix))
+
+
+def clamp(value, low, high, decimals):
+    value = min(max(value, low), high)
+    return round(value, decimals) if decimals else int(round(value))
+
+
+class Session:
+    """One browser tab: an AppTest plus a seeded trace of interactions."""
+
+    def __init__(self, index, seed=0, think=5.0):
+        from streamlit.testing.v1 import AppTest
+
+        self.rng = random.Random(seed * 1_000_003 + index)
+        self.think = think
+        self.at = AppTest.from_file(APP_PATH, default_timeout=60)
+        self.drag = []            # remaining slider positions of a drag in progress
+
+    def run(self):
+        self.at.run()
+        if self.at.exception:
+            raise RuntimeError(f"app.py failed: {self.at.exception}")
+
+    def think_time(self):
+        mean = DRAG_THINK_SECONDS if self.drag else self.think
+        return self.rng.expovariate(1 / mean)
+
+    def interact(self):
+        """Apply the next interaction of the trace and rerun the script."""
+        at, rng = self.at, self.rng
+        if self.drag:
+            at.slider[0].set_value(self.drag.pop(0))
+            return self.run()
+
+        action = rng.choices([a for a, _ in ACTIONS], [w for _, w in ACTIONS])[0]
+        panel = wide_panel(rng)
+        if action == "type":
+            prefix, low, high, decimals = rng.choice(NUMBER_INPUTS)
+            widget(at.number_input, prefix).set_value(
+                clamp(panel[PANEL_INDEX[prefix]], low, high, decimals))
+        elif action == "drag":
+            start, target = at.slider[0].value, clamp(panel[3], 0, 100, 0)
+            steps = rng.randint(2, 5)
+            self.drag = [round(start + (target - start) * k / steps) for k in range(1, steps + 1)]
+            at.slider[0].set_value(self.drag.pop(0))
+        elif action == "sex" or not any(w.label.startswith("Age") for w in at.number_input):
+            # The age input is hidden unless age-banded profiles are loaded.
+            box = widget(at.selectbox, "Biological Sex")
+            box.set_value("Male" if box.value == "Female" else "Female")
+        else:
+            widget(at.number_input, "Age").set_value(
+                rng.choice((None, clamp(rng.uniform(0, 90), 0.0, 120.0, 0))))
+        self.run()
+
+
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+# ──────────────────────────────────────────────
+# ONE LOAD LEVEL
+# ──────────────────────────────────────────────
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else float("nan")
+
+
+def run_level(sessions, duration=60.0, think=5.0, seed=0):
+    """
+    Drive `sessions` sessions for `duration` simulated seconds.
+
+    Returns:
+        dict of latency percentiles (ms), reruns, reruns_per_sec,
+        utilisation, cpu_ms_per_rerun, wall_ms_per_rerun, core_per_session,
+        rss_per_session (bytes, over a warmed-up process), base_rss and
+        load_ms_p50 (first page load)
+    """
+    # A throwaway first load pays the one-time imports and caches.
+    Session(-1, seed, think).run()
+    base_rss = rss_bytes()
+    tabs = [Session(i, seed, think) for i in range(sessions)]
+    loads = []
+    for tab in tabs:
+        started = time.perf_counter()
+        tab.run()
+        loads.append(time.perf_counter() - started)
+    session_rss = (rss_bytes() - base_rss) / sessions
+
+    # Sessions open their first interaction at staggered times.
+    rng = random.Random(seed)
+    queue = [(rng.uniform(0, think), i) for i in range(sessions)]
+    heapq.heapify(queue)
+    free_at = busy = cpu = 0.0
+    latencies = []
+    while queue:
+        ready, i = heapq.heappop(queue)
+        if ready >= duration:
+            continue
+        start = max(ready, free_at)
+        cpu_started, started = time.process_time(), time.perf_counter()
+        tabs[i].interact()
+        service = time.perf_counter() - started
+        cpu += time.process_time() - cpu_started
+        busy += service
+        free_at = start + service
+        latencies.append(free_at - ready)
+        heapq.heappush(queue, (free_at + tabs[i].think_time(), i))
+
+    elapsed = max(duration, free_at)
+    ordered = sorted(latencies)
+    reruns = len(latencies)
+    return {
+        "sessions": sessions, "reruns": reruns, "reruns_per_sec": reruns / elapsed,
+        "p50_ms": percentile(ordered, 0.50), "p95_ms": percentile(ordered, 0.95),
+        "p99_ms": percentile(ordered, 0.99), "utilisation": busy / elapsed,
+        "cpu_ms_per_rerun": cpu / reruns * 1000 if reruns else 0.0,
+        "wall_ms_per_rerun": busy / reruns * 1000 if reruns else 0.0,
+        "core_per_session": cpu / elapsed / sessions,
+        "rss_per_session": session_rss, "base_rss": base_rss,
+        "load_ms_p50": percentile(sorted(loads), 0.50),
+    }
+
+
+def run_isolated(sessions, duration, think, seed):
+    """run_level in a fresh interpreter, so RSS and caches start clean."""
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(run_level, (sessions, duration, think, seed))
+
+
+def run_repeated(sessions, duration, think, seed, repeats):
+    """
+    run_isolated `repeats` times.
+
+    Returns:
+        dict like run_level's, each value the median over the runs, plus repeats
+    """
+    runs = [run_isolated(sessions, duration, think, seed) for _ in range(repeats)]
+    level = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    level.update(sessions=sessions, reruns=int(level["reruns"]), repeats=repeats)
+    return level
+
+
+# ──────────────────────────────────────────────
+# SWEEP
+# ──────────────────────────────────────────────
+
+def saturated(level, slo_ms, max_utilisation):
+    return level["p95_ms"] > slo_ms or level["utilisation"] >= max_utilisation
+
+
+def print_level(level):
+    print(f"  {level['sessions']:>8,} {level['reruns']:>7,} {level['reruns_per_sec']:>8.1f} "
+          f"{level['utilisation']:>6.0%} {level['p50_ms']:>8.1f} {level['p95_ms']:>8.1f} "
+          f"{level['p99_ms']:>8.1f} {level['cpu_ms_per_rerun']:>9.1f} "
+          f"{level['core_per_session']:>8.2%} {level['rss_per_session'] / 2**20:>8.2f}", flush=True)
+
+
+def sweep(counts, duration, think, seed, slo_ms, max_utilisation, refine=3, repeats=3):
+    """
+    Run each session count `repeats` times (stopping at the first saturated
+    one), then bisect between the last healthy and the first saturated count.
+
+    Returns:
+        (levels, capacity or None, first saturated count or None)
+    """
+    levels, healthy, failed = [], None, None
+    for n in counts:
+        level = run_repeated(n, duration, think, seed, repeats)
+        levels.append(level)
+        print_level(level)
+        if saturated(level, slo_ms, max_utilisation):
+            failed = n
+            break
+        healthy = n
+    low = healthy or 0
+    for _ in range(refine if failed else 0):
+        if failed - low <= 1:
+            break
+        n = (low + failed) // 2
+        level = run_repeated(n, duration, think, seed, repeats)
+        levels.append(level)
+        print_level(level)
+        if saturated(level, slo_ms, max_utilisation):
+            failed = n
+        else:
+            low = healthy = n
+    return levels, healthy, failed
+
+
+def regression_results(levels):
+    """Median per-rerun costs at each session count, in benchmarks.suite's results format."""
+    results = {}
+    for level in levels:
+        if not level["reruns"]:
+            continue
+        for key in ("cpu", "wall"):
+            results[f"dashboard_load/rerun_{key}@{level['sessions']}"] = {
+                "us_per_unit": round(level[f"{key}_ms_per_rerun"] * 1000, 3),
+                "unit": "rerun", "n": level["reruns"]}
+    return results
+
+
+def baseline_mismatch(baseline, config, levels=None):
+    """
+    Returns:
+        why `baseline` cannot be compared with this run, or None
+    """
+    for key, value in config.items():
+        if key in ("slo_ms", "max_utilisation"):
+            continue
+        if baseline["config"].get(key) != value:
+            return f"{key} is {baseline['config'].get(key)} in the baseline, {value} in this run"
+    if levels is not None:
+        old = [level["sessions"] for level in baseline["levels"]]
+        new = [level["sessions"] for level in levels]
+        if old != new:
+            return f"session counts are {old} in the baseline, {new} in this run (pin them with --sessions)"
+    return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+",
+                        help="session counts to run (default: 1, 2, 4, ... up to --max-sessions)")
+    parser.add_argument("--max-sessions", type=int, default=256)
+    parser.add_argument("--duration", type=float, default=60.0, help="simulated seconds per count")
+    parser.add_argument("--think", type=float, default=5.0,
+                        help="mean seconds between a clinician's interactions")
+    parser.add_argument("--slo-ms", type=float, default=250.0, help="p95 rerun latency target")
+    parser.add_argument("--max-utilisation", type=float, default=0.85)
+    parser.add_argument("--refine", type=int, default=3, help="bisection steps after saturation")
+    parser.add_argument("--repeats", type=int, default=3,
+                        help="runs per session count; each result is their median")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--quick", action="store_true", help="short run, for smoke tests")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against a results file from --json")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown per rerun before it counts as a regression")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.duration, args.max_sessions, args.refine = 15.0, 16, 0
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+    config = {"duration": args.duration, "think": args.think, "slo_ms": args.slo_ms,
+              "max_utilisation": args.max_utilisation, "seed": args.seed, "repeats": args.repeats}
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        why = baseline_mismatch(baseline, config)
+        if why:
+            parser.error(f"cannot compare with {args.baseline}: {why}")
+
+    counts = args.sessions or [2 ** k for k in range(args.max_sessions.bit_length())
+                               if 2 ** k <= args.max_sessions]
+    print(f"dashboard load: {args.duration:g} s simulated per count, median of {args.repeats}, "
+          f"think {args.think:g} s, SLO p95 {args.slo_ms:g} ms, "
+          f"utilisation < {args.max_utilisation:.0%}")
+    print(f"  {'sessions':>8} {'reruns':>7} {'rerun/s':>8} {'util':>6} {'p50 ms':>8} "
+          f"{'p95 ms':>8} {'p99 ms':>8} {'cpu ms/r':>9} {'core/ses':>8} {'MB/ses':>8}")
+    levels, capacity, failed = sweep(counts, args.duration, args.think, args.seed,
+                                     args.slo_ms, args.max_utilisation, args.refine, args.repeats)
+    if failed is None:
+        print(f"\nno saturation up to {counts[-1]:,} sessions")
+    else:
+        print(f"\nsaturation at {failed:,} sessions; capacity {capacity or 0:,} sessions "
+              f"at p95 <= {args.slo_ms:g} ms")
+
+    results = regression_results(levels)
+    doc = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(),
+           "config": config,
+           "capacity": capacity, "saturated_at": failed, "levels": levels, "results": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(doc, f, indent=2)
+
+    if baseline is None:
+        return 0
+    why = baseline_mismatch(baseline, config, levels)
+    if why:
+        print(f"error: cannot compare with {args.baseline}: {why}", file=sys.stderr)
+        return 2
+    print(f"\ncompared with {args.baseline} (threshold +{args.threshold:.0%}; "
+          f"capacity was {baseline.get('capacity')})")
+    regressions = 0
+    for key, old, new, ratio, regressed in compare(results, baseline["results"], args.threshold):
+        if ratio is None:
+            continue
+        regressions += regressed
+        flag = "REGRESSION" if regressed else ""
+        print(f"  {key:<44} {old:>10,.2f} -> {new:>10,.2f}  {ratio:>6.2f}x  {flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+HL7 ORU^R01 ingestion throughput, file (mmap) and MLLP paths.
+
+    python -m benchmarks.hl7_ingest [--messages 200000] [--malformed 0.01]
+
+Writes synthetic ORU^R01 messages (a CBC per message, LOINC-coded OBX
+segments, PID-8 sex) with a fraction deliberately malformed, then times
+parsing plus batched interpretation and reports messages/s on one core.
+"""
+
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import wide_panel
+from cbc_expert.hl7 import (
+    END_BLOCK,
+    START_BLOCK,
+    IngestStats,
+    file_spans,
+    interpret_messages,
+    mllp_spans,
+)
+
+OBX_ORDER = (
+    ("718-7", "Hemoglobin", "g/dL"),
+    ("787-2", "MCV", "fL"),
+    ("6690-2", "WBC", "10*3/uL"),
+    ("770-8", "Neutrophils/100 leukocytes", "%"),
+    ("777-3", "Platelets", "10*3/uL"),
+)
+
+
+def oru_message(rng, i, malformed=False):
+    """One ORU^R01 message as bytes (\\r-separated segments)."""
+    *values, sex = wide_panel(rng)
+    segments = [
+        f"MSH|^~\\&|ANALYZER|LAB|LIS|HOSP|20240301080000||ORU^R01|MSG{i:08d}|P|2.5",
+        f"PID|1||MRN{rng.randrange(100_000):06d}^^^HOSP^MR||DOE^JANE||19800101|{sex[0]}",
+        f"OBR|1||{i}|58410-2^CBC panel^LN|||20240301075500",
+    ]
+    for k, ((code, name, unit), value) in enumerate(zip(OBX_ORDER, values), 1):
+        segments.append(f"OBX|{k}|NM|{code}^{name}^LN||{value}|{unit}|||||F")
+    if malformed:
+        kind = rng.randrange(3)
+        if kind == 0:
+            del segments[3 + rng.randrange(5)]
+        elif kind == 1:
+            segments[1] = segments[1][:-1] + "U"
+        else:
+            segments[3] = segments[3].replace("||F", "").replace("|NM|718-7^Hemoglobin^LN||",
+                                                               "|NM|718-7^Hemoglobin^LN||n/a")
+    return ("\r".join(segments) + "\r").encode()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--malformed", type=float, default=0.01,
+                        help="fraction of messages deliberately malformed")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    messages = [oru_message(rng, i, rng.random() < args.malformed) for i in range(args.messages)]
+    with tempfile.TemporaryDirectory() as tmp:
+        plain = os.path.join(tmp, "oru.hl7")
+        with open(plain, "wb") as f:
+            f.writelines(messages)
+        mllp = b"".join(START_BLOCK + m + END_BLOCK for m in messages)
+
+        for name, spans in (
+            ("file (mmap)", lambda: file_spans(plain)),
+            ("MLLP stream", lambda: mllp_spans(io.BytesIO(mllp).read)),
+        ):
+            stats = IngestStats()
+            started = time.perf_counter()
+            for _ in interpret_messages(spans(), stats=stats):
+                pass
+            elapsed = time.perf_counter() - started
+            print(f"  {name:<12} {stats.messages / elapsed:>10,.0f} messages/s   "
+                  f"{stats.panels:,} panels, {sum(stats.malformed.values()):,} malformed "
+                  f"{dict(sorted(stats.malformed.items()))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
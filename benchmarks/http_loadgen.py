@@ -0,0 +1,149 @@
+"""
+Load generator for the HTTP interpretation service.
+
+    python -m benchmarks.http_loadgen --spawn [--concurrency 64] [--duration 10]
+    python -m benchmarks.http_loadgen --url http://127.0.0.1:8787 [--bulk 100]
+
+Opens `concurrency` keep-alive connections, each sending random panels back
+to back for `duration` seconds, then reports requests/s, panels/s, client
+side p50/p95/p99 latency and the server's own /stats. With --spawn a service
+is started in a subprocess on a free local port and stopped afterwards.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+
+def random_panel(rng):
+    return {
+        "hgb": round(rng.gauss(13.0, 2.2), 1),
+        "mcv": round(rng.gauss(90, 10)),
+        "wbc": round(rng.lognormvariate(1.9, 0.45), 1),
+        "neutrophil_pct": rng.randint(30, 90),
+        "platelets": max(5, round(rng.gauss(260, 110))),
+        "sex": rng.choice(("Female", "Male")),
+    }
+
+
+async def request(reader, writer, host, method, path, body=b""):
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    status = int(head.split(b" ", 2)[1])
+    length = 0
+    for line in head.split(b"\r\n"):
+        if line.lower().startswith(b"content-length:"):
+            length = int(line.split(b":", 1)[1])
+    return status, await reader.readexactly(length)
+
+
+async def client(host, port, path, deadline, bulk, seed, latencies, statuses):
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            if bulk:
+                body = json.dumps({"panels": [random_panel(rng) for _ in range(bulk)]})
+            else:
+                body = json.dumps(random_panel(rng))
+            started = time.perf_counter()
+            status, _ = await request(reader, writer, host, "POST", path, body.encode())
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+    finally:
+        writer.close()
+
+
+async def run(host, port, concurrency, duration, bulk):
+    path = "/interpret/bulk" if bulk else "/interpret"
+    latencies, statuses = [], {}
+    started = time.perf_counter()
+    deadline = started + duration
+    await asyncio.gather(*(
+        client(host, port, path, deadline, bulk, seed, latencies, statuses)
+        for seed in range(concurrency)
+    ))
+    elapsed = time.perf_counter() - started
+
+    reader, writer = await asyncio.open_connection(host, port)
+    _, stats = await request(reader, writer, host, "GET", "/stats")
+    writer.close()
+    return latencies, statuses, elapsed, json.loads(stats)
+
+
+def percentile(ordered, q):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000 if ordered else float("nan")
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(host, port, timeout=15.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection((host, port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"service did not come up on {host}:{port}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8787")
+    parser.add_argument("--spawn", action="store_true",
+                        help="start a service subprocess on a free port")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--bulk", type=int, default=0,
+                        help="panels per bulk request (0 = single-panel requests)")
+    parser.add_argument("--window-ms", type=float, default=2.0,
+                        help="batching window for a spawned service")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.spawn:
+        host, port = "127.0.0.1", free_port()
+        server = subprocess.Popen(
+            [sys.executable, "-m", "cbc_expert", "serve", "--host", host, "--port", str(port),
+             "--window-ms", str(args.window_ms)],
+            stdout=subprocess.DEVNULL)
+        wait_for(host, port)
+    else:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port or 80
+
+    try:
+        latencies, statuses, elapsed, stats = asyncio.run(
+            run(host, port, args.concurrency, args.duration, args.bulk))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    ordered = sorted(latencies)
+    panels = len(latencies) * (args.bulk or 1)
+    print(f"{len(latencies):,} requests in {elapsed:.1f} s with {args.concurrency} connections")
+    print(f"  {len(latencies) / elapsed:,.0f} req/s   {panels / elapsed:,.0f} panels/s")
+    print(f"  client latency ms  p50 {percentile(ordered, 0.50):.2f}  "
+          f"p95 {percentile(ordered, 0.95):.2f}  p99 {percentile(ordered, 0.99):.2f}")
+    print(f"  status codes {statuses}")
+    print(f"  server stats {json.dumps(stats)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,59 @@
+"""
+Import-time budget check for the clinical engine.
+
+    python -m benchmarks.import_budget [--budget-ms 25] [--runs 5]
+
+Times `import cbc_expert` in fresh interpreters and exits non-zero when the
+best run exceeds the budget or when a heavy dependency (Streamlit, NumPy,
+pandas) is pulled in at import time.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ("streamlit", "numpy", "pandas")
+
+PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import cbc_expert
+elapsed = (time.perf_counter() - t0) * 1000
+print(json.dumps({"ms": elapsed, "heavy": [m for m in %r if m in sys.modules]}))
+""" % (HEAVY_MODULES,)
+
+
+def measure(runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE], capture_output=True,
+                             text=True, check=True)
+        samples.append(json.loads(out.stdout))
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=25.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    samples = measure(args.runs)
+    best = min(s["ms"] for s in samples)
+    heavy = sorted({m for s in samples for m in s["heavy"]})
+    print(f"import cbc_expert: best {best:.1f} ms over {args.runs} runs "
+          f"(budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: heavy modules imported: {', '.join(heavy)}")
+        failed = True
+    if best > args.budget_ms:
+        print("FAIL: import time over budget")
+        failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
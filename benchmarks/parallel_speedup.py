@@ -0,0 +1,65 @@
+"""
+Speedup of the bulk interpreter across process-pool sizes.
+
+    python -m benchmarks.parallel_speedup [--rows 1000000] [--workers 1 2 4 8 N]
+
+Writes a synthetic CSV export to a temporary directory, streams it through
+run_stream() at each worker count (output to /dev/null) and reports rows/s
+and speedup relative to one worker.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+
+from cbc_expert.parallel import default_workers
+from cbc_expert.stream import DEFAULT_CHUNK_ROWS, run_stream
+
+
+def write_export(path, rows, seed=0):
+    rng = random.Random(seed)
+    with open(path, "w") as f:
+        f.write("patient_id,hgb,mcv,wbc,neutrophil_pct,platelets,sex\n")
+        for i in range(rows):
+            f.write(f"P{i},{rng.gauss(13.5, 2.0):.1f},{rng.gauss(90, 9):.0f},"
+                    f"{rng.lognormvariate(1.9, 0.4):.1f},{rng.randint(30, 90)},"
+                    f"{max(5, rng.gauss(260, 90)):.0f},{rng.choice('FM')}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=sorted({1, 2, 4, 8, default_workers()}))
+    parser.add_argument("--json", help="also write results to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "export.csv")
+        write_export(path, args.rows)
+        print(f"{args.rows:,} rows, {default_workers()} CPUs")
+        print(f"{'workers':>8} {'seconds':>9} {'rows/s':>12} {'speedup':>8}")
+        base = None
+        for workers in args.workers:
+            stats = run_stream(path, os.devnull, chunk_rows=args.chunk_rows,
+                               workers=workers, progress=None)
+            base = base or stats["seconds"]
+            speedup = base / stats["seconds"]
+            results.append({"workers": workers, "seconds": stats["seconds"],
+                            "rows_per_sec": stats["rows_per_sec"], "speedup": speedup})
+            print(f"{workers:>8} {stats['seconds']:>9.2f} {stats['rows_per_sec']:>12,.0f} "
+                  f"{speedup:>7.2f}x")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"rows": args.rows, "cpus": default_workers(), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+"""
+Insert throughput and lookup latency of the longitudinal panel store.
+
+    python -m benchmarks.store_lookup [--rows 1000000] [--patients 100000] [--db PATH]
+
+Fills a store with synthetic serial panels through add_many(), then times
+last_n() and previous() for random patients and reports p50/p99 latency.
+Pass --db to keep (and on a second run, reuse) a large store on disk.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.synthetic import wide_panel
+from cbc_expert.store import PanelStore
+
+
+def serial_records(rows, patients, seed=0):
+    """Yields records for `patients` patients, a panel every ~12 h per patient."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    per_patient = max(1, rows // patients)
+    for k in range(per_patient):
+        for p in range(patients):
+            if k * patients + p >= rows:
+                return
+            at = start + timedelta(hours=12 * k, minutes=rng.randint(0, 600))
+            yield (f"P{p:07d}", at, *wide_panel(rng))
+
+
+def percentiles(samples):
+    ordered = sorted(samples)
+    return {q: ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1e6 for q in (0.5, 0.99)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--lookups", type=int, default=20_000)
+    parser.add_argument("--db", help="store path (default: a temporary file)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.db or os.path.join(tmp, "panels.sqlite")
+        with PanelStore(path) as store:
+            if len(store) < args.rows:
+                started = time.perf_counter()
+                n = store.add_many(serial_records(args.rows, args.patients))
+                elapsed = time.perf_counter() - started
+                print(f"inserted {n:,} panels in {elapsed:.1f} s ({n / elapsed:,.0f} panels/s)")
+            print(f"store holds {len(store):,} panels, {os.path.getsize(path) / 2**20:,.0f} MiB")
+
+            rng = random.Random(1)
+            ids = [f"P{rng.randrange(args.patients):07d}" for _ in range(args.lookups)]
+            for name, lookup in (
+                ("last_n(5)", lambda pid: store.last_n(pid, 5)),
+                ("previous", lambda pid: store.previous(pid, "2030-01-01")),
+            ):
+                samples = []
+                for pid in ids:
+                    started = time.perf_counter()
+                    lookup(pid)
+                    samples.append(time.perf_counter() - started)
+                pct = percentiles(samples)
+                print(f"  {name:<10} p50 {pct[0.5]:7.1f} us   p99 {pct[0.99]:7.1f} us")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,277 @@
+"""
+Offline benchmark suite for the engine, the HTML builders and dashboard reruns.
+
+    python -m benchmarks.suite [--json results.json]
+    python -m benchmarks.suite --baseline benchmarks/baseline.json [--threshold 0.25]
+    python -m benchmarks.suite --only build_ --quick
+
+Every case reports microseconds per unit (per call, per row, per rerun, per map or per report),
+the median of several repeats. With --baseline each case is compared with
+the stored value and the run exits 1 if any case is slower by more than
+--threshold (a fraction; 0.25 = 25%). Cases missing from either side are
+reported but never fail the run.
+
+benchmarks/baseline.json is a reference run at the default settings, with
+the environment it was recorded in. Timings only compare on like
+hardware, so on another machine record your own first (--json) from the
+commit you want to compare against; a baseline whose environment or
+settings differ from this run is reported before the comparison.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+from benchmarks.synthetic import columns, enriched_panels, mixed_panels, reference_panels
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+
+
+# ──────────────────────────────────────────────
+# TIMING
+# ──────────────────────────────────────────────
+
+def measure(fn, units, repeats=5):
+    """
+    Calls fn() `repeats` times after one warm-up; fn processes `units` items.
+
+    Returns:
+        microseconds per unit (median over repeats)
+    """
+    fn()
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) / units * 1e6)
+    return statistics.median(samples)
+
+
+# ──────────────────────────────────────────────
+# CASES
+# ──────────────────────────────────────────────
+
+ENGINE_CASES = ("interpret_cbc", "interpret_cbc_compact", "interpret_cbc_batch")
+RENDER_CASES = ("build_param_grid_html", "build_badges_html", "build_summary_html",
+                "build_workup_html", "build_summary_card_html", "build_workup_card_html",
+                "card_renderer.cards")
+RERUN_CASES = ("streamlit_rerun",)
+SENSITIVITY_CASES = ("sensitivity_map",)
+EXPORT_CASES = ("export_html", "export_zip")
+
+
+def engine_cases(panels, batch_panels):
+    from cbc_expert import interpret_cbc, interpret_cbc_batch, interpret_cbc_compact
+
+    cols = columns(batch_panels)
+    yield "interpret_cbc", "call", len(panels), lambda: [interpret_cbc(*p) for p in panels]
+    yield ("interpret_cbc_compact", "call", len(panels),
+           lambda: [interpret_cbc_compact(*p) for p in panels])
+    yield "interpret_cbc_batch", "row", len(batch_panels), lambda: interpret_cbc_batch(cols)
+
+
+def render_cases(panels):
+    from cbc_expert import (
+        build_badges_html,
+        build_param_grid_html,
+        build_summary_card_html,
+        build_summary_html,
+        build_workup_card_html,
+        build_workup_html,
+        card_renderer,
+        interpret_cbc,
+        reference_limits,
+    )
+
+    results = [interpret_cbc(*p) for p in panels]
+    n = len(panels)
+    yield ("build_param_grid_html", "call", n,
+           lambda: [build_param_grid_html(h, m, w, pl, reference_limits(s))
+                    for h, m, w, _, pl, s in panels])
+    yield "build_badges_html", "call", n, lambda: [build_badges_html(p) for p, _, _ in results]
+    yield "build_summary_html", "call", n, lambda: [build_summary_html(s) for _, s, _ in results]
+    yield "build_workup_html", "call", n, lambda: [build_workup_html(w) for _, _, w in results]
+    yield ("build_summary_card_html", "call", n,
+           lambda: [build_summary_card_html(p, s) for p, s, _ in results])
+    yield ("build_workup_card_html", "call", n,
+           lambda: [build_workup_card_html(w) for _, _, w in results])
+    yield "card_renderer.cards", "call", n, lambda: [card_renderer.cards(p) for p in panels]
+
+
+def sensitivity_cases():
+    """Every preset map at the dashboard's default resolution, evaluated and drawn."""
+    from cbc_expert.sensitivity import SENSITIVITY_MAPS, sensitivity_map
+
+    def draw_all():
+        for spec in SENSITIVITY_MAPS.values():
+            grid = sensitivity_map(spec["x"], spec["y"], "Female")
+            grid.image(*grid.categories(spec["patterns"]))
+
+    yield "sensitivity_map", "map", len(SENSITIVITY_MAPS), draw_all
+
+
+def export_cases(panels):
+    """Bulk report export from parsed rows to an in-memory document or archive."""
+    import io
+
+    from cbc_expert import INPUT_FIELDS
+    from cbc_expert.export import report_sections, write_html, write_zip
+
+    header = ["patient_id", *INPUT_FIELDS]
+    rows = [[f"P{i}", *map(str, p)] for i, p in enumerate(panels)]
+
+    def sections():
+        return report_sections(iter([(header, rows, 0)]))
+
+    yield "export_html", "report", len(rows), lambda: write_html(sections(), io.StringIO())
+    yield "export_zip", "report", len(rows), lambda: write_zip(sections(), io.BytesIO())
+
+
+def rerun_cases(panels, reruns):
+    """One full headless script run per panel, changing every input between runs."""
+    from streamlit.testing.v1 import AppTest
+
+    trace = panels[:reruns]
+    at = AppTest.from_file(APP_PATH, default_timeout=60).run()
+    if at.exception:
+        raise RuntimeError(f"app.py failed: {at.exception}")
+
+    def replay():
+        for hgb, mcv, wbc, neutrophil_pct, platelets, sex in trace:
+            at.selectbox[0].set_value(sex)
+            at.number_input[0].set_value(min(max(hgb, 1.0), 20.0))
+            at.number_input[1].set_value(min(max(mcv, 50), 140))
+            at.number_input[2].set_value(min(max(wbc, 0.1), 100.0))
+            at.slider[0].set_value(neutrophil_pct)
+            at.number_input[3].set_value(min(max(platelets, 1), 2000))
+            at.run()
+
+    yield "streamlit_rerun", "rerun", len(trace), replay
+
+
+def run_suite(rows=20_000, batch_rows=200_000, reruns=20, repeats=5, only=None, seed=0):
+    """
+    Case groups run against three synthetic mixes: a ward-like mix, healthy
+    reference panels and a set enriched for every pattern branch.
+
+    Returns:
+        {"group/case": {"us_per_unit", "unit", "n"}}
+    """
+    def mixed(n):
+        return mixed_panels(n, seed=seed)
+
+    # Inputs are generated lazily, only for groups with a selected case.
+    suites = [
+        ("engine", ENGINE_CASES, lambda: engine_cases(mixed(rows), mixed(batch_rows))),
+        ("engine_reference", ENGINE_CASES,
+         lambda: engine_cases(reference_panels(rows, seed), reference_panels(batch_rows, seed))),
+        ("engine_enriched", ENGINE_CASES,
+         lambda: engine_cases(enriched_panels(rows, seed), enriched_panels(batch_rows, seed))),
+        ("render", RENDER_CASES, lambda: render_cases(mixed(rows))),
+        ("render_enriched", RENDER_CASES, lambda: render_cases(enriched_panels(rows, seed))),
+        ("rerun", RERUN_CASES, lambda: rerun_cases(enriched_panels(reruns, seed), reruns)),
+        ("sensitivity", SENSITIVITY_CASES, sensitivity_cases),
+        ("export", EXPORT_CASES, lambda: export_cases(mixed(rows))),
+    ]
+    results = {}
+    for suite, names, cases in suites:
+        selected = {n for n in names if not only or any(o in f"{suite}/{n}" for o in only)}
+        if not selected:
+            continue
+        for name, unit, units, fn in cases():
+            if name not in selected:
+                continue
+            key = f"{suite}/{name}"
+            us = measure(fn, units, 1 if suite == "rerun" else repeats)
+            results[key] = {"us_per_unit": round(us, 3), "unit": unit, "n": units}
+            print(f"  {key:<44} {us:>12,.2f} us/{unit}", flush=True)
+    return results
+
+
+# ──────────────────────────────────────────────
+# BASELINE COMPARISON
+# ──────────────────────────────────────────────
+
+def compare(results, baseline, threshold):
+    """
+    Returns:
+        list of (case, baseline_us, current_us, ratio, regressed)
+    """
+    rows = []
+    for key in sorted(set(results) | set(baseline)):
+        old = baseline.get(key, {}).get("us_per_unit")
+        new = results.get(key, {}).get("us_per_unit")
+        if old is None or new is None:
+            rows.append((key, old, new, None, False))
+            continue
+        ratio = new / old if old else float("inf")
+        rows.append((key, old, new, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def environment():
+    import numpy
+    import streamlit
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "cpus": os.cpu_count(), "numpy": numpy.__version__,
+            "streamlit": streamlit.__version__}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20_000,
+                        help="panels per scalar and renderer case")
+    parser.add_argument("--batch-rows", type=int, default=200_000)
+    parser.add_argument("--reruns", type=int, default=20, help="headless script reruns")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--only", nargs="+", help="run cases whose name contains any of these")
+    parser.add_argument("--quick", action="store_true", help="small inputs, for smoke runs")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="compare against a results file from --json")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowed slowdown before a case counts as a regression")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.rows, args.batch_rows, args.reruns, args.repeats = 2_000, 20_000, 5, 3
+
+    print(f"benchmark suite: {args.rows:,} rows, {args.batch_rows:,} batch rows, "
+          f"{args.reruns} reruns")
+    results = run_suite(args.rows, args.batch_rows, args.reruns, args.repeats, args.only)
+    doc = {"created": time.strftime("%Y-%m-%dT%H:%M:%S"), "environment": environment(),
+           "config": {"rows": args.rows, "batch_rows": args.batch_rows,
+                      "reruns": args.reruns, "repeats": args.repeats},
+           "results": results}
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(doc, f, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        stored = json.load(f)
+    baseline = stored["results"]
+    for section in ("environment", "config"):
+        ours, theirs = doc[section], stored.get(section, {})
+        for key in sorted(k for k in ours if ours[k] != theirs.get(k)):
+            print(f"warning: baseline {section} {key} is {theirs.get(key)!r}, "
+                  f"this run {ours[key]!r}", file=sys.stderr)
+    if args.only:
+        baseline = {key: v for key, v in baseline.items() if key in results}
+    regressions = 0
+    print(f"\ncompared with {args.baseline} (threshold +{args.threshold:.0%})")
+    for key, old, new, ratio, regressed in compare(results, baseline, args.threshold):
+        if ratio is None:
+            print(f"  {key:<44} {'only in ' + ('baseline' if new is None else 'this run'):>24}")
+            continue
+        regressions += regressed
+        flag = "REGRESSION" if regressed else ""
+        print(f"  {key:<44} {old:>10,.2f} -> {new:>10,.2f}  {ratio:>6.2f}x  {flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""
+Synthetic CBC panels for benchmarks.
+
+    reference_panels(n)   healthy adults, every value inside its reference range
+    enriched_panels(n)    balanced across every pattern in the rule table
+    mixed_panels(n)       a ward-like mix: mostly normal, a tail of abnormal
+
+Panels are tuples in INPUT_FIELDS order, rounded the way the dashboard
+widgets round them (Hgb/WBC to 0.1, the rest to integers). Generation is
+seeded and deterministic.
+"""
+
+import random
+
+from cbc_expert import CBC_RULES, INPUT_FIELDS, interpret_cbc_compact, reference_limits
+
+# Pattern code of the rule table's fallback ("within normal limits") rule.
+NORMAL_CODE = interpret_cbc_compact(13.5, 90, 7.0, 60, 250, "Female").pattern_code
+
+
+def _rounded(hgb, mcv, wbc, neutrophil_pct, platelets, sex):
+    return (round(hgb, 1), int(round(mcv)), round(wbc, 1),
+            int(round(neutrophil_pct)), int(round(platelets)), sex)
+
+
+def reference_panels(n, seed=0):
+    rng = random.Random(seed)
+    panels = []
+    while len(panels) < n:
+        sex = rng.choice(("Female", "Male"))
+        lim = reference_limits(sex)
+        panel = _rounded(
+            rng.uniform(lim["hgb_low"], lim["hgb_low"] + 4.0),
+            rng.uniform(lim["mcv_low"], lim["mcv_high"]),
+            rng.uniform(lim["wbc_low"], lim["wbc_high"]),
+            rng.uniform(40, lim["neutrophil_high"]),
+            rng.uniform(lim["plt_low"], lim["plt_high"]),
+            sex,
+        )
+        if interpret_cbc_compact(*panel).pattern_code == NORMAL_CODE:
+            panels.append(panel)
+    return panels
+
+
+def wide_panel(rng):
+    """One panel drawn from a deliberately wide distribution covering every branch."""
+    return _rounded(
+        rng.uniform(4.0, 18.0),
+        rng.uniform(55, 125),
+        rng.choice((rng.uniform(0.5, 4.0), rng.uniform(4.0, 11.0), rng.uniform(11.0, 40.0))),
+        rng.uniform(20, 95),
+        rng.choice((rng.uniform(10, 150), rng.uniform(150, 450), rng.uniform(450, 1200))),
+        rng.choice(("Female", "Male")),
+    )
+
+
+def enriched_panels(n, seed=0):
+    """
+    Rejection-samples wide panels until every pattern label in the rule
+    table has an equal share of n. Panels can carry several patterns; each
+    is counted under the first label it has not yet filled.
+    """
+    rng = random.Random(seed)
+    labels = [label for label, _ in CBC_RULES.patterns]
+    quota = -(-n // len(labels))
+    filled = {label: 0 for label in labels}
+    panels = []
+    while len(panels) < n:
+        panel = wide_panel(rng)
+        for label in interpret_cbc_compact(*panel).pattern_labels:
+            if filled[label] < quota:
+                filled[label] += 1
+                panels.append(panel)
+                break
+    rng.shuffle(panels)
+    return panels
+
+
+def mixed_panels(n, abnormal=0.3, seed=0):
+    rng = random.Random(seed)
+    k = int(n * abnormal)
+    panels = reference_panels(n - k, seed) + enriched_panels(k, seed + 1)
+    rng.shuffle(panels)
+    return panels
+
+
+def columns(panels):
+    """Panels -> dict of field -> list, for the batch path."""
+    return dict(zip(INPUT_FIELDS, map(list, zip(*panels)))) if panels else {f: [] for f in INPUT_FIELDS}
@@ -0,0 +1,61 @@
+"""
+CBC interpretation engine and HTML builders, importable without Streamlit.
+
+The NumPy batch path lives in cbc_expert.batch and is only imported on
+first use of interpret_cbc_batch (likewise the SQLite store on first use of
+PanelStore), so `import cbc_expert` stays cheap.
+"""
+
+from .cache import (
+    LRUCache,
+    configure_cache,
+    interpret_cbc_cached,
+    interpretation_cache,
+    normalize_inputs,
+    render_cards_cached,
+)
+from .cards import CardRenderer, card_renderer, render_report
+from .engine import (
+    CBC_RULES,
+    INPUT_FIELDS,
+    PATTERNS,
+    WORKUP_CATALOG,
+    CompiledRules,
+    compile_rules,
+    decode_patterns,
+    decode_workup,
+    interpret_cbc,
+    interpret_cbc_compact,
+    render_summaries,
+)
+from .render import (
+    DISCLAIMER_HTML,
+    HEADER_HTML,
+    build_badges_html,
+    build_param_grid_html,
+    build_summary_card_html,
+    build_summary_html,
+    build_workup_card_html,
+    build_workup_html,
+)
+from .ranges import ReferenceIndex, load_profiles, reference_index
+from .results import CBCResult, ResultBlock
+from .rules import (
+    DELTA_RULES,
+    PREDICATES,
+    REFERENCE_LIMITS,
+    RULES,
+    WORKUP_ITEMS,
+    reference_limits,
+)
+from .styles import CSS
+
+
+def __getattr__(name):
+    if name in ("interpret_cbc_batch", "interpret_cbc_block"):
+        from . import batch
+        return getattr(batch, name)
+    if name in ("PanelStore", "interpret_with_deltas"):
+        from . import store
+        return getattr(store, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,373 @@
+"""
+Population-level statistics over interpreted CBCs, in bounded memory.
+
+    agg = Aggregate()
+    for chunk, _ in interpret_chunks(read_chunks(path)):
+        agg.add_chunk(chunk)
+    print(format_report(agg.report()))
+
+An Aggregate holds only counters: panels per sex, how often each distinct
+pattern code and workup mask occurred per sex, and one fixed-bin histogram
+per analyte and sex. Bins sit at the reporting precision of each analyte
+(Hgb 0.1 g/dL, MCV 1 fL, ...), so every statistic is an integer count and
+partial aggregates from parallel shards merge exactly, in any order. Pattern
+prevalence and workup frequency are decoded from the code/mask counts only
+when a report is produced.
+
+Partials are saved as JSON (to_dict / from_dict) so shards aggregated on
+different machines can be merged later:
+
+    python -m cbc_expert aggregate jan.csv feb.csv -j 4 --save q1.json
+    python -m cbc_expert aggregate q1.json q2.json q3.json q4.json
+"""
+
+import json
+import math
+from functools import partial
+
+from .engine import CBC_RULES
+from .stream import (
+    DEFAULT_CHUNK_ROWS,
+    interpret_rows,
+    parse_header,
+    parse_lines,
+    read_blocks,
+    resolve_columns,
+    sniff_delimiter,
+)
+
+SEXES = ("Female", "Male")
+
+# field -> (low, high, step); step is the precision the analyte is reported at.
+HISTOGRAM_BINS = {
+    "hgb":       (0.0, 25.0, 0.1),
+    "mcv":       (40.0, 160.0, 1.0),
+    "wbc":       (0.0, 100.0, 0.1),
+    "platelets": (0.0, 2000.0, 1.0),
+}
+
+REPORT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+FORMAT_VERSION = 1
+
+
+# ──────────────────────────────────────────────
+# HISTOGRAM
+# ──────────────────────────────────────────────
+
+class FixedHistogram:
+    """
+    Counts of values rounded to low + k * step for k in 0..bins. Values
+    outside [low, high] are counted as underflow/overflow; the mean and
+    extremes still include them.
+
+    Attributes:
+        counts    : list of per-bin counts
+        steps     : sum of round((value - low) / step) over every value, so
+                    the mean is exact at the reporting precision
+        minimum, maximum : bin indices of the extremes (None when empty)
+    """
+
+    def __init__(self, low, high, step):
+        self.low, self.high, self.step = low, high, step
+        self.bins = int(round((high - low) / step))
+        self.counts = [0] * (self.bins + 1)
+        self.underflow = self.overflow = 0
+        self.steps = 0
+        self.minimum = self.maximum = None
+
+    @property
+    def count(self):
+        return sum(self.counts) + self.underflow + self.overflow
+
+    def add(self, values):
+        """values: float array; NaN and ±inf are not values and are skipped."""
+        import numpy as np
+
+        values = np.asarray(values, dtype=float)
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        k = np.rint((values - self.low) / self.step).astype(np.int64)
+        inside = (k >= 0) & (k <= self.bins)
+        binned = np.bincount(k[inside], minlength=self.bins + 1).tolist()
+        self.counts = [a + b for a, b in zip(self.counts, binned)]
+        self.underflow += int((k < 0).sum())
+        self.overflow += int((k > self.bins).sum())
+        self.steps += int(k.sum())
+        self._extremes(int(k.min()), int(k.max()))
+
+    def _extremes(self, lo, hi):
+        self.minimum = lo if self.minimum is None else min(self.minimum, lo)
+        self.maximum = hi if self.maximum is None else max(self.maximum, hi)
+
+    def merge(self, other):
+        if (self.low, self.high, self.step) != (other.low, other.high, other.step):
+            raise ValueError("cannot merge histograms with different bins")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+        self.steps += other.steps
+        if other.minimum is not None:
+            self._extremes(other.minimum, other.maximum)
+        return self
+
+    def value(self, k):
+        return round(self.low + k * self.step, 6)
+
+    def mean(self):
+        n = self.count
+        return round(self.low + self.step * self.steps / n, 6) if n else None
+
+    def quantile(self, q):
+        """Smallest value with at least a fraction q of the values at or below it."""
+        n = self.count
+        if not n:
+            return None
+        target = max(1, math.ceil(q * n))
+        if self.underflow >= target:
+            return self.value(self.minimum)
+        seen = self.underflow
+        for k, c in enumerate(self.counts):
+            seen += c
+            if seen >= target:
+                return self.value(k)
+        return self.value(self.maximum)
+
+    def summary(self, quantiles=REPORT_QUANTILES):
+        n = self.count
+        doc = {"count": n, "mean": self.mean(),
+               "min": None if not n else self.value(self.minimum),
+               "max": None if not n else self.value(self.maximum)}
+        for q in quantiles:
+            doc[f"p{round(q * 100):g}"] = self.quantile(q)
+        doc["underflow"], doc["overflow"] = self.underflow, self.overflow
+        return doc
+
+    def to_dict(self):
+        return {"counts": self.counts, "underflow": self.underflow, "overflow": self.overflow,
+                "steps": self.steps, "min": self.minimum, "max": self.maximum}
+
+    @classmethod
+    def from_dict(cls, doc, low, high, step):
+        h = cls(low, high, step)
+        if len(doc["counts"]) != len(h.counts):
+            raise ValueError("histogram bins do not match")
+        h.counts = list(doc["counts"])
+        h.underflow, h.overflow, h.steps = doc["underflow"], doc["overflow"], doc["steps"]
+        h.minimum, h.maximum = doc["min"], doc["max"]
+        return h
+
+
+# ──────────────────────────────────────────────
+# AGGREGATE
+# ──────────────────────────────────────────────
+
+class Aggregate:
+    """
+    Mergeable population counters. a.merge(b) gives the same counts as
+    aggregating a's and b's panels in one pass.
+
+    Attributes:
+        panels  : rows seen
+        invalid : rows with missing or invalid inputs (excluded elsewhere)
+        codes   : sex -> {pattern code: panels}
+        masks   : sex -> {workup mask: panels}
+        histograms : (field, sex) -> FixedHistogram
+    """
+
+    def __init__(self, plan=CBC_RULES, bins=HISTOGRAM_BINS):
+        self.plan = plan
+        self.bins = dict(bins)
+        self.panels = self.invalid = 0
+        self.codes = {sex: {} for sex in SEXES}
+        self.masks = {sex: {} for sex in SEXES}
+        self.histograms = {(field, sex): FixedHistogram(*spec)
+                           for field, spec in self.bins.items() for sex in SEXES}
+
+    # ── Accumulating ───────────────────────────────────────────────────────
+    def add(self, values, valid, codes, masks):
+        """
+        One block of interpreted rows: values maps INPUT_FIELDS to columns,
+        valid/codes/masks are parallel sequences (as in a stream chunk).
+        """
+        import numpy as np
+
+        valid = np.asarray(valid, dtype=bool)
+        self.panels += len(valid)
+        self.invalid += int((~valid).sum())
+        sex = np.asarray(values["sex"], dtype=object)
+        codes, masks = np.asarray(codes), np.asarray(masks)
+        columns = {field: np.asarray(values[field], dtype=float) for field in self.bins}
+        for s in SEXES:
+            rows = valid & (sex == s)
+            if not rows.any():
+                continue
+            for counts, column in ((self.codes[s], codes), (self.masks[s], masks)):
+                distinct, n = np.unique(column[rows], return_counts=True)
+                for value, k in zip(distinct.tolist(), n.tolist()):
+                    counts[value] = counts.get(value, 0) + k
+            for field, column in columns.items():
+                self.histograms[field, s].add(column[rows])
+        return self
+
+    def add_chunk(self, chunk):
+        """A chunk dict from cbc_expert.stream.interpret_rows()."""
+        return self.add(chunk["values"], chunk["valid"], chunk["codes"], chunk["masks"])
+
+    def merge(self, other):
+        if self._layout() != other._layout():
+            raise ValueError("cannot merge aggregates built with different rules or bins")
+        self.panels += other.panels
+        self.invalid += other.invalid
+        for mine, theirs in ((self.codes, other.codes), (self.masks, other.masks)):
+            for sex in SEXES:
+                counts = mine[sex]
+                for value, n in theirs[sex].items():
+                    counts[value] = counts.get(value, 0) + n
+        for key, histogram in self.histograms.items():
+            histogram.merge(other.histograms[key])
+        return self
+
+    def _layout(self):
+        return ([label for label, _ in self.plan.patterns],
+                [item["label"] for item in self.plan.workup_catalog],
+                {field: list(spec) for field, spec in self.bins.items()})
+
+    # ── Saving ─────────────────────────────────────────────────────────────
+    def to_dict(self):
+        patterns, workup, bins = self._layout()
+        return {
+            "version": FORMAT_VERSION, "patterns": patterns, "workup": workup, "bins": bins,
+            "panels": self.panels, "invalid": self.invalid,
+            "codes": {sex: {str(k): n for k, n in sorted(c.items())} for sex, c in self.codes.items()},
+            "masks": {sex: {str(k): n for k, n in sorted(m.items())} for sex, m in self.masks.items()},
+            "histograms": {field: {sex: self.histograms[field, sex].to_dict() for sex in SEXES}
+                           for field in self.bins},
+        }
+
+    @classmethod
+    def from_dict(cls, doc, plan=CBC_RULES):
+        if doc.get("version") != FORMAT_VERSION:
+            raise ValueError(f"unsupported aggregate version {doc.get('version')!r}")
+        agg = cls(plan, {field: tuple(spec) for field, spec in doc["bins"].items()})
+        if agg._layout()[:2] != (doc["patterns"], doc["workup"]):
+            raise ValueError("aggregate was built with a different rule table")
+        agg.panels, agg.invalid = doc["panels"], doc["invalid"]
+        for sex in SEXES:
+            agg.codes[sex] = {int(k): n for k, n in doc["codes"][sex].items()}
+            agg.masks[sex] = {int(k): n for k, n in doc["masks"][sex].items()}
+            for field, spec in agg.bins.items():
+                agg.histograms[field, sex] = FixedHistogram.from_dict(
+                    doc["histograms"][field][sex], *spec)
+        return agg
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path, plan=CBC_RULES):
+        with open(path) as f:
+            return cls.from_dict(json.load(f), plan)
+
+    # ── Reporting ──────────────────────────────────────────────────────────
+    def report(self):
+        """
+        Returns:
+            dict with panels, invalid, and per sex (plus "All"): panel count,
+            pattern prevalence, workup frequency and analyte distributions
+        """
+        groups = {}
+        for sex in (*SEXES, "All"):
+            keys = SEXES if sex == "All" else (sex,)
+            code_counts, mask_counts = {}, {}
+            for s in keys:
+                for value, n in self.codes[s].items():
+                    code_counts[value] = code_counts.get(value, 0) + n
+                for value, n in self.masks[s].items():
+                    mask_counts[value] = mask_counts.get(value, 0) + n
+            panels = sum(code_counts.values())
+            distributions = {}
+            for field, spec in self.bins.items():
+                histogram = FixedHistogram(*spec)
+                for s in keys:
+                    histogram.merge(self.histograms[field, s])
+                distributions[field] = histogram.summary()
+            groups[sex] = {
+                "panels": panels,
+                "patterns": _frequencies(code_counts, [label for label, _ in self.plan.patterns],
+                                         panels),
+                "workup": _frequencies(mask_counts,
+                                       [item["label"] for item in self.plan.workup_catalog], panels),
+                "distributions": distributions,
+            }
+        return {"panels": self.panels, "invalid": self.invalid, "groups": groups}
+
+
+def _frequencies(counts, labels, panels):
+    """Bit counts -> [{label, count, pct}], most frequent first. Labels may repeat."""
+    totals = {}
+    for value, n in counts.items():
+        for bit, label in enumerate(labels):
+            if value >> bit & 1:
+                totals[label] = totals.get(label, 0) + n
+    return [{"label": label, "count": n, "pct": round(100 * n / panels, 2) if panels else 0.0}
+            for label, n in sorted(totals.items(), key=lambda item: (-item[1], item[0]))]
+
+
+def format_report(report):
+    """Plain-text rendering of Aggregate.report()."""
+    lines = [f"{report['panels']:,} panels, {report['invalid']:,} invalid"]
+    for sex, group in report["groups"].items():
+        lines += ["", f"== {sex}: {group['panels']:,} panels =="]
+        for title, key in (("Patterns", "patterns"), ("Workup", "workup")):
+            lines.append(f"{title}:")
+            for row in group[key]:
+                lines.append(f"  {row['label']:<48} {row['count']:>10,}  {row['pct']:6.2f}%")
+        lines.append("Distributions:")
+        for field, d in group["distributions"].items():
+            if not d["count"]:
+                continue
+            spread = "  ".join(f"{k} {d[k]:g}" for k in d if k.startswith("p"))
+            lines.append(f"  {field:<10} mean {d['mean']:g}  min {d['min']:g}  {spread}  "
+                         f"max {d['max']:g}")
+    return "\n".join(lines) + "\n"
+
+
+# ──────────────────────────────────────────────
+# DRIVER
+# ──────────────────────────────────────────────
+
+def _interpret_block(block, delimiter, mapping):
+    header_line, lines, _ = block
+    header = parse_header(header_line, delimiter)
+    return interpret_rows(header, parse_lines(lines, delimiter), resolve_columns(header, mapping))
+
+
+def aggregate_block(block, delimiter=",", mapping=None):
+    """Interpret and aggregate one read_blocks() block; returns a picklable dict."""
+    return Aggregate().add_chunk(_interpret_block(block, delimiter, mapping)).to_dict()
+
+
+def aggregate_file(path, mapping=None, delimiter=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+                   workers=1, into=None):
+    """
+    Stream a CSV/TSV export into an Aggregate (or merge it into `into`).
+    With workers > 1 blocks are aggregated on a process pool and the
+    partials merged as they arrive; memory stays at one partial per block
+    in flight.
+    """
+    delimiter = delimiter or sniff_delimiter(path)
+    agg = into if into is not None else Aggregate()
+    blocks = read_blocks(path, chunk_rows)
+    if workers <= 1:
+        for block in blocks:
+            agg.add_chunk(_interpret_block(block, delimiter, mapping))
+        return agg
+
+    from .parallel import imap_ordered
+    work = partial(aggregate_block, delimiter=delimiter, mapping=mapping)
+    for doc in imap_ordered(work, blocks, workers):
+        agg.merge(Aggregate.from_dict(doc, agg.plan))
+    return agg
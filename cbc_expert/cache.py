@@ -0,0 +1,153 @@
+"""
+Process-wide memoisation of interpretations and rendered cards.
+
+Entries are keyed on the input tuple, so repeat panels (widget toggles in
+the dashboard, identical reference-normal rows in batch feeds) become
+dictionary hits. Only panels at dashboard precision are cached; anything
+else is interpreted directly, so a cached result is always the result of
+the exact inputs. The cache is a module global and therefore shared by
+every Streamlit session served from the same process.
+"""
+
+import math
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+from .cards import card_renderer
+from .engine import interpret_cbc
+
+
+def _env_size(name, default):
+    """A non-negative int from the environment; a bad value warns and falls back."""
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        size = int(value)
+        if size < 0:
+            raise ValueError
+    except ValueError:
+        print(f"cbc_expert: ignoring {name}={value!r} (not a non-negative integer); "
+              f"using {default}", file=sys.stderr)
+        return default
+    return size
+
+
+DEFAULT_CACHE_SIZE = _env_size("CBC_CACHE_SIZE", 4096)
+
+
+class LRUCache:
+    """Thread-safe bounded mapping with least-recently-used eviction."""
+
+    def __init__(self, maxsize=DEFAULT_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def resize(self, maxsize):
+        with self._lock:
+            self.maxsize = maxsize
+            while len(self._data) > maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self._data), "maxsize": self.maxsize}
+
+
+interpretation_cache = LRUCache()
+
+
+def _at_precision(value, digits):
+    try:
+        return math.isfinite(value) and round(value, digits) == value
+    except TypeError:
+        return False
+
+
+def normalize_inputs(hgb, mcv, wbc, neutrophil_pct, platelets, sex, age=None, lab=None):
+    """
+    The cache key for a panel, or None when it is not at dashboard precision
+    (Hgb/WBC to 0.1, MCV, neutrophil % and platelets to an integer, age to
+    0.01 years) or has a non-finite value. age and lab are appended only
+    when given.
+    """
+    if not (_at_precision(hgb, 1) and _at_precision(mcv, 0) and _at_precision(wbc, 1)
+            and _at_precision(neutrophil_pct, 0) and _at_precision(platelets, 0)
+            and (age is None or _at_precision(age, 2))):
+        return None
+    key = (hgb, mcv, wbc, neutrophil_pct, platelets, sex)
+    if age is None and lab is None:
+        return key
+    return key + (age, lab)
+
+
+def _entry(key):
+    # [ (patterns, summaries, workup), (grid_html, summary_card_html, workup_card_html) | None ]
+    entry = interpretation_cache.get(key)
+    if entry is None:
+        entry = [interpret_cbc(*key), None]
+        interpretation_cache.put(key, entry)
+    return entry
+
+
+def interpret_cbc_cached(hgb, mcv, wbc, neutrophil_pct, platelets, sex, age=None, lab=None):
+    """interpret_cbc through the shared cache; the same result, uncached off dashboard precision."""
+    key = normalize_inputs(hgb, mcv, wbc, neutrophil_pct, platelets, sex, age, lab)
+    if key is None:
+        return interpret_cbc(hgb, mcv, wbc, neutrophil_pct, platelets, sex, age, lab)
+    return _entry(key)[0]
+
+
+def render_cards_cached(hgb, mcv, wbc, neutrophil_pct, platelets, sex, age=None, lab=None):
+    """
+    Returns:
+        (param_grid_html, summary_card_html, workup_card_html) for the panel
+    """
+    key = normalize_inputs(hgb, mcv, wbc, neutrophil_pct, platelets, sex, age, lab)
+    if key is None:
+        return card_renderer.cards((hgb, mcv, wbc, neutrophil_pct, platelets, sex, age, lab))
+    entry = _entry(key)
+    if entry[1] is None:
+        entry[1] = card_renderer.cards(key)
+    return entry[1]
+
+
+def configure_cache(maxsize):
+    interpretation_cache.resize(maxsize)
+
+
+def clear_caches():
+    """Empty the interpretation cache and the card renderer's; ranges.load_profiles() calls this."""
+    interpretation_cache.clear()
+    card_renderer.clear()
@@ -0,0 +1,189 @@
+"""
+Precompiled card rendering.
+
+Every catalog item's workup row and every pattern's badge is rendered once
+when the renderer is built. Cards are then assembled by joining those
+fragments and splicing the panel's numbers into cached templates:
+
+    workup card   cached per workup mask
+    summary card  one str.format template per pattern code (badges and the
+                  fired rules' summary templates)
+    param grid    reference-range captions per limits dict (render.grid_units)
+
+The number of distinct result signatures is bounded by the rule table (a
+few dozen combinations), so these caches are plain dicts. Summary templates
+are compiled to f-string functions, so rendering a card skips str.format's
+parse of the whole template. Output is byte-identical to the build_*_html
+helpers.
+"""
+
+import html
+from string import Formatter
+
+from .engine import CBC_RULES
+from .metrics import render_seconds, timed
+from .render import (
+    CARD_TAIL,
+    NO_WORKUP_HTML,
+    SUMMARY_CARD_HEAD,
+    WORKUP_CARD_HEAD,
+    badge_html,
+    param_classes,
+    grid_units,
+    param_grid_html,
+    workup_row_html,
+)
+from .rules import reference_limits
+from .styles import CSS
+
+
+def compile_template(template):
+    """
+    str.format template -> function of a fields dict returning the filled
+    string, compiled to one f-string expression.
+    """
+    pieces = []
+    for literal, name, spec, _ in Formatter().parse(template):
+        if literal:
+            pieces.append(repr(literal))
+        if name is not None:
+            if not name.isidentifier() or "{" in spec or '"' in spec:
+                raise ValueError(f"unsupported template field {name!r}:{spec!r}")
+            pieces.append(f'f"{{fields[{name!r}]{":" + spec if spec else ""}}}"')
+    return eval(f"lambda fields: {' '.join(pieces) or repr('')}")
+
+
+class CardRenderer:
+
+    def __init__(self, plan=CBC_RULES):
+        self.plan = plan
+        self.workup_rows = tuple(workup_row_html(item) for item in plan.workup_catalog)
+        self.badges = tuple(badge_html(label, color) for label, color in plan.patterns)
+        self._badge_rows = {}
+        self._workup_cards = {}
+        self._summary_templates = {}
+        self._summary_fills = {}
+
+    def clear(self):
+        """Drop every cached fragment and template (after the reference ranges change)."""
+        for cache in (self._badge_rows, self._workup_cards, self._summary_templates,
+                      self._summary_fills):
+            cache.clear()
+
+    # ── Fragments ──────────────────────────────────────────────────────────
+    def badges_html(self, code):
+        row = self._badge_rows.get(code)
+        if row is None:
+            row = '<div class="pattern-row">' + "".join(
+                b for i, b in enumerate(self.badges) if code >> i & 1) + '</div>'
+            self._badge_rows[code] = row
+        return row
+
+    def workup_card(self, mask):
+        card = self._workup_cards.get(mask)
+        if card is None:
+            deduped = self.plan.dedupe(mask)
+            rows = [r for j, r in enumerate(self.workup_rows) if deduped >> j & 1]
+            card = WORKUP_CARD_HEAD + ("\n".join(rows) if rows else NO_WORKUP_HTML) + CARD_TAIL
+            self._workup_cards[mask] = card
+        return card
+
+    def summary_template(self, code):
+        """The whole summary card for a pattern code as one str.format template."""
+        template = self._summary_templates.get(code)
+        if template is None:
+            static = (SUMMARY_CARD_HEAD + self.badges_html(code)).replace("{", "{{").replace("}", "}}")
+            template = static + "".join(
+                f'<p class="summary-text">{t}</p>' for t in self.plan.summary_templates(code)
+            ) + CARD_TAIL
+            self._summary_templates[code] = template
+        return template
+
+    def summary_fill(self, code):
+        fill = self._summary_fills.get(code)
+        if fill is None:
+            fill = self._summary_fills[code] = compile_template(self.summary_template(code))
+        return fill
+
+    @staticmethod
+    def fields(panel, limits):
+        """Every value the summary template and parameter grid splice in."""
+        hgb, mcv, wbc, neutrophil_pct, platelets, sex = panel[:6]
+        fields = param_classes(hgb, mcv, wbc, platelets, limits)
+        fields.update(limits)
+        fields.update(hgb=hgb, mcv=mcv, wbc=wbc, neutrophil_pct=neutrophil_pct,
+                      platelets=platelets, sex=sex, neutrophil_abs=wbc * (neutrophil_pct / 100))
+        return fields
+
+    def summary_card(self, code, panel):
+        return self.summary_fill(code)(self.fields(panel, reference_limits(*panel[5:])))
+
+    def param_grid(self, panel):
+        limits = reference_limits(*panel[5:])
+        hgb, mcv, wbc, _, platelets = panel[:5]
+        return param_grid_html(hgb, mcv, wbc, platelets,
+                               param_classes(hgb, mcv, wbc, platelets, limits), grid_units(limits))
+
+    # ── Cards ──────────────────────────────────────────────────────────────
+    @timed(render_seconds, "card_renderer.cards")
+    def cards(self, panel, code=None, mask=None):
+        """
+        panel is an INPUT_FIELDS tuple, optionally followed by age and lab to
+        select a reference-range profile; pass code/mask from the batch path
+        to skip re-evaluating the rules.
+
+        Returns:
+            (param_grid_html, summary_card_html, workup_card_html)
+        """
+        limits = reference_limits(*panel[5:])
+        if code is None:
+            code, mask = self.plan.scalar_codes(*panel[:6], limits)
+        fields = self.fields(panel, limits)
+        return (param_grid_html(panel[0], panel[1], panel[2], panel[4], fields, grid_units(limits)),
+                self.summary_fill(code)(fields),
+                self.workup_card(mask))
+
+    # ── Reports ────────────────────────────────────────────────────────────
+    def report_section(self, panel, code=None, mask=None, title=None):
+        """One patient's printable report: title, parameter grid and both cards."""
+        grid, summary, workup = self.cards(panel, code, mask)
+        heading = f'<h2 class="report-title">{html.escape(str(title))}</h2>' if title else ""
+        return (f'<section class="report">{heading}{grid}'
+                f'<div class="report-cards">{summary}{workup}</div></section>')
+
+
+REPORT_CSS = """
+<style>
+body { background: #0d1117; color: #e6edf3; font-family: 'DM Sans', sans-serif;
+       max-width: 1100px; margin: 0 auto; padding: 2rem; }
+.report { page-break-after: always; break-after: page; margin-bottom: 2.5rem; }
+.report-title { font-family: 'DM Serif Display', serif; color: #58a6ff; font-weight: 400; }
+.report-cards { display: grid; grid-template-columns: 1fr 1fr; gap: 1rem; }
+@media print { .report-cards { grid-template-columns: 1fr; } }
+</style>
+"""
+
+
+def report_document_head(title="CBC Interpretation Report"):
+    """Opening of a standalone report document, with the stylesheet included once."""
+    return (f'<!DOCTYPE html>\n<html lang="en"><head><meta charset="utf-8">'
+            f'<title>{html.escape(title)}</title>{CSS}{REPORT_CSS}</head><body>\n')
+
+
+REPORT_DOCUMENT_TAIL = "</body></html>\n"
+
+
+def render_report(panels, titles=None, renderer=None, title="CBC Interpretation Report"):
+    """
+    A standalone HTML report, one section per panel. Identical results share
+    their cached workup cards and badge rows.
+    """
+    renderer = renderer or card_renderer
+    titles = titles or [None] * len(panels)
+    parts = [report_document_head(title)]
+    parts += [renderer.report_section(panel, title=t) for panel, t in zip(panels, titles)]
+    parts.append(REPORT_DOCUMENT_TAIL)
+    return "\n".join(parts)
+
+
+card_renderer = CardRenderer()
@@ -0,0 +1,290 @@
+"""
+Command-line entry point:
+
+    python -m cbc_expert interpret INPUT [-o OUTPUT] [options]
+    python -m cbc_expert serve [--host HOST] [--port PORT] [options]
+    python -m cbc_expert aggregate INPUT [INPUT ...] [--save PARTIAL] [options]
+    python -m cbc_expert hl7 [INPUT ...] [--listen PORT] [-o OUTPUT]
+    python -m cbc_expert export INPUT -o REPORTS.{zip,html} [options]
+    python -m cbc_expert jobs {submit,work,status,cancel,retry} [options]
+"""
+
+import argparse
+import sys
+
+from .parallel import default_workers
+from .stream import DEFAULT_CHUNK_ROWS, run_stream
+
+
+def _parse_mapping(pairs):
+    mapping = {}
+    for pair in pairs or ():
+        field, _, column = pair.partition("=")
+        if not column:
+            raise argparse.ArgumentTypeError(f"expected FIELD=COLUMN, got {pair!r}")
+        mapping[field.strip()] = column.strip()
+    return mapping
+
+
+def cmd_interpret(args):
+    stats = run_stream(
+        args.input,
+        args.output,
+        fmt=args.format,
+        delimiter=args.delimiter,
+        mapping=_parse_mapping(args.map),
+        keep=tuple(args.keep or ()),
+        chunk_rows=args.chunk_rows,
+        start_offset=args.start_offset,
+        checkpoint=args.checkpoint,
+        workers=args.workers or default_workers(),
+        progress=None if args.quiet else sys.stderr,
+    )
+    print(f"interpreted {stats['rows']:,} rows in {stats['seconds']:.2f} s "
+          f"({stats['rows_per_sec']:,.0f} rows/s); end offset {stats['end_offset']}",
+          file=sys.stderr)
+    return 0
+
+
+def cmd_serve(args):
+    from .service import serve
+    if args.metrics:
+        from . import metrics
+        metrics.enable()
+    serve(args.host, args.port, window_ms=args.window_ms, max_batch=args.max_batch,
+          max_pending=args.max_pending, max_bulk=args.max_bulk)
+    return 0
+
+
+def cmd_aggregate(args):
+    import json
+
+    from .aggregate import Aggregate, aggregate_file, format_report
+
+    agg = Aggregate()
+    mapping = _parse_mapping(args.map)
+    for path in args.inputs:
+        if path.endswith(".json"):
+            agg.merge(Aggregate.load(path))
+        else:
+            aggregate_file(path, mapping, args.delimiter, args.chunk_rows,
+                           args.workers or default_workers(), into=agg)
+    if args.save:
+        agg.save(args.save)
+    report = agg.report()
+    text = json.dumps(report, indent=2) + "\n" if args.format == "json" else format_report(report)
+    if args.output == "-":
+        sys.stdout.write(text)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    return 0
+
+
+def cmd_hl7(args):
+    from . import hl7
+
+    if not args.inputs and args.listen is None:
+        raise ValueError("give HL7 files to read or --listen PORT")
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    stats = hl7.IngestStats()
+    try:
+        if args.inputs:
+            hl7.ingest_files(args.inputs, out, args.batch_rows, stats)
+        if args.listen is not None:
+            hl7.listen(args.host, args.listen, out, args.batch_rows, stats)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    summary = stats.summary()
+    print(f"{summary['messages']:,} messages, {summary['panels']:,} panels, "
+          f"{summary['malformed']:,} malformed in {summary['seconds']:.2f} s "
+          f"({summary['messages_per_sec']:,.0f} messages/s)", file=sys.stderr)
+    for reason, n in sorted(summary["reasons"].items()):
+        print(f"  {reason}: {n:,}", file=sys.stderr)
+    if summary["connection_errors"]:
+        print(f"  connection errors: {summary['connection_errors']:,}", file=sys.stderr)
+    return 0
+
+
+def cmd_export(args):
+    from .export import export_reports
+
+    stats = export_reports(args.input, args.output, args.title, _parse_mapping(args.map),
+                           args.delimiter, args.chunk_rows, args.document_title)
+    rate = stats["reports"] / stats["seconds"] if stats["seconds"] else 0.0
+    print(f"{stats['reports']:,} reports ({stats['invalid']:,} invalid rows skipped) "
+          f"in {stats['seconds']:.2f} s ({rate:,.0f} reports/s) -> {args.output}",
+          file=sys.stderr)
+    return 0
+
+
+def _duration(seconds):
+    if seconds is None:
+        return "-"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+
+
+def cmd_jobs(args):
+    from . import jobs
+
+    if args.action == "work":
+        jobs.run_workers(args.workers or default_workers(), args.db, idle_exit=args.exit_when_idle,
+                         log=sys.stderr)
+        return 0
+
+    with jobs.JobQueue(args.db) as queue:
+        if args.action == "submit":
+            job_id = queue.submit(args.input, args.output, fmt=args.format,
+                                  delimiter=args.delimiter, mapping=_parse_mapping(args.map),
+                                  keep=tuple(args.keep or ()),
+                                  chunk_bytes=int(args.chunk_mb * 2**20))
+            job = queue.job(job_id)
+            print(f"job {job_id}: {job['chunks']} chunks queued")
+        elif args.action in ("cancel", "retry"):
+            changed = getattr(queue, args.action)(args.job)
+            done = {"cancel": "cancelled", "retry": "requeued"}[args.action]
+            print(f"job {args.job}: {done if changed else 'unchanged'}")
+        else:
+            rows = queue.status(args.job)
+            if args.json:
+                import json
+                print(json.dumps(rows, indent=2))
+                return 0
+            print(f"{'job':>4}  {'state':<10} {'done':>6} {'rows':>12} {'rows/s':>9} "
+                  f"{'elapsed':>8} {'eta':>8}  input")
+            for job in rows:
+                print(f"{job['id']:>4}  {job['state']:<10} {job['pct']:>5.1f}% {job['rows_done']:>12,} "
+                      f"{job['rows_per_sec']:>9,} {_duration(job['elapsed_seconds']):>8} "
+                      f"{_duration(job['eta_seconds']):>8}  {job['input']}")
+                if job["error"]:
+                    print(f"      {job['error']}")
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m cbc_expert",
+                                     description="CBC interpretation tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("interpret", help="stream a CSV/TSV export through interpret_cbc")
+    p.add_argument("input", help="CSV or TSV file (.tsv/.tab are read tab-separated)")
+    p.add_argument("-o", "--output", default="-", help="output file, '-' for stdout")
+    p.add_argument("--format", choices=("csv", "jsonl"),
+                   help="output format (default: from the output extension, else csv)")
+    p.add_argument("--delimiter", help="input delimiter (default: from the extension)")
+    p.add_argument("--map", action="append", metavar="FIELD=COLUMN",
+                   help="column for an input field, e.g. hgb=HGB_G_DL (repeatable)")
+    p.add_argument("--keep", action="append", metavar="COLUMN",
+                   help="input column copied through to the output (repeatable)")
+    p.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                   help="rows per block; also the shard handed to each worker")
+    p.add_argument("-j", "--workers", type=int, default=1,
+                   help="worker processes (0 = one per CPU)")
+    p.add_argument("--start-offset", type=int,
+                   help="resume from this byte offset (as reported in progress lines)")
+    p.add_argument("--checkpoint", help="file recording the last completed offset; "
+                                        "an existing checkpoint is resumed from")
+    p.add_argument("-q", "--quiet", action="store_true", help="no per-chunk progress")
+    p.set_defaults(func=cmd_interpret)
+
+    from .service import DEFAULT_PORT
+    p = sub.add_parser("serve", help="run the local HTTP interpretation service")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=DEFAULT_PORT)
+    p.add_argument("--window-ms", type=float, default=2.0,
+                   help="how long to wait for concurrent panels to join a batch")
+    p.add_argument("--max-batch", type=int, default=4096, help="panels per evaluation")
+    p.add_argument("--max-pending", type=int, default=50_000,
+                   help="queued panels before requests are refused with 503")
+    p.add_argument("--max-bulk", type=int, default=10_000, help="panels per bulk request")
+    p.add_argument("--metrics", action="store_true",
+                   help="collect timings and pattern counts for GET /metrics "
+                        "(also enabled by CBC_METRICS=1)")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser("aggregate", help="pattern prevalence, workup frequency and analyte "
+                                         "distributions over CSV/TSV exports")
+    p.add_argument("inputs", nargs="+", metavar="INPUT",
+                   help="CSV/TSV export, or a .json partial written by --save")
+    p.add_argument("-o", "--output", default="-", help="report file, '-' for stdout")
+    p.add_argument("--format", choices=("text", "json"), default="text")
+    p.add_argument("--save", metavar="PARTIAL",
+                   help="also write the merged aggregate as a .json partial for later merging")
+    p.add_argument("--delimiter", help="input delimiter (default: from the extension)")
+    p.add_argument("--map", action="append", metavar="FIELD=COLUMN",
+                   help="column for an input field, e.g. hgb=HGB_G_DL (repeatable)")
+    p.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+                   help="rows per block; also the shard handed to each worker")
+    p.add_argument("-j", "--workers", type=int, default=1,
+                   help="worker processes (0 = one per CPU)")
+    p.set_defaults(func=cmd_aggregate)
+
+    from .hl7 import DEFAULT_BATCH_ROWS, DEFAULT_MLLP_PORT
+    p = sub.add_parser("hl7", help="interpret HL7 v2 ORU^R01 messages from files or MLLP")
+    p.add_argument("inputs", nargs="*", metavar="INPUT",
+                   help="files of ORU^R01 messages (plain or MLLP-framed)")
+    p.add_argument("--listen", type=int, nargs="?", const=DEFAULT_MLLP_PORT, metavar="PORT",
+                   help=f"accept MLLP connections (default port {DEFAULT_MLLP_PORT}) and "
+                        "acknowledge each message")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("-o", "--output", default="-", help="JSON Lines output, '-' for stdout")
+    p.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS,
+                   help="panels per batched interpretation")
+    p.set_defaults(func=cmd_hl7)
+
+    p = sub.add_parser("export", help="printable per-patient reports as a ZIP or one HTML file")
+    p.add_argument("input", help="CSV/TSV export")
+    p.add_argument("-o", "--output", required=True,
+                   help="a .zip gets one HTML file per patient; otherwise one paginated document")
+    p.add_argument("--title", metavar="COLUMN",
+                   help="source column for report titles (default: patient_id, mrn or id if present)")
+    p.add_argument("--document-title", default="CBC Interpretation Report")
+    p.add_argument("--delimiter", help="input delimiter (default: from the extension)")
+    p.add_argument("--map", action="append", metavar="FIELD=COLUMN",
+                   help="column for an input field, e.g. hgb=HGB_G_DL (repeatable)")
+    p.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="rows per block")
+    p.set_defaults(func=cmd_export)
+
+    from .jobs import DEFAULT_CHUNK_BYTES, DEFAULT_DB
+    p = sub.add_parser("jobs", help="persistent, resumable bulk-interpretation job queue")
+    p.add_argument("--db", default=DEFAULT_DB, help="queue database (default: $CBC_JOBS_DB)")
+    p.set_defaults(func=cmd_jobs)
+    actions = p.add_subparsers(dest="action", required=True)
+    a = actions.add_parser("submit", help="queue a CSV/TSV export")
+    a.add_argument("input")
+    a.add_argument("-o", "--output", required=True, help="result file (.jsonl for JSON Lines)")
+    a.add_argument("--format", choices=("csv", "jsonl"))
+    a.add_argument("--delimiter", help="input delimiter (default: from the extension)")
+    a.add_argument("--map", action="append", metavar="FIELD=COLUMN",
+                   help="column for an input field, e.g. hgb=HGB_G_DL (repeatable)")
+    a.add_argument("--keep", action="append", metavar="COLUMN",
+                   help="input column copied through to the output (repeatable)")
+    a.add_argument("--chunk-mb", type=float, default=DEFAULT_CHUNK_BYTES / 2**20,
+                   help="chunk size; the unit of work claimed and checkpointed")
+    a = actions.add_parser("work", help="run worker processes")
+    a.add_argument("-j", "--workers", type=int, default=1,
+                   help="worker processes (0 = one per CPU)")
+    a.add_argument("--exit-when-idle", action="store_true",
+                   help="exit once no work is left instead of polling")
+    a = actions.add_parser("status", help="progress, rows/s and ETA")
+    a.add_argument("job", type=int, nargs="?")
+    a.add_argument("--json", action="store_true")
+    for action in ("cancel", "retry"):
+        a = actions.add_parser(action, help=f"{action} a job")
+        a.add_argument("job", type=int)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        return args.func(args)
+    except ValueError as exc:
+        parser.error(str(exc))
@@ -0,0 +1,429 @@
+"""Rule compiler and the scalar interpret_cbc entry point."""
+
+import operator
+import time
+from string import Formatter
+
+from . import metrics
+from .rules import PREDICATES, REFERENCE_LIMITS, RULES, WORKUP_ITEMS, reference_limits
+
+
+# ──────────────────────────────────────────────
+# RULE COMPILER
+# ──────────────────────────────────────────────
+
+OPERATORS = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+INPUT_FIELDS = ("hgb", "mcv", "wbc", "neutrophil_pct", "platelets", "sex")
+
+# Bits available in the batch path's arrays: pattern codes are uint16 and
+# workup masks at most uint64 (cbc_expert.batch).
+MAX_PATTERNS = 16
+MAX_WORKUP_ITEMS = 64
+
+
+class CompiledRules:
+    """
+    Evaluation plan for a rule table. Every distinct (field, op, limit)
+    check is evaluated once per input and shared by all rules using it.
+
+    Results are carried as two integers:
+        pattern code : bit i set when patterns[i] fired
+        workup mask  : bit j set when workup_catalog[j] is suggested, already
+                       de-duplicated by label
+
+    Raises ValueError for a table with more patterns or workup items than
+    the batch path's arrays have bits (MAX_PATTERNS, MAX_WORKUP_ITEMS).
+    """
+
+    def __init__(self, rules, predicates, workup_items):
+        checks, check_index = [], {}
+        for key in predicates.values():
+            if key not in check_index:
+                check_index[key] = len(checks)
+                checks.append(key)
+        self.checks = tuple(checks)
+
+        groups, patterns, catalog, item_bit = {}, [], [], {}
+        self.steps = []
+        block_names = []
+        for rule in rules:
+            need = 0
+            for name in rule.get("when", ()):
+                need |= 1 << check_index[predicates[name]]
+            group = rule.get("group")
+            if group is not None and group not in groups:
+                groups[group] = len(groups)
+            pattern_bit = 0
+            if rule.get("pattern"):
+                pattern_bit = 1 << len(patterns)
+                patterns.append(rule["pattern"])
+            elif group is None or rule.get("when"):
+                # Keeps the pattern code a complete signature of what fired.
+                raise ValueError("a rule without a pattern must be a group's else branch")
+            workup_mask = 0
+            for item_id in rule.get("workup", ()):
+                if item_id not in item_bit:
+                    item_bit[item_id] = 1 << len(catalog)
+                    catalog.append(item_id)
+                workup_mask |= item_bit[item_id]
+            self.steps.append((
+                need,
+                None if group is None else 1 << groups[group],
+                rule.get("fallback", False),
+                pattern_bit,
+                workup_mask,
+                rule.get("summary"),
+            ))
+            block_names.append(group or (rule.get("pattern") or ("ungrouped",))[0])
+
+        # Consecutive steps of one group (or a lone rule) form a rule block;
+        # only the instrumented evaluate_timed() walks them this way.
+        self.blocks = []
+        for name, step in zip(block_names, self.steps):
+            if self.blocks and self.blocks[-1][0] == name:
+                self.blocks[-1][1].append(step)
+            else:
+                self.blocks.append((name, [step]))
+
+        if len(patterns) > MAX_PATTERNS:
+            raise ValueError(f"{len(patterns)} patterns; pattern codes hold at most {MAX_PATTERNS}")
+        if len(catalog) > MAX_WORKUP_ITEMS:
+            raise ValueError(f"{len(catalog)} workup items; workup masks hold at most "
+                             f"{MAX_WORKUP_ITEMS}")
+
+        # Interned catalog: small integer IDs are bit positions.
+        self.patterns = tuple(patterns)
+        self.pattern_ids = {label: i for i, (label, _) in enumerate(patterns)}
+        self.workup_ids = {item_id: j for j, item_id in enumerate(catalog)}
+        self.workup_catalog = tuple(workup_items[item_id] for item_id in catalog)
+
+        # Items sharing a label with an earlier item, as (bit, earlier bits).
+        # De-duplication by label is then a couple of mask operations: the
+        # later item is cleared whenever an earlier one is set.
+        first_by_label, shadowed = {}, []
+        for j, item in enumerate(self.workup_catalog):
+            earlier = first_by_label.get(item["label"], 0)
+            if earlier:
+                shadowed.append((1 << j, earlier))
+            first_by_label[item["label"]] = earlier | (1 << j)
+        self.shadowed = tuple(shadowed)
+
+        # Decoded results per code / mask; callers get fresh copies.
+        self._deduped = _Memo(self._dedupe)
+        self._patterns_of = _Memo(lambda code: tuple(
+            p for i, p in enumerate(self.patterns) if code >> i & 1))
+        self._workup_of = _Memo(lambda mask: tuple(
+            item for j, item in enumerate(self.workup_catalog) if mask >> j & 1))
+        self._templates_of = _Memo(lambda code: tuple(self._summary_templates(code)))
+        # Raw (not yet de-duplicated) mask -> catalog items to report.
+        self._workup_items = _Memo(lambda mask: self._workup_of[self._deduped[mask]])
+
+        # The scalar path runs as generated straight-line code (see
+        # scalar_source): comparisons inline, one if/elif chain per group
+        # and f-strings for the fired rules' summaries.
+        self.scalar_codes = self._compile(self.scalar_source(False), "scalar_codes")
+        self.scalar_interpret = self._compile(self.scalar_source(True), "scalar_interpret")
+
+    def _compile(self, source, name):
+        namespace = {"_deduped": self._deduped, "_patterns_of": self._patterns_of,
+                     "_workup_items": self._workup_items}
+        exec(compile(source, f"<cbc-rules:{name}>", "exec"), namespace)
+        return namespace[name]
+
+    def specialise(self, limits):
+        """
+        scalar_interpret with one limits dict built in, called without it.
+        The values are read once, here, so later edits to the dict are
+        not seen; meant for fixed tables such as REFERENCE_LIMITS.
+        """
+        return self._compile(self.scalar_source(True, limits), "scalar_interpret")
+
+    # ── Code generation ────────────────────────────────────────────────────
+    def scalar_source(self, summaries, limits=None):
+        """
+        Python source for the plan, specialised to straight-line code:
+
+            scalar_codes(hgb, mcv, wbc, neutrophil_pct, platelets, sex, limits)
+                -> (pattern_code, workup_mask)
+            scalar_interpret(...same...)
+                -> (patterns, summaries, workup) as returned by interpret_cbc
+
+        Given limits, their values are written in as constants and the
+        function drops its limits argument (see specialise). Summary
+        templates become f-strings over the inputs, the limits and
+        neutrophil_abs, so their fields must be plain names.
+        """
+        name = "scalar_interpret" if summaries else "scalar_codes"
+        params = ", ".join(INPUT_FIELDS) + ("" if limits is not None else ", limits")
+        lines = [f"def {name}({params}):"]
+        used_limits = {limit for _, _, limit in self.checks}
+        if summaries:
+            for *_, summary in self.steps:
+                used_limits.update(_template_names(summary) - set(INPUT_FIELDS) - {"neutrophil_abs"})
+        for limit in sorted(used_limits):
+            if not limit.isidentifier() or limit in INPUT_FIELDS:
+                raise ValueError(f"reference limit {limit!r} cannot be a local name")
+            if limits is None:
+                lines.append(f"    {limit} = limits[{limit!r}]")
+            elif isinstance(limits[limit], (int, float)):
+                lines.append(f"    {limit} = {limits[limit]!r}")
+            else:
+                raise ValueError(f"reference limit {limit!r} must be a number")
+        # scalar_interpret collects the pattern tuples as it goes (and tests
+        # the list for the fallback) instead of building a code to decode.
+        lines.append("    patterns, summaries, workup = [], [], 0" if summaries
+                     else "    code = workup = 0")
+        body_start = len(lines)
+
+        runs = []                 # consecutive steps of one group (or a lone rule)
+        for step in self.steps:
+            if runs and step[1] is not None and runs[-1][0][1] == step[1]:
+                runs[-1].append(step)
+            else:
+                runs.append([step])
+        split = {g for g in {run[0][1] for run in runs if run[0][1]}
+                 if sum(run[0][1] == g for run in runs) > 1}
+
+        for run in runs:
+            group_bit = run[0][1]
+            indent = "    "
+            if group_bit in split:
+                lines.append(f"    if not taken & {group_bit}:")
+                indent = "        "
+            for k, (need, _, fallback, pattern_bit, workup_mask, summary) in enumerate(run):
+                if fallback:
+                    head = "if not patterns:" if summaries else "if not code:"
+                elif need == 0:
+                    head = "else:" if k else "if True:"
+                else:
+                    head = ("elif " if k else "if ") + " and ".join(
+                        f"{field} {op} {limit}"
+                        for j, (field, op, limit) in enumerate(self.checks) if need >> j & 1) + ":"
+                body = []
+                if group_bit in split:
+                    body.append(f"taken |= {group_bit}")
+                if pattern_bit and summaries:
+                    body += [f"patterns.append({p!r})" for p in self._patterns_of[pattern_bit]]
+                elif pattern_bit:
+                    body.append(f"code |= {pattern_bit}")
+                if workup_mask:
+                    body.append(f"workup |= {workup_mask}")
+                if summaries and summary:
+                    if "neutrophil_abs" in _template_names(summary):
+                        body.append("neutrophil_abs = wbc * (neutrophil_pct / 100)")
+                    body.append(f"summaries.append(f{summary!r})")
+                lines.append(indent + head)
+                lines += [indent + "    " + line for line in body or ["pass"]]
+        if split:
+            lines.insert(body_start, "    taken = 0")
+        if summaries:
+            lines.append("    if not workup:")
+            lines.append("        return patterns, summaries, []")
+            lines.append("    return patterns, summaries, [item.copy() for item in _workup_items[workup]]")
+        else:
+            lines.append("    return code, _deduped[workup]")
+        return "\n".join(lines) + "\n"
+
+    # ── Scalar path ────────────────────────────────────────────────────────
+    def evaluate(self, values, limits):
+        """Returns (pattern_code, workup_mask, summary_templates) for one panel."""
+        code, workup = self.scalar_codes(*(values[f] for f in INPUT_FIELDS), limits)
+        return code, workup, list(self._templates_of[code])
+
+    def evaluate_reference(self, values, limits):
+        """evaluate() by walking the plan; the definition the generated code follows."""
+        truth = 0
+        for k, (field, op, limit) in enumerate(self.checks):
+            if OPERATORS[op](values[field], limits[limit]):
+                truth |= 1 << k
+
+        code = workup = taken = 0
+        summaries = []
+        for need, group_bit, fallback, pattern_bit, workup_mask, summary in self.steps:
+            if fallback:
+                if code:
+                    continue
+            elif (group_bit and taken & group_bit) or truth & need != need:
+                continue
+            if group_bit:
+                taken |= group_bit
+            code |= pattern_bit
+            workup |= workup_mask
+            if summary:
+                summaries.append(summary)
+        return code, self.dedupe(workup), summaries
+
+    def evaluate_timed(self, values, limits, observe):
+        """
+        evaluate() that reports the seconds spent in each rule block to
+        observe(block, seconds); the shared threshold checks are reported as
+        block "checks".
+        """
+        clock = time.perf_counter
+        started = clock()
+        truth = 0
+        for k, (field, op, limit) in enumerate(self.checks):
+            if OPERATORS[op](values[field], limits[limit]):
+                truth |= 1 << k
+        observe("checks", clock() - started)
+
+        code = workup = taken = 0
+        summaries = []
+        for block, steps in self.blocks:
+            started = clock()
+            for need, group_bit, fallback, pattern_bit, workup_mask, summary in steps:
+                if fallback:
+                    if code:
+                        continue
+                elif (group_bit and taken & group_bit) or truth & need != need:
+                    continue
+                if group_bit:
+                    taken |= group_bit
+                code |= pattern_bit
+                workup |= workup_mask
+                if summary:
+                    summaries.append(summary)
+            observe(block, clock() - started)
+        return code, self.dedupe(workup), summaries
+
+    def dedupe(self, mask):
+        """Clear workup bits whose label is already carried by an earlier bit."""
+        return self._deduped[int(mask)]
+
+    def _dedupe(self, mask):
+        for bit, earlier in self.shadowed:
+            if mask & earlier:
+                mask &= ~bit
+        return mask
+
+    # ── Decoding ───────────────────────────────────────────────────────────
+    def summary_templates(self, code):
+        """Summary templates of the rules that produced a pattern code."""
+        return list(self._templates_of[int(code)])
+
+    def _summary_templates(self, code):
+        taken = 0
+        summaries = []
+        for _, group_bit, _, pattern_bit, _, summary in self.steps:
+            if pattern_bit:
+                if not code & pattern_bit:
+                    continue
+            elif taken & group_bit:
+                continue
+            if group_bit:
+                taken |= group_bit
+            if summary:
+                summaries.append(summary)
+        return summaries
+
+    def decode_patterns(self, code):
+        return list(self._patterns_of[int(code)])
+
+    def decode_workup(self, mask):
+        """Fresh dicts, so callers may edit them without touching the catalog."""
+        return [item.copy() for item in self._workup_of[self._deduped[int(mask)]]]
+
+
+class _Memo(dict):
+    """dict that fills a missing key from fn(key); bounded by the plan's outcomes."""
+
+    def __init__(self, fn):
+        super().__init__()
+        self.fn = fn
+
+    def __missing__(self, key):
+        value = self[key] = self.fn(key)
+        return value
+
+
+def _template_names(template):
+    if not template:
+        return set()
+    names = {field for _, field, _, _ in Formatter().parse(template) if field is not None}
+    if not all(name.isidentifier() for name in names):
+        raise ValueError(f"summary template fields must be plain names: {template!r}")
+    return names
+
+
+def compile_rules(rules=RULES, predicates=PREDICATES, workup_items=WORKUP_ITEMS):
+    return CompiledRules(rules, predicates, workup_items)
+
+
+CBC_RULES = compile_rules()
+_scalar_interpret = CBC_RULES.scalar_interpret
+# interpret_cbc's adult path, one function per sex with its limits as constants
+_ADULT_INTERPRET = {sex: CBC_RULES.specialise(limits) for sex, limits in REFERENCE_LIMITS.items()}
+PATTERNS = CBC_RULES.patterns
+WORKUP_CATALOG = CBC_RULES.workup_catalog
+
+
+# ──────────────────────────────────────────────
+# CLINICAL LOGIC ENGINE
+# ──────────────────────────────────────────────
+
+def interpret_cbc(hgb, mcv, wbc, neutrophil_pct, platelets, sex, age=None, lab=None):
+    """
+    age (years) and lab select a reference-range profile (cbc_expert.ranges);
+    without them the adult REFERENCE_LIMITS apply.
+
+    Returns:
+        patterns  : list of (label, color_key)
+        summaries : list of HTML strings
+        workup    : list of dicts {label, reason, priority}
+    """
+    if age is None and lab is None and not metrics.ENABLED:
+        return _ADULT_INTERPRET["Female" if sex == "Female" else "Male"](
+            hgb, mcv, wbc, neutrophil_pct, platelets, sex)
+    limits = reference_limits(sex, age, lab)
+    if metrics.ENABLED:
+        values = {"hgb": hgb, "mcv": mcv, "wbc": wbc,
+                  "neutrophil_pct": neutrophil_pct, "platelets": platelets, "sex": sex}
+        return _interpret_cbc_instrumented(values, limits)
+    return _scalar_interpret(hgb, mcv, wbc, neutrophil_pct, platelets, sex, limits)
+
+
+def _observe_block(block, seconds):
+    metrics.rule_block_seconds.observe(seconds, (block,))
+
+
+def _interpret_cbc_instrumented(values, limits):
+    started = time.perf_counter()
+    code, workup, templates = CBC_RULES.evaluate_timed(values, limits, _observe_block)
+    summaries = _format_summaries(templates, values, limits)
+    result = CBC_RULES.decode_patterns(code), summaries, CBC_RULES.decode_workup(workup)
+    metrics.interpret_seconds.observe(time.perf_counter() - started, ("scalar",))
+    metrics.record_result(CBC_RULES, code, workup)
+    return result
+
+
+def interpret_cbc_compact(hgb, mcv, wbc, neutrophil_pct, platelets, sex, age=None, lab=None):
+    """interpret_cbc without summaries or label lookups; returns a CBCResult."""
+    from .results import CBCResult
+    code, workup = CBC_RULES.scalar_codes(hgb, mcv, wbc, neutrophil_pct, platelets, sex,
+                                          reference_limits(sex, age, lab))
+    return CBCResult(code, workup)
+
+
+def _format_summaries(templates, values, limits):
+    fields = dict(values, **limits,
+                  neutrophil_abs=values["wbc"] * (values["neutrophil_pct"] / 100))
+    return [t.format(**fields) for t in templates]
+
+
+def render_summaries(code, hgb, mcv, wbc, neutrophil_pct, platelets, sex, age=None, lab=None):
+    """Summary HTML strings for a pattern code from the batch path."""
+    values = {"hgb": hgb, "mcv": mcv, "wbc": wbc,
+              "neutrophil_pct": neutrophil_pct, "platelets": platelets, "sex": sex}
+    return _format_summaries(CBC_RULES.summary_templates(code), values,
+                             reference_limits(sex, age, lab))
+
+
+def decode_patterns(code):
+    """Pattern code -> list of (label, color_key), as returned by interpret_cbc."""
+    return CBC_RULES.decode_patterns(code)
+
+
+def decode_workup(mask):
+    """Workup mask -> de-duplicated list of workup dicts, as returned by interpret_cbc."""
+    return CBC_RULES.decode_workup(mask)
@@ -0,0 +1,187 @@
+"""
+Printable per-patient reports for a whole batch, streamed to disk.
+
+    python -m cbc_expert export ward.csv -o reports.zip --title patient_id
+
+Reports are the dashboard cards (CardRenderer.report_section) rendered
+lazily, one interpreted block at a time, and written as they are produced,
+so memory stays at one block of panels whatever the file size. Two outputs:
+
+    .html  one document, stylesheet in the head once, one report per
+           printed page
+    .zip   one HTML file per patient linking a single report.css
+
+Identical results share the renderer's cached workup cards and badge rows,
+so a report costs a template fill plus the write.
+"""
+
+import html
+import re
+import time
+import zipfile
+
+from .cards import REPORT_CSS, REPORT_DOCUMENT_TAIL, card_renderer, report_document_head
+from .engine import INPUT_FIELDS
+from .stream import (
+    DEFAULT_CHUNK_ROWS,
+    interpret_chunks,
+    read_chunks,
+)
+from .styles import CSS
+from .upload import INTEGER_FIELDS, row_panel
+
+# Source columns tried, in order, for report titles when none is given.
+TITLE_ALIASES = ("patient_id", "patient", "mrn", "id", "sample_id")
+
+STYLESHEET_NAME = "report.css"
+
+ZIP_DOCUMENT_HEAD = (
+    '<!DOCTYPE html>\n<html lang="en"><head><meta charset="utf-8">'
+    f'<title>{{title}}</title><link rel="stylesheet" href="{STYLESHEET_NAME}"></head><body>\n'
+)
+
+ZIP_COMPRESSLEVEL = 1
+
+
+def resolve_title_column(header, title_column=None):
+    """Index of the column used for report titles, or None (titles are then row numbers)."""
+    index = {name.strip().lower(): i for i, name in enumerate(header)}
+    if title_column:
+        if title_column.strip().lower() not in index:
+            raise ValueError(f"title column {title_column!r} not found; columns are {header}")
+        return index[title_column.strip().lower()]
+    return next((index[name] for name in TITLE_ALIASES if name in index), None)
+
+
+def stylesheet():
+    """The dashboard and report CSS as one stylesheet file, without <style> tags."""
+    return "".join(css.replace("<style>", "").replace("</style>", "").strip() + "\n"
+                   for css in (CSS, REPORT_CSS))
+
+
+def file_name(n, title):
+    """Archive member name: a sequence number keeps names unique and in file order."""
+    slug = re.sub(r"[^A-Za-z0-9._-]+", "_", str(title)).strip("._")[:64]
+    return f"{n:06d}_{slug}.html" if slug else f"{n:06d}.html"
+
+
+# ──────────────────────────────────────────────
+# RENDERING
+# ──────────────────────────────────────────────
+
+def chunk_panels(chunk):
+    """
+    Yields (row index, panel) for the valid rows of an interpret_rows()
+    chunk; panels are shaped like upload.row_panel's, age and lab appended
+    when the file has either column.
+    """
+    values = chunk["values"]
+    columns = [values[f] for f in INPUT_FIELDS[:-1]]
+    integer = [f in INTEGER_FIELDS for f in INPUT_FIELDS[:-1]]
+    has_profile = "age" in values or "lab" in values
+    ages, labs = values.get("age"), values.get("lab")
+    for i, ok in enumerate(chunk["valid"]):
+        if not ok:
+            continue
+        panel = tuple(int(c[i]) if as_int and c[i].is_integer() else c[i]
+                      for c, as_int in zip(columns, integer)) + (values["sex"][i],)
+        if has_profile:
+            age = ages[i] if ages is not None else None
+            panel += (None if age is None or age != age else age,
+                      labs[i] if labs is not None else None)
+        yield i, panel
+
+
+def report_sections(chunks, title_column=None, mapping=None, renderer=None, stats=None):
+    """
+    Yields (title, section_html) for every valid panel of (header, rows,
+    end_offset) chunks. Titles come from title_column (see
+    resolve_title_column) or are "Row N" in file order.
+    """
+    renderer = renderer or card_renderer
+    row = 0
+    title_index = None
+    for n, (chunk, _) in enumerate(interpret_chunks(chunks, mapping)):
+        if n == 0:
+            title_index = resolve_title_column(chunk["header"], title_column)
+        rows, codes, masks = chunk["rows"], chunk["codes"], chunk["masks"]
+        for i, panel in chunk_panels(chunk):
+            if title_index is not None and title_index < len(rows[i]) and rows[i][title_index].strip():
+                title = rows[i][title_index].strip()
+            else:
+                title = f"Row {row + i + 1}"
+            yield title, renderer.report_section(panel, codes[i], masks[i], title)
+        row += len(rows)
+        if stats is not None:
+            stats["rows"] += len(rows)
+            stats["invalid"] += len(rows) - sum(chunk["valid"])
+
+
+def frame_sections(frame, renderer=None):
+    """(title, section_html) for the valid rows of an upload.interpret_upload() frame."""
+    renderer = renderer or card_renderer
+    title_index = resolve_title_column(list(frame.columns))
+    title_column = None if title_index is None else frame.columns[title_index]
+    for n, (_, row) in enumerate(frame.iterrows(), 1):
+        if row["status"] != "ok":
+            continue
+        panel, code, mask = row_panel(row)
+        title = str(row[title_column]).strip() if title_column is not None else ""
+        title = title or f"Row {n}"
+        yield title, renderer.report_section(panel, code, mask, title)
+
+
+# ──────────────────────────────────────────────
+# WRITERS
+# ──────────────────────────────────────────────
+
+def write_html(sections, out, title="CBC Interpretation Report"):
+    """One paginated document on a text stream. Returns the number of reports."""
+    out.write(report_document_head(title))
+    n = 0
+    for _, section in sections:
+        out.write(section)
+        out.write("\n")
+        n += 1
+    out.write(REPORT_DOCUMENT_TAIL)
+    return n
+
+
+def write_zip(sections, out, compresslevel=ZIP_COMPRESSLEVEL):
+    """
+    One HTML file per report plus report.css in a ZIP archive; out is a path
+    or a binary stream. Members are compressed and written one at a time.
+    Returns the number of reports.
+    """
+    stamp = time.localtime()[:6]
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED, compresslevel=compresslevel) as archive:
+        archive.writestr(zipfile.ZipInfo(STYLESHEET_NAME, stamp), stylesheet())
+        n = 0
+        for n, (title, section) in enumerate(sections, 1):
+            info = zipfile.ZipInfo(file_name(n, title), stamp)
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, ZIP_DOCUMENT_HEAD.format(title=html.escape(str(title)))
+                             + section + REPORT_DOCUMENT_TAIL, compresslevel=compresslevel)
+    return n
+
+
+def export_reports(input_path, output_path, title_column=None, mapping=None, delimiter=None,
+                   chunk_rows=DEFAULT_CHUNK_ROWS, document_title="CBC Interpretation Report"):
+    """
+    Stream a CSV/TSV export into reports; a .zip output gets one file per
+    patient, anything else a single HTML document.
+
+    Returns:
+        dict with rows, invalid (skipped), reports and seconds
+    """
+    stats = {"rows": 0, "invalid": 0}
+    started = time.perf_counter()
+    sections = report_sections(read_chunks(input_path, chunk_rows, delimiter), title_column,
+                               mapping, stats=stats)
+    if str(output_path).lower().endswith(".zip"):
+        reports = write_zip(sections, output_path)
+    else:
+        with open(output_path, "w", encoding="utf-8", buffering=2**20) as out:
+            reports = write_html(sections, out, document_title)
+    stats.update(reports=reports, seconds=time.perf_counter() - started)
+    return stats
@@ -0,0 +1,434 @@
+"""
+Streaming ingestion of HL7 v2 ORU^R01 result messages.
+
+    python -m cbc_expert hl7 results.hl7 [-o results.jsonl]
+    python -m cbc_expert hl7 --listen 2575          # MLLP over a local socket
+
+Messages are read from files (mmap'd) or an MLLP byte stream (0x0B ... 0x1C
+0x0D framing) and parsed in place: frames are located with find() and
+fields with precompiled patterns run directly over the shared buffer, so
+only the few values a panel needs (the five OBX results, PID-8 sex, the
+control and patient IDs) are ever copied out.
+Complete panels are collected into columns and interpreted batch_rows at a
+time through interpret_cbc_batch.
+
+A malformed message (no MSH, not ORU^R01, a missing, non-numeric or
+non-finite result, a result in units not in UNIT_DIVISORS, an unsupported
+sex) is counted per reason in IngestStats (and in cbc_hl7_malformed_total
+when metrics are on) and skipped; it never stops the stream.
+"""
+
+import math
+import mmap
+import re
+import sys
+import time
+from functools import lru_cache
+
+from . import metrics
+from .engine import INPUT_FIELDS
+from .stream import pattern_labels, workup_labels
+
+DEFAULT_BATCH_ROWS = 4096
+DEFAULT_MLLP_PORT = 2575
+
+# OBX-3 identifier (LOINC) -> input field.
+LOINC_CODES = {
+    b"718-7":  "hgb",               # Hemoglobin [Mass/volume] in Blood
+    b"787-2":  "mcv",               # MCV [Entitic volume]
+    b"6690-2": "wbc",               # Leukocytes [#/volume] in Blood
+    b"770-8":  "neutrophil_pct",    # Neutrophils/100 leukocytes in Blood
+    b"777-3":  "platelets",         # Platelets [#/volume] in Blood
+}
+
+# Accepted OBX-6 units per field (first component, compared case-insensitively)
+# and the divisor converting each to the units the rules use. Any other unit,
+# or none, rejects the message rather than being read as the rule units.
+_COUNT_UNITS = {b"10*3/ul": 1, b"10^3/ul": 1, b"10*9/l": 1, b"10^9/l": 1,
+                b"x10e3/ul": 1, b"x10e9/l": 1, b"k/ul": 1, b"10*3/mm3": 1}
+UNIT_DIVISORS = {
+    "hgb": {b"g/dl": 1, b"g/l": 10},
+    "mcv": {b"fl": 1, b"um3": 1},
+    "wbc": _COUNT_UNITS,
+    "neutrophil_pct": {b"%": 1},
+    "platelets": _COUNT_UNITS,
+}
+
+# PID-8 administrative sex.
+HL7_SEX = {ord("F"): "Female", ord("M"): "Male"}
+
+# OBX-11 statuses whose value must not be used (cannot obtain, deleted, wrong).
+VOID_STATUSES = (b"X", b"D", b"W")
+
+START_BLOCK, END_BLOCK = b"\x0b", b"\x1c\r"
+
+hl7_malformed_total = metrics.REGISTRY.counter(
+    "cbc_hl7_malformed_total", "HL7 messages skipped as malformed.", ("reason",))
+
+
+class MalformedMessage(ValueError):
+    pass
+
+
+class IngestStats:
+
+    def __init__(self):
+        self.messages = 0
+        self.panels = 0
+        self.malformed = {}
+        self.connection_errors = 0
+        self.started = time.perf_counter()
+
+    def reject(self, reason):
+        self.malformed[reason] = self.malformed.get(reason, 0) + 1
+        if metrics.ENABLED:
+            hl7_malformed_total.inc((reason,))
+
+    def drain_into(self, other):
+        """Add these counts to other and zero them (one connection's share)."""
+        other.messages += self.messages
+        other.panels += self.panels
+        other.connection_errors += self.connection_errors
+        for reason, n in self.malformed.items():
+            other.malformed[reason] = other.malformed.get(reason, 0) + n
+        self.messages = self.panels = self.connection_errors = 0
+        self.malformed = {}
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        return {"messages": self.messages, "panels": self.panels,
+                "malformed": sum(self.malformed.values()), "reasons": dict(self.malformed),
+                "connection_errors": self.connection_errors,
+                "seconds": elapsed, "messages_per_sec": self.messages / elapsed}
+
+
+# ──────────────────────────────────────────────
+# FRAMING
+# ──────────────────────────────────────────────
+
+def message_spans(data, start=0, end=None):
+    """
+    Yields (start, end) of each message in data (bytes, bytearray or mmap):
+    MLLP blocks when the first byte is 0x0B, otherwise messages that begin
+    with an "MSH" segment, as in a plain file dump.
+    """
+    end = len(data) if end is None else end
+    while start < end and data[start] in b" \t\r\n":
+        start += 1
+    if start >= end:
+        return
+    if data[start] == START_BLOCK[0]:
+        while start < end:
+            first = data.find(START_BLOCK, start, end)
+            if first < 0:
+                return
+            last = data.find(END_BLOCK, first + 1, end)
+            if last < 0:
+                # Truncated final block: hand it to the parser, which rejects it.
+                yield first + 1, end
+                return
+            yield first + 1, last
+            start = last + 2
+        return
+
+    while start < end:
+        following = _next_msh(data, start + 3, end)
+        yield start, following
+        start = following
+
+
+def _next_msh(data, pos, end):
+    """Offset of the next MSH at a segment start, or end."""
+    while True:
+        i = data.find(b"MSH", pos, end)
+        if i < 0:
+            return end
+        if data[i - 1] in b"\r\n":
+            return i
+        pos = i + 3
+
+
+def file_spans(path):
+    """Yields (buffer, start, end) for every message in a file, mapped read-only."""
+    with open(path, "rb") as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:      # empty file
+            return
+        with data:
+            for start, end in message_spans(data):
+                yield data, start, end
+
+
+def mllp_spans(read, chunk_size=65536):
+    """
+    MLLP frames from read(n) calls (a socket's recv or a binary file's read).
+    Yields (buffer, start, end) per complete frame, then None whenever the
+    input has been drained for now, so callers can flush partial batches.
+    A span is only valid until the generator is resumed.
+    """
+    buf = bytearray()
+    while True:
+        chunk = read(chunk_size)
+        if not chunk:
+            break
+        buf += chunk
+        start = 0
+        while True:
+            first = buf.find(START_BLOCK, start)
+            if first < 0:
+                start = len(buf)
+                break
+            last = buf.find(END_BLOCK, first + 1)
+            if last < 0:
+                start = first
+                break
+            yield buf, first + 1, last
+            start = last + 2
+        del buf[:start]
+        yield None
+
+
+# ──────────────────────────────────────────────
+# PARSING
+# ──────────────────────────────────────────────
+
+@lru_cache(maxsize=None)
+def segment_patterns(sep=b"|", comp=b"^"):
+    """
+    Compiled patterns for the MSH, PID and OBX fields a panel needs, for the
+    message's field and component separators. re scans the buffer in place
+    (bytes, bytearray or mmap); only the captured groups are copied out.
+    """
+    s, c = re.escape(sep), re.escape(comp)
+    field = b"[^" + s + b"\r\n]*"
+    first = b"([^" + s + c + b"\r\n]*)" + field       # a field's first component, captured
+    msh = re.compile(b"MSH" + s + field + (s + field) * 6 + s + first + s + b"(" + field + b")")
+    pid = re.compile(b"(?<=[\r\n])PID" + s + field + s + field + s + first
+                     + (s + field) * 4 + s + b"(" + field + b")")
+    obx = re.compile(b"(?<=[\r\n])OBX" + s + field + s + field + s + first + s + field + s
+                     + b"(" + field + b")" + s + first
+                     + b"(?:" + (s + field) * 4 + s + b"(" + field + b"))?")
+    return msh, pid, obx
+
+
+def parse_message(data, start=0, end=None):
+    """
+    One ORU^R01 message -> (control_id, patient_id, panel) where panel is an
+    INPUT_FIELDS tuple. Raises MalformedMessage with a short reason.
+    """
+    end = len(data) if end is None else end
+    # Slices rather than startswith(): mmap buffers only support find().
+    if end - start < 8 or data[start:start + 3] != b"MSH":
+        raise MalformedMessage("no MSH segment")
+    msh, pid, obx = segment_patterns(bytes(data[start + 3:start + 4]), bytes(data[start + 4:start + 5]))
+
+    m = msh.match(data, start, end)
+    if m is None:
+        raise MalformedMessage("short MSH segment")
+    # MSH-9 is message code ^ trigger event; the pattern captured the code.
+    if m[1] != b"ORU" or data[m.end(1) + 1:m.end(1) + 4] != b"R01":
+        raise MalformedMessage("not ORU^R01")
+    control_id = m[2].decode("ascii", "replace")
+
+    m = pid.search(data, start, end)
+    if m is None:
+        raise MalformedMessage("missing PID sex")
+    patient_id = m[1].decode("utf-8", "replace")
+    sex = HL7_SEX.get(m[2][0]) if len(m[2]) == 1 else None
+    if sex is None:
+        raise MalformedMessage("unsupported sex")
+
+    results = {}
+    for m in obx.finditer(data, start, end):
+        code, value, units, status = m.groups()
+        field = LOINC_CODES.get(code)
+        if field is None or status in VOID_STATUSES:
+            continue
+        try:
+            value = float(value)
+        except ValueError:
+            raise MalformedMessage(f"bad {field} value") from None
+        if not math.isfinite(value):
+            raise MalformedMessage(f"bad {field} value")
+        divisor = UNIT_DIVISORS[field].get(units.lower())
+        if divisor is None:
+            raise MalformedMessage(f"bad {field} units")
+        results[field] = value / divisor if divisor != 1 else value
+
+    if len(results) < len(INPUT_FIELDS) - 1:
+        missing = next(f for f in INPUT_FIELDS[:-1] if f not in results)
+        raise MalformedMessage(f"missing {missing}")
+    return control_id, patient_id, (results["hgb"], results["mcv"], results["wbc"],
+                                    results["neutrophil_pct"], results["platelets"], sex)
+
+
+# ──────────────────────────────────────────────
+# INTERPRETING
+# ──────────────────────────────────────────────
+
+def interpret_messages(spans, batch_rows=DEFAULT_BATCH_ROWS, stats=None, on_message=None):
+    """
+    Parse (buffer, start, end) spans and interpret complete panels in
+    batches. A None span flushes the pending batch early. on_message, if
+    given, is called as on_message(control_id, reason) for every message,
+    reason being None when it was accepted.
+
+    Yields batch dicts:
+        control_ids, patient_ids : lists of str
+        values       : field -> list
+        codes, masks : pattern codes and workup masks (ints)
+    """
+    from .batch import interpret_cbc_batch
+
+    stats = stats if stats is not None else IngestStats()
+    ids, patients, panels = [], [], []
+
+    def flush():
+        columns = list(zip(*panels))
+        codes, masks = interpret_cbc_batch(*columns)
+        stats.panels += len(panels)
+        return {"control_ids": ids, "patient_ids": patients,
+                "values": dict(zip(INPUT_FIELDS, map(list, columns))),
+                "codes": codes.tolist(), "masks": masks.tolist()}
+
+    for span in spans:
+        if span is None:
+            if panels:
+                yield flush()
+                ids, patients, panels = [], [], []
+            continue
+        stats.messages += 1
+        try:
+            control_id, patient_id, panel = parse_message(*span)
+        except MalformedMessage as exc:
+            stats.reject(str(exc))
+            if on_message is not None:
+                on_message(None, str(exc))
+            continue
+        ids.append(control_id)
+        patients.append(patient_id)
+        panels.append(panel)
+        if on_message is not None:
+            on_message(control_id, None)
+        if len(panels) >= batch_rows:
+            yield flush()
+            ids, patients, panels = [], [], []
+    if panels:
+        yield flush()
+
+
+def render_jsonl(batch):
+    """JSON Lines for a batch: IDs, inputs, patterns and workup labels."""
+    import json
+
+    lines = []
+    values = batch["values"]
+    for i, (control_id, patient_id) in enumerate(zip(batch["control_ids"], batch["patient_ids"])):
+        doc = {"control_id": control_id, "patient_id": patient_id}
+        for field in INPUT_FIELDS:
+            doc[field] = values[field][i]
+        doc["patterns"] = pattern_labels(batch["codes"][i])
+        doc["workup"] = workup_labels(batch["masks"][i])
+        lines.append(json.dumps(doc, ensure_ascii=False))
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+# ──────────────────────────────────────────────
+# MLLP LISTENER
+# ──────────────────────────────────────────────
+
+def ack_frame(control_id, reason=None):
+    """MLLP-framed ACK: AA for an accepted message, AE with the reason otherwise."""
+    code = "AA" if reason is None else "AE"
+    stamp = time.strftime("%Y%m%d%H%M%S")
+    msa = f"MSA|{code}|{control_id or ''}" + ("" if reason is None else f"|{reason}")
+    text = f"MSH|^~\\&|CBC_EXPERT||||{stamp}||ACK^R01|{control_id or stamp}|P|2.5\r{msa}\r"
+    return START_BLOCK + text.encode("ascii", "replace") + END_BLOCK
+
+
+def listen(host="127.0.0.1", port=DEFAULT_MLLP_PORT, out=sys.stdout, batch_rows=DEFAULT_BATCH_ROWS,
+           stats=None, connections=None):
+    """
+    Accept MLLP connections, each served on its own thread, and write
+    interpreted panels to `out` as JSON Lines. A message is acknowledged
+    once the batch holding it has been written. A connection that fails
+    (reset, broken pipe) is counted in stats.connection_errors and closed;
+    the others carry on. Serves until interrupted, or for `connections`
+    connections.
+    """
+    import socket
+    import threading
+
+    stats = stats if stats is not None else IngestStats()
+    lock = threading.Lock()         # guards out and stats
+    threads = []
+
+    def write(batch):
+        text = render_jsonl(batch)
+        with lock:
+            out.write(text)
+            out.flush()
+
+    with socket.create_server((host, port)) as server:
+        served = 0
+        while connections is None or served < connections:
+            try:
+                conn, _ = server.accept()
+            except OSError as exc:
+                with lock:
+                    stats.connection_errors += 1
+                print(f"hl7: accept failed: {exc}", file=sys.stderr)
+                continue
+            served += 1
+            thread = threading.Thread(target=_serve_connection, daemon=True,
+                                      args=(conn, write, batch_rows, stats, lock))
+            thread.start()
+            threads.append(thread)
+            threads = [t for t in threads if t.is_alive()]
+        for thread in threads:
+            thread.join()
+    return stats
+
+
+def _serve_connection(conn, write, batch_rows, stats, lock):
+    local = IngestStats()
+    pending = []                    # ACK frames waiting for their batch to be written
+
+    def ack(control_id, reason):
+        pending.append(ack_frame(control_id, reason))
+
+    def send_acks():
+        if pending:
+            conn.sendall(b"".join(pending))
+            pending.clear()
+        with lock:
+            local.drain_into(stats)
+
+    def spans():
+        # interpret_messages flushes (and write() runs) on each None before
+        # asking for the next span, so ACKs sent here follow the write.
+        for span in mllp_spans(conn.recv):
+            yield span
+            if span is None:
+                send_acks()
+
+    with conn:
+        try:
+            for batch in interpret_messages(spans(), batch_rows, local, ack):
+                write(batch)
+            send_acks()
+        except OSError as exc:
+            with lock:
+                local.connection_errors += 1
+                local.drain_into(stats)
+            print(f"hl7: connection dropped: {exc}", file=sys.stderr)
+
+
+def ingest_files(paths, out=sys.stdout, batch_rows=DEFAULT_BATCH_ROWS, stats=None):
+    """Interpret every message in the given files, writing JSON Lines to out."""
+    stats = stats if stats is not None else IngestStats()
+    for path in paths:
+        for batch in interpret_messages(file_spans(path), batch_rows, stats):
+            out.write(render_jsonl(batch))
+    return stats
@@ -0,0 +1,496 @@
+"""
+Persistent, resumable bulk-interpretation jobs in a SQLite queue.
+
+    python -m cbc_expert jobs submit ward.csv -o ward_results.csv
+    python -m cbc_expert jobs work -j 4           # worker processes; add more anywhere on the host
+    python -m cbc_expert jobs status [JOB]
+
+Submitting a file splits it into chunks of whole lines by byte offset (no
+parsing) and queues them. Workers claim one chunk at a time under a lease,
+interpret it with the same process_block() as the streaming CLI, then move
+the output into the chunk's part file and mark the chunk done in one
+transaction. A worker that dies leaves its chunk claimed until the lease
+expires, after which any worker re-runs just that chunk, so a crash costs
+at most the chunks that were in flight; a worker that comes back after its
+chunk was reclaimed no longer owns it and drops its result. When the last
+chunk is done the parts are concatenated into the output file in input
+order.
+
+The database defaults to CBC_JOBS_DB (or cbc_jobs.sqlite); all state lives
+there, so any number of worker processes on the host can share one queue.
+"""
+
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import tempfile
+import time
+
+from .stream import csv_header, parse_header, process_block, resolve_columns, sniff_delimiter
+
+DEFAULT_DB = os.environ.get("CBC_JOBS_DB", "cbc_jobs.sqlite")
+DEFAULT_CHUNK_BYTES = 4 * 2**20      # ~50k rows of a typical export
+LEASE_SECONDS = 300
+MAX_ATTEMPTS = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            INTEGER PRIMARY KEY,
+    input         TEXT    NOT NULL,
+    output        TEXT    NOT NULL,
+    options       TEXT    NOT NULL,
+    state         TEXT    NOT NULL,
+    total_bytes   INTEGER NOT NULL,
+    chunks        INTEGER NOT NULL,
+    rows_done     INTEGER NOT NULL DEFAULT 0,
+    bytes_done    INTEGER NOT NULL DEFAULT 0,
+    busy_seconds  REAL    NOT NULL DEFAULT 0,
+    created_at    REAL    NOT NULL,
+    started_at    REAL,
+    finished_at   REAL,
+    lease_until   REAL,
+    error         TEXT
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    job_id        INTEGER NOT NULL,
+    seq           INTEGER NOT NULL,
+    start_offset  INTEGER NOT NULL,
+    end_offset    INTEGER NOT NULL,
+    state         TEXT    NOT NULL DEFAULT 'pending',
+    worker        TEXT,
+    lease_until   REAL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    rows          INTEGER,
+    seconds       REAL,
+    PRIMARY KEY (job_id, seq)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS chunks_by_state ON chunks (state, job_id, seq);
+"""
+
+# Job states: queued -> running -> assembling -> done, or failed / cancelled.
+ACTIVE_STATES = ("queued", "running")
+
+
+def chunk_offsets(path, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """
+    Returns:
+        header_end : byte offset where the data rows start
+        spans      : [(start, end)] covering the data rows, each ending on a line boundary
+    """
+    spans = []
+    with open(path, "rb") as f:
+        f.readline()
+        header_end = start = f.tell()
+        size = os.fstat(f.fileno()).st_size
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            if f.tell() < size:
+                f.readline()
+            end = f.tell()
+            spans.append((start, end))
+            start = end
+    return header_end, spans
+
+
+def read_block(path, start, end):
+    """(header_line, lines, end) for the data lines in [start, end), as read_blocks() yields."""
+    with open(path, "rb") as f:
+        header_line = f.readline()
+        f.seek(start)
+        data = f.read(end - start)
+    return header_line, [line for line in data.splitlines(keepends=True) if line.strip()], end
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+# ──────────────────────────────────────────────
+# QUEUE
+# ──────────────────────────────────────────────
+
+class JobQueue:
+
+    def __init__(self, path=DEFAULT_DB, lease_seconds=LEASE_SECONDS):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        # Autocommit; writes take the lock up front with BEGIN IMMEDIATE.
+        self.db = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _write(self):
+        return _Transaction(self.db)
+
+    # ── Submitting ─────────────────────────────────────────────────────────
+    def submit(self, input_path, output_path, fmt=None, delimiter=None, mapping=None, keep=(),
+               chunk_bytes=DEFAULT_CHUNK_BYTES):
+        """Validate the header, split the file into chunks and queue it. Returns the job id."""
+        input_path, output_path = os.path.abspath(input_path), os.path.abspath(output_path)
+        fmt = fmt or ("jsonl" if output_path.endswith((".jsonl", ".ndjson")) else "csv")
+        delimiter = delimiter or sniff_delimiter(input_path)
+        with open(input_path, "rb") as f:
+            header = parse_header(f.readline(), delimiter)
+        resolve_columns(header, mapping)
+        missing = [name for name in keep if name not in header]
+        if missing:
+            raise ValueError(f"no column {missing[0]!r} to keep")
+
+        _, spans = chunk_offsets(input_path, chunk_bytes)
+        options = json.dumps({"format": fmt, "delimiter": delimiter, "mapping": mapping or {},
+                              "keep": list(keep)})
+        total = sum(end - start for start, end in spans)
+        with self._write():
+            # A file without data rows goes straight to assembly (header only).
+            job_id = self.db.execute(
+                "INSERT INTO jobs (input, output, options, state, total_bytes, chunks, created_at, "
+                "lease_until) VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (input_path, output_path, options, "queued" if spans else "assembling", total,
+                 len(spans), time.time())).lastrowid
+            self.db.executemany(
+                "INSERT INTO chunks (job_id, seq, start_offset, end_offset) VALUES (?, ?, ?, ?)",
+                [(job_id, seq, start, end) for seq, (start, end) in enumerate(spans)])
+        return job_id
+
+    # ── Claiming ───────────────────────────────────────────────────────────
+    def claim(self, worker=None):
+        """
+        Lease the next runnable chunk (pending, or claimed under an expired
+        lease) of the oldest active job.
+
+        Returns:
+            chunk row as a dict joined with its job's input and options, or None
+        """
+        now = time.time()
+        with self._write():
+            row = self.db.execute(
+                "SELECT c.job_id, c.seq, c.start_offset, c.end_offset, c.attempts, "
+                "       j.input, j.output, j.options "
+                "FROM chunks c JOIN jobs j ON j.id = c.job_id "
+                "WHERE j.state IN ('queued', 'running') AND (c.state = 'pending' "
+                "   OR (c.state = 'claimed' AND c.lease_until < ?)) "
+                "ORDER BY c.job_id, c.seq LIMIT 1", (now,)).fetchone()
+            if row is None:
+                return None
+            self.db.execute(
+                "UPDATE chunks SET state = 'claimed', worker = ?, lease_until = ?, "
+                "attempts = attempts + 1 WHERE job_id = ? AND seq = ?",
+                (worker or worker_name(), now + self.lease_seconds, row["job_id"], row["seq"]))
+            self.db.execute(
+                "UPDATE jobs SET state = 'running', started_at = coalesce(started_at, ?) "
+                "WHERE id = ? AND state = 'queued'", (now, row["job_id"]))
+        return dict(row)
+
+    def complete(self, job_id, seq, worker, rows, seconds, nbytes, tmp=None):
+        """
+        Mark a chunk claimed by `worker` done, move its output `tmp` into the
+        part file and add it to the job's progress. If the chunk was reclaimed
+        by another worker (or requeued) meanwhile, `tmp` is deleted instead.
+
+        Returns True when this was the job's last outstanding chunk, in which
+        case the caller should assemble() the job.
+        """
+        try:
+            with self._write():
+                updated = self.db.execute(
+                    "UPDATE chunks SET state = 'done', rows = ?, seconds = ?, lease_until = NULL "
+                    "WHERE job_id = ? AND seq = ? AND worker = ? AND state = 'claimed'",
+                    (rows, seconds, job_id, seq, worker)).rowcount
+                if not updated:
+                    return False
+                if tmp is not None:
+                    # Only the owner gets here, and never after assembly, so
+                    # the parts directory is not recreated once removed.
+                    output = self.job(job_id)["output"]
+                    os.makedirs(parts_dir(output), exist_ok=True)
+                    os.replace(tmp, part_path(output, seq))
+                    tmp = None
+                self.db.execute(
+                    "UPDATE jobs SET rows_done = rows_done + ?, bytes_done = bytes_done + ?, "
+                    "busy_seconds = busy_seconds + ? WHERE id = ?", (rows, nbytes, seconds, job_id))
+                left = self.db.execute(
+                    "SELECT count(*) FROM chunks WHERE job_id = ? AND state != 'done'",
+                    (job_id,)).fetchone()[0]
+                if left:
+                    return False
+                # A job cancelled meanwhile stays cancelled (retry() resumes it).
+                return self.db.execute(
+                    "UPDATE jobs SET state = 'assembling', lease_until = ? WHERE id = ? "
+                    "AND state = 'running'", (time.time() + self.lease_seconds, job_id)).rowcount > 0
+        finally:
+            if tmp is not None:
+                _remove(tmp)
+
+    def fail(self, job_id, seq, worker, error, attempts):
+        """
+        Return a chunk claimed by `worker` to the queue, or fail the job after
+        MAX_ATTEMPTS. Returns False (and changes nothing) if the worker no
+        longer owns the chunk.
+        """
+        failed = attempts >= MAX_ATTEMPTS
+        with self._write():
+            if not self.db.execute(
+                    "UPDATE chunks SET state = ?, lease_until = NULL "
+                    "WHERE job_id = ? AND seq = ? AND worker = ? AND state = 'claimed'",
+                    ("failed" if failed else "pending", job_id, seq, worker)).rowcount:
+                return False
+            if failed:
+                self.db.execute(
+                    "UPDATE jobs SET state = 'failed', error = ?, finished_at = ? "
+                    "WHERE id = ? AND state IN ('queued', 'running')",
+                    (f"chunk {seq}: {error}", time.time(), job_id))
+        return True
+
+    def claim_assembly(self):
+        """A job whose chunks are all done but whose assembly lease has expired, or None."""
+        now = time.time()
+        with self._write():
+            row = self.db.execute(
+                "SELECT id FROM jobs WHERE state = 'assembling' AND lease_until < ? "
+                "ORDER BY id LIMIT 1", (now,)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE jobs SET lease_until = ? WHERE id = ?",
+                            (now + self.lease_seconds, row["id"]))
+        return row["id"]
+
+    def assemble(self, job_id):
+        """Concatenate the part files in order into the output and finish the job."""
+        job = self.job(job_id)
+        options = json.loads(job["options"])
+        parts = parts_dir(job["output"])
+        tmp = f"{job['output']}.tmp"
+        try:
+            with open(tmp, "wb") as out:
+                if options["format"] == "csv":
+                    out.write(csv_header(options["keep"]).encode())
+                for seq in range(job["chunks"]):
+                    with open(part_path(job["output"], seq), "rb") as part:
+                        shutil.copyfileobj(part, out, 2**20)
+            os.replace(tmp, job["output"])
+        except BaseException:
+            _remove(tmp)
+            raise
+        shutil.rmtree(parts, ignore_errors=True)
+        with self._write():
+            self.db.execute(
+                "UPDATE jobs SET state = 'done', finished_at = ?, lease_until = NULL "
+                "WHERE id = ? AND state = 'assembling'", (time.time(), job_id))
+
+    def fail_assembly(self, job_id, error):
+        """Fail a job whose assembly raised; retry() assembles it again."""
+        with self._write():
+            self.db.execute(
+                "UPDATE jobs SET state = 'failed', error = ?, finished_at = ?, lease_until = NULL "
+                "WHERE id = ? AND state = 'assembling'", (f"assembly: {error}", time.time(), job_id))
+
+    # ── Control ────────────────────────────────────────────────────────────
+    def cancel(self, job_id):
+        with self._write():
+            return self.db.execute(
+                "UPDATE jobs SET state = 'cancelled', finished_at = ? "
+                "WHERE id = ? AND state IN ('queued', 'running')",
+                (time.time(), job_id)).rowcount > 0
+
+    def retry(self, job_id):
+        """
+        Requeue a failed or cancelled job; finished chunks are kept, and a
+        job with none outstanding goes straight to assembly.
+        """
+        with self._write():
+            if not self.db.execute(
+                    "UPDATE jobs SET state = 'queued', error = NULL, finished_at = NULL "
+                    "WHERE id = ? AND state IN ('failed', 'cancelled')", (job_id,)).rowcount:
+                return False
+            left = self.db.execute(
+                "UPDATE chunks SET state = 'pending', worker = NULL, attempts = 0, "
+                "lease_until = NULL WHERE job_id = ? AND state != 'done'", (job_id,)).rowcount
+            if not left:
+                self.db.execute("UPDATE jobs SET state = 'assembling', lease_until = 0 WHERE id = ?",
+                                (job_id,))
+        return True
+
+    # ── Progress ───────────────────────────────────────────────────────────
+    def job(self, job_id):
+        row = self.db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"no job {job_id}")
+        return dict(row)
+
+    def status(self, job_id=None):
+        """
+        Progress of one job (or of every job, newest first) as dicts with
+        the job columns plus pct, rows_per_sec, est_rows, eta_seconds and
+        the number of chunks in each state.
+        """
+        where, args = ("WHERE id = ?", (job_id,)) if job_id is not None else ("", ())
+        jobs = [dict(r) for r in self.db.execute(f"SELECT * FROM jobs {where} ORDER BY id DESC", args)]
+        counts = {}
+        for r in self.db.execute(
+                f"SELECT job_id, state, count(*) FROM chunks "
+                f"{'WHERE job_id = ?' if job_id is not None else ''} GROUP BY job_id, state", args):
+            counts.setdefault(r[0], {})[r[1]] = r[2]
+        now = time.time()
+        for job in jobs:
+            job.update(progress(job, now))
+            job["chunk_states"] = counts.get(job["id"], {})
+        return jobs
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT (ROLLBACK on error) on an autocommit connection."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, *exc):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+
+
+def progress(job, now=None):
+    """
+    Derived progress for a job row. Rate is rows over wall time since the
+    first claim; ETA scales the remaining bytes by the bytes/s achieved.
+    """
+    now = now or time.time()
+    total, done = job["total_bytes"], job["bytes_done"]
+    pct = 100.0 if not total else 100.0 * done / total
+    elapsed = ((job["finished_at"] or now) - job["started_at"]) if job["started_at"] else 0.0
+    rate = job["rows_done"] / elapsed if elapsed > 0 else 0.0
+    est_rows = round(job["rows_done"] * total / done) if done else None
+    eta = None
+    if job["state"] in ACTIVE_STATES and done and elapsed > 0:
+        eta = (total - done) / (done / elapsed)
+    return {"pct": round(pct, 1), "elapsed_seconds": round(elapsed, 1),
+            "rows_per_sec": round(rate), "est_rows": est_rows,
+            "eta_seconds": None if eta is None else round(eta, 1)}
+
+
+def parts_dir(output_path):
+    return f"{output_path}.parts"
+
+
+def part_path(output_path, seq):
+    return os.path.join(parts_dir(output_path), f"{seq:06d}")
+
+
+# ──────────────────────────────────────────────
+# WORKERS
+# ──────────────────────────────────────────────
+
+def run_chunk(chunk):
+    """
+    Interpret one claimed chunk into a temporary file beside the output
+    (complete() moves it into the part file).
+
+    Returns:
+        (row count, temporary file path)
+    """
+    options = json.loads(chunk["options"])
+    block = read_block(chunk["input"], chunk["start_offset"], chunk["end_offset"])
+    text, rows, _ = process_block(block, options["format"], options["delimiter"],
+                                  options["mapping"] or None, tuple(options["keep"]))
+    fd, tmp = tempfile.mkstemp(prefix=f"{os.path.basename(chunk['output'])}.{chunk['seq']:06d}.",
+                               suffix=".tmp", dir=os.path.dirname(chunk["output"]))
+    try:
+        with open(fd, "w", newline="", encoding="utf-8") as f:
+            f.write(text)
+    except BaseException:
+        _remove(tmp)
+        raise
+    return rows, tmp
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def assemble_job(queue, job_id, worker, log=None):
+    """assemble() a job, failing it (rather than the worker) if that raises."""
+    try:
+        queue.assemble(job_id)
+    except Exception as exc:
+        queue.fail_assembly(job_id, f"{type(exc).__name__}: {exc}")
+        if log:
+            print(f"[{worker}] job {job_id} assembly failed: {exc}", file=log)
+        return False
+    if log:
+        print(f"[{worker}] job {job_id} done", file=log)
+    return True
+
+
+def run_worker(db_path=DEFAULT_DB, idle_exit=False, poll_seconds=1.0, worker=None,
+               lease_seconds=LEASE_SECONDS, log=None):
+    """
+    Claim and run chunks until interrupted (or, with idle_exit, until no work
+    is left). Returns the number of chunks completed.
+    """
+    worker = worker or worker_name()
+    done = 0
+    with JobQueue(db_path, lease_seconds) as queue:
+        while True:
+            job_id = queue.claim_assembly()
+            if job_id is not None:
+                assemble_job(queue, job_id, worker, log)
+                continue
+            chunk = queue.claim(worker)
+            if chunk is None:
+                if idle_exit:
+                    return done
+                time.sleep(poll_seconds)
+                continue
+            started = time.perf_counter()
+            try:
+                rows, tmp = run_chunk(chunk)
+                last = queue.complete(chunk["job_id"], chunk["seq"], worker, rows,
+                                      time.perf_counter() - started,
+                                      chunk["end_offset"] - chunk["start_offset"], tmp)
+            except Exception as exc:
+                queue.fail(chunk["job_id"], chunk["seq"], worker, f"{type(exc).__name__}: {exc}",
+                           chunk["attempts"] + 1)
+                if log:
+                    print(f"[{worker}] job {chunk['job_id']} chunk {chunk['seq']} failed: {exc}",
+                          file=log)
+                continue
+            done += 1
+            if last:
+                assemble_job(queue, chunk["job_id"], worker, log)
+
+
+def run_workers(n, db_path=DEFAULT_DB, idle_exit=False, poll_seconds=1.0, log=None):
+    """Run n worker processes against one queue; returns when they all exit."""
+    if n <= 1:
+        run_worker(db_path, idle_exit, poll_seconds, log=log)
+        return
+    import multiprocessing
+
+    procs = [multiprocessing.Process(target=run_worker, args=(db_path, idle_exit, poll_seconds))
+             for _ in range(n)]
+    for p in procs:
+        p.start()
+    try:
+        for p in procs:
+            p.join()
+    except KeyboardInterrupt:
+        for p in procs:
+            p.terminate()
+            p.join()
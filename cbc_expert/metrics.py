@@ -0,0 +1,313 @@
+"""
+Opt-in instrumentation with a Prometheus text exposition.
+
+Disabled by default; every instrumentation point first checks the module
+flag ENABLED, so the cost when off is a flag test per call. Turn it on with
+CBC_METRICS=1 in the environment or metrics.enable().
+
+Collected:
+    cbc_interpret_seconds{path}           interpret_cbc / batch call latency
+    cbc_rule_block_seconds{block}         scalar evaluation per rule block
+    cbc_render_seconds{renderer}          each build_*_html builder
+    cbc_dashboard_rerun_seconds{scope}    app.py runs: "full" script or "fragment"
+    cbc_http_request_seconds{path}        service requests
+    cbc_pattern_total{pattern}            how often each pattern fires
+    cbc_workup_item_total{item}           how often each workup item is emitted
+    cbc_panels_total{path}                panels interpreted
+    cbc_hl7_malformed_total{reason}       HL7 messages skipped (cbc_expert.hl7)
+
+Exposed by GET /metrics on the HTTP service, and written to the file named by
+CBC_METRICS_FILE (at most every CBC_METRICS_DUMP_SECONDS) by the dashboard.
+Counts are per process.
+"""
+
+import math
+import os
+import sys
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+
+
+
+def _env_seconds(name, default):
+    """A non-negative number of seconds from the environment; a bad value warns and falls back."""
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        seconds = float(value)
+        if not math.isfinite(seconds) or seconds < 0:
+            raise ValueError
+    except ValueError:
+        print(f"cbc_expert: ignoring {name}={value!r} (not a non-negative number); "
+              f"using {default}", file=sys.stderr)
+        return default
+    return seconds
+
+
+ENABLED = os.environ.get("CBC_METRICS", "") not in ("", "0")
+
+METRICS_FILE = os.environ.get("CBC_METRICS_FILE")
+DUMP_INTERVAL = _env_seconds("CBC_METRICS_DUMP_SECONDS", 10.0)
+
+# Seconds; spans a single rule block (~1 us) up to a slow dashboard rerun.
+DEFAULT_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4,
+                   1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+def enable(on=True):
+    global ENABLED
+    ENABLED = bool(on)
+
+
+# ──────────────────────────────────────────────
+# METRIC TYPES
+# ──────────────────────────────────────────────
+
+def _escape(value):
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def _label_text(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + list(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels=()):
+        return self._values.get(labels, 0)
+
+    def reset(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, v in items:
+            yield f"{self.name}{_label_text(self.labelnames, labels)} {_number(v)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}   # labels -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[i] += 1
+            series[-1] += value
+
+    def count(self, labels=()):
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def samples(self):
+        with self._lock:
+            items = sorted((labels, list(s)) for labels, s in self._series.items())
+        for labels, series in items:
+            cumulative = 0
+            for le, n in zip(self.buckets + (float("inf"),), series):
+                cumulative += n
+                le_label = f'le="{_number(le)}"'
+                yield (f"{self.name}_bucket"
+                       f"{_label_text(self.labelnames, labels, (le_label,))} {cumulative}")
+            yield f"{self.name}_sum{_label_text(self.labelnames, labels)} {_number(series[-1])}"
+            yield f"{self.name}_count{_label_text(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = {}
+
+    def _add(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"metric {metric.name!r} already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._add(Counter(name, help, labelnames))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, help, labelnames, buckets))
+
+    def reset(self):
+        for metric in self.metrics.values():
+            metric.reset()
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+interpret_seconds = REGISTRY.histogram(
+    "cbc_interpret_seconds", "Latency of interpret_cbc and batch calls.", ("path",))
+rule_block_seconds = REGISTRY.histogram(
+    "cbc_rule_block_seconds", "Scalar rule evaluation time per rule block.", ("block",))
+render_seconds = REGISTRY.histogram(
+    "cbc_render_seconds", "Latency of each HTML builder.", ("renderer",))
+rerun_seconds = REGISTRY.histogram(
+    "cbc_dashboard_rerun_seconds", "Dashboard runs, full script or patient-panel fragment.",
+    ("scope",))
+http_seconds = REGISTRY.histogram(
+    "cbc_http_request_seconds", "HTTP service request latency.", ("path",))
+pattern_total = REGISTRY.counter(
+    "cbc_pattern_total", "Interpretations in which each pattern fired.", ("pattern",))
+workup_total = REGISTRY.counter(
+    "cbc_workup_item_total", "Interpretations suggesting each workup item.", ("item",))
+panels_total = REGISTRY.counter(
+    "cbc_panels_total", "Panels interpreted.", ("path",))
+
+
+# ──────────────────────────────────────────────
+# INSTRUMENTATION HELPERS
+# ──────────────────────────────────────────────
+
+def stopwatch():
+    """Start time for observe_since(), or None when metrics are off."""
+    return time.perf_counter() if ENABLED else None
+
+
+def observe_since(histogram, started, labels=()):
+    if started is not None:
+        histogram.observe(time.perf_counter() - started, labels)
+
+
+def timed(histogram, *labels):
+    """Decorator recording each call's duration in histogram when enabled."""
+
+    def decorate(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                histogram.observe(time.perf_counter() - started, labels)
+        return wrapper
+
+    return decorate
+
+
+def record_result(plan, code, mask, path="scalar"):
+    """Count one interpretation's patterns and (de-duplicated) workup items."""
+    panels_total.inc((path,))
+    for i, (label, _) in enumerate(plan.patterns):
+        if code >> i & 1:
+            pattern_total.inc((label,))
+    for j, item in enumerate(plan.workup_catalog):
+        if mask >> j & 1:
+            workup_total.inc((item["label"],))
+
+
+def record_batch(plan, codes, masks, path="batch"):
+    """record_result() for NumPy code/mask arrays, counting each distinct value once."""
+    import numpy as np
+
+    panels_total.inc((path,), int(len(codes)))
+    for values, labels, counter in (
+        (codes, [label for label, _ in plan.patterns], pattern_total),
+        (masks, [item["label"] for item in plan.workup_catalog], workup_total),
+    ):
+        distinct, counts = np.unique(values, return_counts=True)
+        for value, n in zip(distinct.tolist(), counts.tolist()):
+            for bit, label in enumerate(labels):
+                if value >> bit & 1:
+                    counter.inc((label,), n)
+
+
+# ──────────────────────────────────────────────
+# FILE DUMP
+# ──────────────────────────────────────────────
+
+_last_dump = 0.0
+# Streamlit runs sessions on threads of one process; one dump at a time.
+_dump_lock = threading.Lock()
+
+
+def _write(path):
+    fd, tmp = tempfile.mkstemp(prefix=f"{os.path.basename(path)}.", suffix=".tmp",
+                               dir=os.path.dirname(path) or ".")
+    try:
+        with open(fd, "w") as f:
+            f.write(REGISTRY.render())
+        os.chmod(tmp, 0o644)        # mkstemp creates 0600; scrapers read the file
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def dump(path=None):
+    """Write the exposition to path (default CBC_METRICS_FILE) atomically."""
+    path = path or METRICS_FILE
+    if not path:
+        return None
+    with _dump_lock:
+        _write(path)
+    return path
+
+
+def maybe_dump():
+    """dump() when enabled, a file is configured and DUMP_INTERVAL has passed."""
+    global _last_dump
+    if not (ENABLED and METRICS_FILE):
+        return
+    now = time.monotonic()
+    if now - _last_dump < DUMP_INTERVAL:
+        return
+    with _dump_lock:
+        if now - _last_dump < DUMP_INTERVAL:
+            return              # another session dumped meanwhile
+        _last_dump = now
+        _write(METRICS_FILE)
@@ -0,0 +1,77 @@
+"""
+Process-pool execution for the bulk interpretation paths.
+
+Work is split into shards large enough that pickling the shard and its
+result is small next to the work done on it (tens of thousands of rows per
+shard). Results are yielded back in input order, with a bounded number of
+shards in flight so memory stays flat on arbitrarily long inputs.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_SHARD_ROWS = 100_000
+
+
+def default_workers():
+    return os.cpu_count() or 1
+
+
+def _init_worker():
+    """Load and compile the rule catalog once per worker process."""
+    from .batch import interpret_cbc_batch
+    interpret_cbc_batch([13.5], [90], [7.0], [55], [250], ["Female"])
+
+
+def imap_ordered(func, items, workers=None, max_in_flight=None):
+    """
+    map(func, items) over a process pool. Results come back in input order;
+    at most max_in_flight (default 2 x workers) tasks are outstanding.
+    """
+    workers = workers or default_workers()
+    max_in_flight = max_in_flight or 2 * workers
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= max_in_flight:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _interpret_shard(columns):
+    from .batch import interpret_cbc_batch
+    return interpret_cbc_batch(*columns)
+
+
+def interpret_cbc_parallel(hgb, mcv, wbc, neutrophil_pct, platelets, sex, age=None, lab=None,
+                           workers=None, shard_rows=DEFAULT_SHARD_ROWS):
+    """
+    interpret_cbc_batch sharded across a process pool. age and lab columns
+    select reference-range profiles as in interpret_cbc_batch; workers
+    resolve them from $CBC_REFERENCE_PROFILES, so profiles loaded from
+    another path in this process are not seen.
+
+    Returns:
+        (pattern_codes, workup_masks) arrays in input order
+    """
+    import numpy as np
+
+    from .batch import workup_dtype
+    from .engine import CBC_RULES
+
+    columns = [np.asarray(c, dtype=float) for c in (hgb, mcv, wbc, neutrophil_pct, platelets)]
+    columns.append(np.asarray(sex, dtype=str))
+    if age is not None or lab is not None:
+        n = len(columns[0])
+        columns.append(np.full(n, np.nan) if age is None else np.asarray(age, dtype=float))
+        columns.append(np.full(n, None, dtype=object) if lab is None else np.asarray(lab, dtype=object))
+    n = len(columns[0])
+    shards = (tuple(c[i:i + shard_rows] for c in columns) for i in range(0, n, shard_rows))
+    results = list(imap_ordered(_interpret_shard, shards, workers))
+    if not results:
+        return np.zeros(0, dtype=np.uint16), np.zeros(0, dtype=workup_dtype(CBC_RULES))
+    codes, masks = zip(*results)
+    return np.concatenate(codes), np.concatenate(masks)
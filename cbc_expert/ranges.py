@@ -0,0 +1,202 @@
+"""
+Reference-range profiles by lab, sex and age band.
+
+A profile is one set of limits (the REFERENCE_LIMITS keys) for a lab, a sex
+and a half-open age band [age_min, age_max) in years. Profiles are compiled
+once per process into a ReferenceIndex: per (lab, sex), the sorted band
+starts plus the limits of each band, so a lookup is a bisect and the batch
+path resolves whole columns with np.searchsorted.
+
+The built-in "default" lab only has the adult REFERENCE_LIMITS (the same
+dict objects, so results without an age are unchanged); no paediatric
+ranges ship with the package. Labs and age bands, including paediatric
+bands for the default lab below ADULT_AGE, are loaded from a JSON list of
+lab-validated profiles named by the CBC_REFERENCE_PROFILES environment
+variable (or load_profiles()):
+
+    [{"lab": "north", "sex": "Female", "age_min": 18, "age_max": null,
+      "limits": {"hgb_low": 11.8, "mcv_low": 80, ...}}, ...]
+
+Missing limit keys fall back to the default adult limits for that sex;
+unknown keys (a typo such as "hgb_lo") are rejected with a ValueError. A
+patient with no age, or an age outside every band of their lab, gets the
+lab's adult band; an unknown lab falls back to "default".
+"""
+
+import json
+import os
+from bisect import bisect_right
+
+from .rules import REFERENCE_LIMITS
+
+DEFAULT_LAB = "default"
+ADULT_AGE = 18
+
+PROFILES_ENV = "CBC_REFERENCE_PROFILES"
+
+
+
+def default_profiles():
+    """The built-in default lab: the adult limits of each sex, nothing else."""
+    return [{"lab": DEFAULT_LAB, "sex": sex, "age_min": ADULT_AGE, "age_max": None,
+             "limits": adult} for sex, adult in REFERENCE_LIMITS.items()]
+
+
+# ──────────────────────────────────────────────
+# INTERVAL INDEX
+# ──────────────────────────────────────────────
+
+class ReferenceIndex:
+    """
+    Attributes:
+        bands  : tuple of limits dicts; band ids index into it
+        starts : (lab, sex) -> sorted band start ages
+        ends   : (lab, sex) -> band end ages (inf when open)
+        ids    : (lab, sex) -> band ids, parallel to starts
+        adult  : (lab, sex) -> band id used without an age
+        age_banded : True when some lab's limits depend on age
+    """
+
+    def __init__(self, profiles):
+        grouped = {}
+        for p in profiles:
+            sex = "Female" if p["sex"] == "Female" else "Male"
+            limits = p["limits"]
+            unknown = sorted(set(limits) - set(REFERENCE_LIMITS[sex]))
+            if unknown:
+                raise ValueError(
+                    f"unknown limit {unknown[0]!r} in the profile for lab "
+                    f"{p.get('lab') or DEFAULT_LAB!r}, {sex}, ages {p.get('age_min') or 0}-"
+                    f"{'' if p.get('age_max') is None else p['age_max']}")
+            if set(limits) != set(REFERENCE_LIMITS[sex]):
+                limits = dict(REFERENCE_LIMITS[sex], **limits)
+            age_max = float("inf") if p.get("age_max") is None else float(p["age_max"])
+            grouped.setdefault((p.get("lab") or DEFAULT_LAB, sex), []).append(
+                (float(p.get("age_min") or 0), age_max, limits))
+
+        bands, self.starts, self.ends, self.ids, self.adult = [], {}, {}, {}, {}
+        for key, group in grouped.items():
+            group.sort(key=lambda band: band[0])
+            for (_, end, _), (start, _, _) in zip(group, group[1:]):
+                if start < end:
+                    raise ValueError(f"overlapping age bands for {key}")
+            ids = []
+            for _, _, limits in group:
+                ids.append(len(bands))
+                bands.append(limits)
+            self.starts[key] = [band[0] for band in group]
+            self.ends[key] = [band[1] for band in group]
+            self.ids[key] = ids
+            adult = self._find(key, ADULT_AGE)
+            self.adult[key] = ids[-1] if adult is None else adult
+        self.bands = tuple(bands)
+        self.labs = tuple(sorted({lab for lab, _ in grouped}))
+        self.age_banded = any(len(ids) > 1 for ids in self.ids.values())
+        self._arrays = None
+
+    def _key(self, sex, lab):
+        sex = "Female" if sex == "Female" else "Male"
+        key = (lab or DEFAULT_LAB, sex)
+        return key if key in self.starts else (DEFAULT_LAB, sex)
+
+    def _find(self, key, age):
+        i = bisect_right(self.starts[key], age) - 1
+        if i >= 0 and age < self.ends[key][i]:
+            return self.ids[key][i]
+        return None
+
+    def band_id(self, sex, age=None, lab=None):
+        key = self._key(sex, lab)
+        if age is None or age != age:
+            return self.adult[key]
+        found = self._find(key, age)
+        return self.adult[key] if found is None else found
+
+    def lookup(self, sex, age=None, lab=None):
+        """The limits dict for one patient."""
+        return self.bands[self.band_id(sex, age, lab)]
+
+    # ── Batch path ─────────────────────────────────────────────────────────
+    def limit_columns(self, sex, age=None, lab=None):
+        """
+        Per-row limits for the batch path. sex, age and lab are columns (age
+        may contain NaN, lab may be None for the default lab).
+
+        Returns:
+            dict of limit name -> float array, one value per row
+        """
+        import numpy as np
+
+        female = np.asarray(sex) == "Female"
+        n = len(female)
+        ages = np.full(n, np.nan) if age is None else np.asarray(age, dtype=float)
+        if lab is None:
+            lab_values, lab_of_row = [None], np.zeros(n, dtype=np.intp)
+        else:
+            labs = np.asarray(lab, dtype=object)
+            labs = np.where(labs == None, "", labs).astype(str)  # noqa: E711
+            lab_values, lab_of_row = np.unique(labs, return_inverse=True)
+
+        band = np.empty(n, dtype=np.intp)
+        for i, lab in enumerate(lab_values):
+            in_lab = lab_of_row == i
+            for sex_value, rows in (("Female", in_lab & female), ("Male", in_lab & ~female)):
+                if not rows.any():
+                    continue
+                key = self._key(sex_value, lab or None)
+                starts, ends, ids = (np.asarray(v[key]) for v in (self.starts, self.ends, self.ids))
+                a = ages[rows]
+                j = np.maximum(np.searchsorted(starts, a, side="right") - 1, 0)
+                inside = (a >= starts[j]) & (a < ends[j])   # False for NaN ages
+                band[rows] = np.where(inside, ids[j], self.adult[key])
+
+        names, table = self._table()
+        return {name: table[band, j] for j, name in enumerate(names)}
+
+    def _table(self):
+        """(limit names, bands x limits float matrix), built on first batch use."""
+        if self._arrays is None:
+            import numpy as np
+            names = tuple(REFERENCE_LIMITS["Male"])
+            self._arrays = names, np.array([[b[name] for name in names] for b in self.bands],
+                                           dtype=float)
+        return self._arrays
+
+
+# ──────────────────────────────────────────────
+# LOADING
+# ──────────────────────────────────────────────
+
+_index = None
+
+
+def load_profiles(path=None):
+    """
+    (Re)build the process-wide index from the defaults plus the profiles in
+    path (default: $CBC_REFERENCE_PROFILES, if set); a reload empties the
+    interpretation and card caches. Returns the index.
+    """
+    global _index
+    replacing = _index is not None
+    profiles = default_profiles()
+    path = path or os.environ.get(PROFILES_ENV)
+    if path:
+        with open(path) as f:
+            loaded = json.load(f)
+        for p in loaded:
+            if ((p.get("lab") or DEFAULT_LAB) == DEFAULT_LAB
+                    and (p.get("age_max") is None or p["age_max"] > ADULT_AGE)):
+                raise ValueError(f"profiles may only add bands below age {ADULT_AGE} "
+                                 f"to the {DEFAULT_LAB!r} lab")
+        profiles += loaded
+    _index = ReferenceIndex(profiles)
+    if replacing:
+        # Cached results and cards were computed against the old ranges.
+        from .cache import clear_caches
+        clear_caches()
+    return _index
+
+
+def reference_index():
+    """The process-wide index, loaded on first use."""
+    return _index or load_profiles()
@@ -0,0 +1,166 @@
+"""HTML fragments for the dashboard cards."""
+
+from .metrics import render_seconds, timed
+
+# ──────────────────────────────────────────────
+# HTML BUILDER HELPERS
+# ──────────────────────────────────────────────
+
+def badge_html(label, color):
+    return f'<span class="badge badge-{color}">{label}</span>'
+
+
+@timed(render_seconds, "build_badges_html")
+def build_badges_html(patterns):
+    badges = "".join(badge_html(label, color) for label, color in patterns)
+    return f'<div class="pattern-row">{badges}</div>'
+
+
+@timed(render_seconds, "build_summary_html")
+def build_summary_html(summaries):
+    return "".join(f'<p class="summary-text">{s}</p>' for s in summaries)
+
+
+NO_WORKUP_HTML = '<p class="summary-text summary-normal">No additional workup required at this time.</p>'
+
+
+def workup_row_html(item):
+    p    = item["priority"]
+    icon = "!" if p == "red" else (">" if p == "orange" else "+")
+    return (
+        f'<div class="workup-item">'
+        f'  <div class="workup-icon icon-{p}">{icon}</div>'
+        f'  <div class="workup-content">'
+        f'    <div class="workup-label">&#9744; {item["label"]}</div>'
+        f'    <div class="workup-reason">{item["reason"]}</div>'
+        f'  </div>'
+        f'</div>'
+    )
+
+
+@timed(render_seconds, "build_workup_html")
+def build_workup_html(workup):
+    if not workup:
+        return NO_WORKUP_HTML
+    return "\n".join(workup_row_html(item) for item in workup)
+
+
+def param_classes(hgb, mcv, wbc, platelets, limits):
+    return {
+        "hgb_cls": "val-abnormal" if hgb < limits["hgb_low"] else "val-normal",
+        "mcv_cls": ("val-abnormal" if mcv < limits["mcv_low"]
+                    else ("val-warn" if mcv > limits["mcv_high"] else "val-normal")),
+        "wbc_cls": ("val-abnormal" if wbc < limits["wbc_low"]
+                    else ("val-warn" if wbc > limits["wbc_high"] else "val-normal")),
+        "plt_cls": ("val-abnormal" if platelets < limits["plt_low"]
+                    else ("val-warn" if platelets > limits["plt_high"] else "val-normal")),
+    }
+
+
+def param_grid_html(hgb, mcv, wbc, platelets, classes, units):
+    """The parameter grid from display values, param_classes() and grid_units()."""
+    return (
+        f'<div class="param-grid">'
+        f'  <div class="param-box">'
+        f'    <div class="param-name">Haemoglobin</div>'
+        f'    <div class="param-value {classes["hgb_cls"]}">{hgb}</div>'
+        f'    <div class="param-unit">{units[0]}</div>'
+        f'  </div>'
+        f'  <div class="param-box">'
+        f'    <div class="param-name">MCV</div>'
+        f'    <div class="param-value {classes["mcv_cls"]}">{mcv}</div>'
+        f'    <div class="param-unit">{units[1]}</div>'
+        f'  </div>'
+        f'  <div class="param-box">'
+        f'    <div class="param-name">WBC</div>'
+        f'    <div class="param-value {classes["wbc_cls"]}">{wbc}</div>'
+        f'    <div class="param-unit">{units[2]}</div>'
+        f'  </div>'
+        f'  <div class="param-box">'
+        f'    <div class="param-name">Platelets</div>'
+        f'    <div class="param-value {classes["plt_cls"]}">{platelets}</div>'
+        f'    <div class="param-unit">{units[3]}</div>'
+        f'  </div>'
+        f'</div>'
+    )
+
+
+def _grid_units(limits):
+    return (
+        f'g/dL &middot; ref &ge;{limits["hgb_low"]}',
+        f'fL &middot; ref {limits["mcv_low"]:g}&ndash;{limits["mcv_high"]:g}',
+        f'&times;10&sup3;/&micro;L &middot; ref {limits["wbc_low"]:g}&ndash;{limits["wbc_high"]:g}',
+        f'&times;10&sup3;/&micro;L &middot; ref {limits["plt_low"]:g}&ndash;{limits["plt_high"]:g}',
+    )
+
+
+# id(limits) -> (limits, units); holding the dict keeps its id from being
+# reused once ranges.load_profiles() replaces it. Cleared when full, so
+# repeated reloads do not pin every old profile.
+GRID_CACHE_SIZE = 256
+_grid_units_cache = {}
+
+
+def grid_units(limits):
+    """The four reference-range captions for a limits dict, built once per dict."""
+    entry = _grid_units_cache.get(id(limits))
+    if entry is None or entry[0] is not limits:
+        if len(_grid_units_cache) >= GRID_CACHE_SIZE:
+            _grid_units_cache.clear()
+        entry = _grid_units_cache[id(limits)] = (limits, _grid_units(limits))
+    return entry[1]
+
+
+def param_grid_template(limits):
+    """
+    The parameter grid with the reference ranges filled in, leaving
+    {hgb} {mcv} {wbc} {platelets} and their *_cls classes as format fields.
+    """
+    fields = {name: "{" + name + "}" for name in ("hgb_cls", "mcv_cls", "wbc_cls", "plt_cls")}
+    return param_grid_html("{hgb}", "{mcv}", "{wbc}", "{platelets}", fields, grid_units(limits))
+
+
+@timed(render_seconds, "build_param_grid_html")
+def build_param_grid_html(hgb, mcv, wbc, platelets, limits):
+    return param_grid_html(hgb, mcv, wbc, platelets,
+                           param_classes(hgb, mcv, wbc, platelets, limits), grid_units(limits))
+
+
+SUMMARY_CARD_HEAD = '<div class="card"><div class="card-title">Clinical Summary</div>'
+WORKUP_CARD_HEAD = '<div class="card"><div class="card-title">Suggested Workup</div>'
+CARD_TAIL = '</div>'
+
+
+@timed(render_seconds, "build_summary_card_html")
+def build_summary_card_html(patterns, summaries):
+    return SUMMARY_CARD_HEAD + build_badges_html(patterns) + build_summary_html(summaries) + CARD_TAIL
+
+
+@timed(render_seconds, "build_workup_card_html")
+def build_workup_card_html(workup):
+    return WORKUP_CARD_HEAD + build_workup_html(workup) + CARD_TAIL
+
+
+# ──────────────────────────────────────────────
+# STATIC BLOCKS
+# ──────────────────────────────────────────────
+
+HEADER_HTML = """
+<div class="dash-header">
+    <div>
+        <div class="logo">&#128300; CBC Interpreter</div>
+        <div class="subtitle">Clinical Decision Support &middot; Haematology</div>
+    </div>
+    <div class="dash-tag">WHO / ICSH Guidelines &middot; v1.0</div>
+</div>
+"""
+
+DISCLAIMER_HTML = (
+    '<div class="disclaimer">'
+    '<b style="color:#e3b341;">&#9888; Clinical Decision Support Tool</b> &mdash; '
+    'This tool is intended to assist qualified medical professionals and does not replace '
+    'clinical judgement, full patient history, or direct laboratory review. All interpretations '
+    'should be correlated with clinical context. Reference ranges may vary by laboratory and '
+    'patient population.'
+    '</div>'
+)
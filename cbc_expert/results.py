@@ -0,0 +1,86 @@
+"""
+Compact interpretation results.
+
+A result is two small integers: the pattern code and the (label
+de-duplicated) workup mask. Readable labels, colours and workup dicts are
+resolved from the interned catalog on CBC_RULES only when rendered, so a
+million interpreted rows in a ResultBlock take a few megabytes.
+"""
+
+from .engine import CBC_RULES
+
+
+class CBCResult:
+    """One interpretation as (pattern_code, workup_mask)."""
+
+    __slots__ = ("pattern_code", "workup_mask")
+
+    def __init__(self, pattern_code, workup_mask):
+        self.pattern_code = int(pattern_code)
+        self.workup_mask = int(workup_mask)
+
+    def __eq__(self, other):
+        return (isinstance(other, CBCResult)
+                and self.pattern_code == other.pattern_code
+                and self.workup_mask == other.workup_mask)
+
+    def __hash__(self):
+        return hash((self.pattern_code, self.workup_mask))
+
+    def __repr__(self):
+        return f"CBCResult(pattern_code={self.pattern_code:#x}, workup_mask={self.workup_mask:#x})"
+
+    def __or__(self, other):
+        """Union of two results, e.g. to merge workup across serial panels."""
+        return CBCResult(self.pattern_code | other.pattern_code,
+                         CBC_RULES.dedupe(self.workup_mask | other.workup_mask))
+
+    @property
+    def patterns(self):
+        return CBC_RULES.decode_patterns(self.pattern_code)
+
+    @property
+    def workup(self):
+        return CBC_RULES.decode_workup(self.workup_mask)
+
+    @property
+    def pattern_labels(self):
+        return [label for label, _ in self.patterns]
+
+    @property
+    def workup_labels(self):
+        return [item["label"] for item in self.workup]
+
+
+class ResultBlock:
+    """Array-backed results for many rows: one uint16 code and one workup mask per row."""
+
+    __slots__ = ("codes", "masks")
+
+    def __init__(self, codes, masks):
+        self.codes = codes
+        self.masks = masks
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return CBCResult(self.codes[i], self.masks[i])
+
+    def __iter__(self):
+        for code, mask in zip(self.codes.tolist(), self.masks.tolist()):
+            yield CBCResult(code, mask)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.masks.nbytes
+
+    def pattern_counts(self):
+        """{pattern label: rows where it fired}."""
+        return {label: int(((self.codes >> i) & 1).sum())
+                for i, (label, _) in enumerate(CBC_RULES.patterns)}
+
+    def workup_union(self):
+        """Every workup item suggested anywhere in the block, as one mask."""
+        import numpy as np
+        return CBC_RULES.dedupe(int(np.bitwise_or.reduce(self.masks))) if len(self) else 0
@@ -0,0 +1,307 @@
+"""Reference limits and the declarative CBC rule table."""
+
+# ──────────────────────────────────────────────
+# REFERENCE LIMITS
+# ──────────────────────────────────────────────
+
+# Shared by the rule table and the parameter grid.
+REFERENCE_LIMITS = {
+    "Female": {"hgb_low": 12.0, "mcv_low": 80, "mcv_high": 100, "wbc_low": 4.0,
+               "wbc_high": 11.0, "neutrophil_high": 70, "plt_low": 150, "plt_high": 450},
+    "Male":   {"hgb_low": 13.0, "mcv_low": 80, "mcv_high": 100, "wbc_low": 4.0,
+               "wbc_high": 11.0, "neutrophil_high": 70, "plt_low": 150, "plt_high": 450},
+}
+
+
+def reference_limits(sex, age=None, lab=None):
+    """
+    Limits for a patient. Without an age or lab these are the adult
+    REFERENCE_LIMITS; otherwise the band is resolved by cbc_expert.ranges.
+    """
+    if age is None and lab is None:
+        return REFERENCE_LIMITS["Female" if sex == "Female" else "Male"]
+    from .ranges import reference_index
+    return reference_index().lookup(sex, age, lab)
+
+
+# ──────────────────────────────────────────────
+# RULE TABLE
+# ──────────────────────────────────────────────
+
+# Each predicate is (input field, operator, reference limit).
+PREDICATES = {
+    "anaemia":          ("hgb", "<", "hgb_low"),
+    "mcv_low":          ("mcv", "<", "mcv_low"),
+    "mcv_high":         ("mcv", ">", "mcv_high"),
+    "mcv_not_low":      ("mcv", ">=", "mcv_low"),
+    "mcv_not_high":     ("mcv", "<=", "mcv_high"),
+    "leukocytosis":     ("wbc", ">", "wbc_high"),
+    "neutrophilia":     ("neutrophil_pct", ">", "neutrophil_high"),
+    "leukopenia":       ("wbc", "<", "wbc_low"),
+    "thrombocytopenia": ("platelets", "<", "plt_low"),
+    "thrombocytosis":   ("platelets", ">", "plt_high"),
+}
+
+WORKUP_ITEMS = {
+    # Microcytic anaemia
+    "serum_ferritin":
+        {"label": "Serum Ferritin",
+         "reason": "Gold standard for iron stores; low in IDA, high in ACD",
+         "priority": "red"},
+    "tibc":
+        {"label": "TIBC / Transferrin Saturation",
+         "reason": "Distinguish iron deficiency from anaemia of chronic disease",
+         "priority": "red"},
+    "smear_hypochromia":
+        {"label": "Peripheral Blood Smear",
+         "reason": "Assess for hypochromia, pencil cells, target cells",
+         "priority": "orange"},
+    "hb_electrophoresis":
+        {"label": "Haemoglobin Electrophoresis",
+         "reason": "Rule out thalassaemia trait if ferritin is normal",
+         "priority": "blue"},
+    # Macrocytic anaemia
+    "b12_folate":
+        {"label": "Serum Vitamin B12 & Folate",
+         "reason": "Most common reversible causes of macrocytosis",
+         "priority": "red"},
+    "smear_megaloblastic":
+        {"label": "Peripheral Blood Smear",
+         "reason": "Look for hypersegmented neutrophils and macro-ovalocytes",
+         "priority": "orange"},
+    "tsh":
+        {"label": "TSH",
+         "reason": "Hypothyroidism is a recognised cause of macrocytosis",
+         "priority": "blue"},
+    "reticulocytes":
+        {"label": "Reticulocyte Count",
+         "reason": "Assess bone marrow erythroid response",
+         "priority": "blue"},
+    "ldh_bilirubin":
+        {"label": "LDH & Indirect Bilirubin",
+         "reason": "Elevated in ineffective erythropoiesis / haemolysis",
+         "priority": "blue"},
+    # Normocytic anaemia
+    "reticulocytes_rpi":
+        {"label": "Reticulocyte Count + Reticulocyte Production Index",
+         "reason": "Distinguish hypoproliferative from hyperproliferative cause",
+         "priority": "red"},
+    "smear_haemolysis":
+        {"label": "Peripheral Blood Smear",
+         "reason": "Identify spherocytes, sickle cells, fragmented RBCs, or blasts",
+         "priority": "orange"},
+    "haemolysis_screen":
+        {"label": "LDH, Haptoglobin, Direct Coombs Test",
+         "reason": "Rule out haemolytic anaemia",
+         "priority": "blue"},
+    "ferritin_crp":
+        {"label": "Serum Ferritin + CRP",
+         "reason": "Ferritin elevated in ACD; CRP confirms inflammation",
+         "priority": "blue"},
+    # Leukocytosis with neutrophilia
+    "infection_screen":
+        {"label": "Rule out Bacterial Infection / Inflammation",
+         "reason": "Neutrophilic leukocytosis is the hallmark reactive pattern",
+         "priority": "red"},
+    "crp_procalcitonin":
+        {"label": "CRP & Procalcitonin",
+         "reason": "Quantify inflammatory burden; PCT favours bacterial aetiology",
+         "priority": "orange"},
+    "blood_cultures":
+        {"label": "Blood Cultures x2 sets",
+         "reason": "Mandatory if sepsis is clinically suspected",
+         "priority": "red"},
+    "smear_left_shift":
+        {"label": "Peripheral Smear - Toxic Granulation / Left Shift",
+         "reason": "Morphological confirmation of reactive neutrophilia",
+         "priority": "orange"},
+    # Leukocytosis
+    "smear_manual_diff":
+        {"label": "Peripheral Blood Smear + Manual Differential",
+         "reason": "Characterise cell morphology; identify atypical lymphocytes or blasts",
+         "priority": "orange"},
+    "viral_serology":
+        {"label": "Monospot / EBV / CMV Serology",
+         "reason": "Viral causes of atypical lymphocytosis",
+         "priority": "blue"},
+    # Leukopenia
+    "smear_cell_lines":
+        {"label": "Peripheral Smear + Manual Differential",
+         "reason": "Identify which cell line is reduced; look for dysplastic changes",
+         "priority": "red"},
+    "ana_dsdna":
+        {"label": "ANA & Anti-dsDNA",
+         "reason": "Autoimmune neutropenia; rule out SLE",
+         "priority": "blue"},
+    "medication_review":
+        {"label": "Medication Review",
+         "reason": "Drug-induced leukopenia is a common and reversible cause",
+         "priority": "orange"},
+    "bone_marrow_biopsy":
+        {"label": "Bone Marrow Biopsy",
+         "reason": "Indicated if persistent or pancytopaenia is present",
+         "priority": "blue"},
+    # Thrombocytopenia
+    "manual_platelet_count":
+        {"label": "Manual Platelet Count & Peripheral Smear Review",
+         "reason": "Rule out EDTA-induced clumping / pseudothrombocytopaenia first",
+         "priority": "red"},
+    "repeat_cbc_citrate":
+        {"label": "Repeat CBC in Citrate or Heparin Tube",
+         "reason": "Confirms true thrombocytopaenia if clumping is seen on smear",
+         "priority": "orange"},
+    "coagulation_screen":
+        {"label": "PT / aPTT / Fibrinogen",
+         "reason": "Rule out DIC if clinical context warrants (bleeding, sepsis)",
+         "priority": "blue"},
+    "itp_screen":
+        {"label": "Anti-platelet Antibodies / H. pylori Testing",
+         "reason": "Consider ITP workup in isolated thrombocytopaenia",
+         "priority": "blue"},
+    # Thrombocytosis
+    "crp_esr":
+        {"label": "CRP / ESR",
+         "reason": "Reactive thrombocytosis screening; elevated in infection/inflammation",
+         "priority": "blue"},
+    "jak2":
+        {"label": "JAK2 V617F Mutation Analysis",
+         "reason": "Essential thrombocythaemia / myeloproliferative neoplasm panel",
+         "priority": "orange"},
+    "smear_platelet_morphology":
+        {"label": "Peripheral Blood Smear",
+         "reason": "Assess platelet morphology; giant platelets suggest MPN",
+         "priority": "orange"},
+    "iron_studies":
+        {"label": "Iron Studies",
+         "reason": "IDA is a common cause of reactive thrombocytosis",
+         "priority": "blue"},
+}
+
+# Rules are evaluated in order. Within a group only the first matching rule
+# fires (an if/elif chain); a rule with no predicates is the group's else
+# branch. A fallback rule fires only when no pattern has fired before it.
+# Summaries are str.format templates over the inputs, the reference limits
+# and neutrophil_abs.
+RULES = (
+    # ── 1. Microcytic Anaemia ──────────────────────────────────────────────
+    {"group": "anaemia", "when": ("anaemia", "mcv_low"),
+     "pattern": ("Microcytic Anaemia", "red"),
+     "summary": (
+         "Haemoglobin is <b>{hgb} g/dL</b> (below {hgb_low} g/dL for {sex}) "
+         "with a low MCV of <b>{mcv} fL</b> — consistent with <b>microcytic anaemia</b>. "
+         "Iron deficiency is the most common aetiology; thalassaemia trait and anaemia of "
+         "chronic disease should also be considered."),
+     "workup": ("serum_ferritin", "tibc", "smear_hypochromia", "hb_electrophoresis")},
+
+    # ── 2. Macrocytic Anaemia ──────────────────────────────────────────────
+    {"group": "anaemia", "when": ("anaemia", "mcv_high"),
+     "pattern": ("Macrocytic Anaemia", "orange"),
+     "summary": (
+         "Haemoglobin is <b>{hgb} g/dL</b> with an elevated MCV of <b>{mcv} fL</b> — "
+         "raising concern for <b>macrocytic / megaloblastic anaemia</b>. "
+         "B12/folate deficiency and hypothyroidism are primary considerations."),
+     "workup": ("b12_folate", "smear_megaloblastic", "tsh", "reticulocytes", "ldh_bilirubin")},
+
+    # ── 3. Normocytic Anaemia ──────────────────────────────────────────────
+    {"group": "anaemia", "when": ("anaemia", "mcv_not_low", "mcv_not_high"),
+     "pattern": ("Normocytic Anaemia", "orange"),
+     "summary": (
+         "Haemoglobin is <b>{hgb} g/dL</b> with a normal MCV of <b>{mcv} fL</b> — "
+         "suggesting <b>normocytic anaemia</b>. Broad differential including haemolysis, "
+         "anaemia of chronic disease, early IDA, or bone marrow failure."),
+     "workup": ("reticulocytes_rpi", "smear_haemolysis", "haemolysis_screen", "ferritin_crp")},
+
+    {"group": "anaemia", "when": (),
+     "summary": (
+         "Haemoglobin (<b>{hgb} g/dL</b>) and MCV (<b>{mcv} fL</b>) are within "
+         "normal limits for {sex}. No anaemia detected.")},
+
+    # ── 4. Leukocytosis with Neutrophilia ──────────────────────────────────
+    {"group": "leukocytosis", "when": ("leukocytosis", "neutrophilia"),
+     "pattern": ("Leukocytosis + Neutrophilia", "red"),
+     "summary": (
+         "WBC is elevated at <b>{wbc} ×10³/µL</b> with neutrophilia "
+         "(~{neutrophil_abs:.1f} ×10³/µL absolute). Pattern favours "
+         "<b>bacterial infection or acute inflammation</b>."),
+     "workup": ("infection_screen", "crp_procalcitonin", "blood_cultures", "smear_left_shift")},
+
+    {"group": "leukocytosis", "when": ("leukocytosis",),
+     "pattern": ("Leukocytosis", "orange"),
+     "summary": (
+         "WBC is elevated at <b>{wbc} ×10³/µL</b> without marked neutrophilia. "
+         "Consider viral illness, medication effect, stress response, or less commonly "
+         "a lymphoproliferative process."),
+     "workup": ("smear_manual_diff", "viral_serology")},
+
+    # ── 5. Leukopenia ──────────────────────────────────────────────────────
+    {"when": ("leukopenia",),
+     "pattern": ("Leukopenia", "red"),
+     "summary": (
+         "WBC is low at <b>{wbc} ×10³/µL</b> — <b>leukopenia</b> detected. "
+         "Consider viral suppression, drug-induced cytopaenia (chemotherapy, "
+         "immunosuppressants), autoimmune disease, or bone marrow failure."),
+     "workup": ("smear_cell_lines", "ana_dsdna", "medication_review", "bone_marrow_biopsy")},
+
+    # ── 6. Thrombocytopenia ────────────────────────────────────────────────
+    {"when": ("thrombocytopenia",),
+     "pattern": ("Thrombocytopenia", "red"),
+     "summary": (
+         "Platelet count is low at <b>{platelets} ×10³/µL</b>. "
+         "EDTA-induced pseudothrombocytopaenia (platelet clumping) must be excluded "
+         "before any clinical intervention. True thrombocytopaenia warrants further evaluation."),
+     "workup": ("manual_platelet_count", "repeat_cbc_citrate", "coagulation_screen", "itp_screen")},
+
+    # ── 7. Thrombocytosis ──────────────────────────────────────────────────
+    {"when": ("thrombocytosis",),
+     "pattern": ("Thrombocytosis", "orange"),
+     "summary": (
+         "Platelet count is elevated at <b>{platelets} ×10³/µL</b> — "
+         "<b>thrombocytosis</b> detected. Reactive causes (infection, iron deficiency, "
+         "post-splenectomy) are most common. If >1000 or persistent, consider "
+         "essential thrombocythaemia."),
+     "workup": ("crp_esr", "jak2", "smear_platelet_morphology", "iron_studies")},
+
+    # ── 8. All Normal ──────────────────────────────────────────────────────
+    {"fallback": True,
+     "pattern": ("CBC Within Normal Limits", "green"),
+     "summary": (
+         "All CBC parameters are within normal reference ranges. "
+         "No immediate haematological workup is indicated based on current values.")},
+)
+
+
+# ──────────────────────────────────────────────
+# DELTA CHECKS
+# ──────────────────────────────────────────────
+
+# Compared with the patient's previous panel. `change` is one of
+#   drop / rise         previous - current >= by  /  current - previous >= by
+#   fall_to / rise_to   current <= previous * by  /  current >= previous * by
+# A rule only applies when the previous panel is at most within_hours older.
+# Summaries are str.format templates over the current inputs, prev_<field>
+# and hours (time since the previous panel).
+DELTA_RULES = (
+    {"field": "hgb", "change": "drop", "by": 2.0, "within_hours": 72,
+     "pattern": ("Falling Haemoglobin", "red"),
+     "summary": (
+         "Haemoglobin fell from <b>{prev_hgb} g/dL</b> to <b>{hgb} g/dL</b> in "
+         "{hours:.0f} h — exclude <b>acute blood loss or haemolysis</b>.")},
+
+    {"field": "platelets", "change": "fall_to", "by": 0.5, "within_hours": 72,
+     "pattern": ("Platelets Halved", "red"),
+     "summary": (
+         "Platelets fell from <b>{prev_platelets}</b> to <b>{platelets} ×10³/µL</b> in "
+         "{hours:.0f} h — consider <b>HIT, DIC or consumption</b>.")},
+
+    {"field": "wbc", "change": "rise_to", "by": 2.0, "within_hours": 72,
+     "pattern": ("WBC Doubled", "orange"),
+     "summary": (
+         "WBC rose from <b>{prev_wbc}</b> to <b>{wbc} ×10³/µL</b> in {hours:.0f} h — "
+         "evolving <b>infection or inflammation</b> likely.")},
+
+    {"field": "mcv", "change": "rise", "by": 5, "within_hours": 24 * 90,
+     "pattern": ("Rising MCV", "blue"),
+     "summary": (
+         "MCV rose from <b>{prev_mcv} fL</b> to <b>{mcv} fL</b> — review B12/folate, "
+         "alcohol, medication and reticulocytosis.")},
+)
@@ -0,0 +1,187 @@
+"""
+What-if sensitivity maps: the rule table evaluated over a dense 2D grid.
+
+Two inputs vary along the axes and the rest are held fixed; every grid
+point goes through evaluate_batch() in one vectorised pass (a 1000 x 1000
+map is a million panels). The fixed inputs and the limits are scalars that
+broadcast, so the only per-point arrays are the two axis columns.
+
+    grid = sensitivity_map("mcv", "hgb", sex="Female")
+    index, legend = grid.categories(("Microcytic Anaemia", "Normocytic Anaemia",
+                                     "Macrocytic Anaemia"))
+    image = grid.image(index, legend)       # (rows, cols, 3) uint8, y increasing upwards
+
+NumPy is imported on first use.
+"""
+
+from .engine import CBC_RULES, INPUT_FIELDS
+from .rules import PREDICATES, reference_limits
+
+# field -> (axis label, default low, default high)
+AXES = {
+    "hgb":            ("Haemoglobin (g/dL)", 4.0, 20.0),
+    "mcv":            ("MCV (fL)", 50.0, 140.0),
+    "wbc":            ("WBC (x10^3/uL)", 0.5, 40.0),
+    "neutrophil_pct": ("Neutrophils (%)", 0.0, 100.0),
+    "platelets":      ("Platelets (x10^3/uL)", 10.0, 1000.0),
+}
+
+# Values of the inputs that are not on an axis (a reference-normal adult).
+DEFAULT_FIXED = {"hgb": 14.0, "mcv": 90, "wbc": 7.0, "neutrophil_pct": 55, "platelets": 250}
+
+# Preset maps for teaching: axes and the patterns that separate the regions.
+SENSITIVITY_MAPS = {
+    "Anaemia morphology (MCV × Hgb)": {
+        "x": "mcv", "y": "hgb",
+        "patterns": ("Microcytic Anaemia", "Normocytic Anaemia", "Macrocytic Anaemia")},
+    "Leukocytosis (Neutrophil % × WBC)": {
+        "x": "neutrophil_pct", "y": "wbc",
+        "patterns": ("Leukocytosis + Neutrophilia", "Leukocytosis", "Leukopenia")},
+    "Platelets × WBC": {
+        "x": "platelets", "y": "wbc",
+        "patterns": ("Thrombocytopenia", "Thrombocytosis", "Leukocytosis", "Leukopenia")},
+}
+
+DEFAULT_RESOLUTION = 1000
+
+# Region colours; index 0 is "none of the selected patterns".
+PALETTE = ("#eef1f5", "#e4572e", "#f3a712", "#29335c", "#669bbc", "#a8c686",
+           "#8e5572", "#3a7d44", "#c97c5d", "#4d9de0", "#7d5ba6", "#e15554")
+THRESHOLD_COLOUR = "#1c1c1c"
+
+
+def _rgb(hex_colour):
+    return tuple(int(hex_colour[i:i + 2], 16) for i in (1, 3, 5))
+
+
+class SensitivityMap:
+    """
+    Attributes:
+        x, y          : axis field names
+        x_values      : 1-D float array of column values (left to right)
+        y_values      : 1-D float array of row values (bottom to top)
+        codes         : (len(y_values), len(x_values)) uint16 pattern codes
+        limits        : the reference limits the map was evaluated with
+        plan          : the CompiledRules evaluated
+    """
+
+    def __init__(self, x, y, x_values, y_values, codes, limits, plan):
+        self.x, self.y = x, y
+        self.x_values, self.y_values = x_values, y_values
+        self.codes = codes
+        self.limits = limits
+        self.plan = plan
+
+    def categories(self, patterns=None):
+        """
+        Collapse codes to the selected patterns (default: all). Each distinct
+        combination of selected patterns becomes one category.
+
+        Returns:
+            index  : uint8 array shaped like codes; 0 = none of the patterns
+            legend : list of (tuple of pattern labels, fraction of points),
+                     position i describing category i
+        """
+        import numpy as np
+
+        labels = [label for label, _ in self.plan.patterns]
+        bits = 0
+        for label in patterns if patterns is not None else labels:
+            bits |= 1 << self.plan.pattern_ids[label]
+        selected = self.codes & np.uint16(bits)
+        # Distinct codes via a counting pass (codes are 16-bit) instead of a sort.
+        counts = np.bincount(selected.ravel(), minlength=1 << 16)
+        present = np.flatnonzero(counts).tolist()
+        if 0 in present:
+            present.remove(0)
+        if len(present) >= 255:
+            raise ValueError("too many pattern combinations to map; select fewer patterns")
+        lookup = np.zeros(1 << 16, dtype=np.uint8)
+        lookup[present] = np.arange(1, len(present) + 1)
+        total = selected.size
+        legend = [((), float(counts[0] / total))]
+        legend += [(tuple(labels[i] for i in range(len(labels)) if code >> i & 1),
+                    float(counts[code] / total)) for code in present]
+        return lookup[selected], legend
+
+    def thresholds(self):
+        """Reference limits falling on each axis, as (field, limit name, value)."""
+        lines = []
+        for field, _, limit in PREDICATES.values():
+            if field in (self.x, self.y):
+                entry = (field, limit, self.limits[limit])
+                if entry not in lines:
+                    lines.append(entry)
+        return lines
+
+    def image(self, index, legend, palette=PALETTE, show_thresholds=True):
+        """
+        RGB heatmap of categories(), highest y value in the top row.
+        Categories beyond the palette reuse its colours.
+
+        Returns:
+            (rows, cols, 3) uint8 array
+        """
+        import numpy as np
+
+        colours = np.array([_rgb(palette[i % len(palette)]) for i in range(len(legend))],
+                           dtype=np.uint8)
+        rgb = colours[index[::-1]]
+        if show_thresholds:
+            line = np.array(_rgb(THRESHOLD_COLOUR), dtype=np.uint8)
+            for field, _, value in self.thresholds():
+                values = self.x_values if field == self.x else self.y_values
+                if not values[0] <= value <= values[-1]:
+                    continue
+                k = int(np.searchsorted(values, value))
+                if field == self.x:
+                    rgb[:, k] = line
+                else:
+                    rgb[len(values) - 1 - k] = line
+        return rgb
+
+
+def sensitivity_map(x, y, sex="Female", fixed=None, x_range=None, y_range=None,
+                    resolution=DEFAULT_RESOLUTION, age=None, lab=None, plan=CBC_RULES):
+    """
+    Evaluate the rule table over a resolution x resolution grid (or a
+    (columns, rows) pair) of x and y values. Inputs not on an axis come from
+    `fixed`, falling back to DEFAULT_FIXED; sex, age and lab select the
+    reference limits.
+
+    Returns:
+        SensitivityMap
+    """
+    import numpy as np
+
+    from .batch import evaluate_batch
+
+    if x == y or x not in AXES or y not in AXES:
+        raise ValueError(f"axes must be two different inputs of {', '.join(AXES)}")
+    cols, rows = (resolution, resolution) if isinstance(resolution, int) else resolution
+    x_values = np.linspace(*(x_range or AXES[x][1:]), cols)
+    y_values = np.linspace(*(y_range or AXES[y][1:]), rows)
+
+    n = rows * cols
+    values = dict(DEFAULT_FIXED, **(fixed or {}))
+    columns = {field: np.broadcast_to(np.float64(values[field]), n)
+               for field in INPUT_FIELDS[:-1]}
+    columns[x] = np.tile(x_values, rows)
+    columns[y] = np.repeat(y_values, cols)
+
+    limits = reference_limits(sex, age, lab)
+    codes, _ = evaluate_batch(plan, columns, limits)
+    return SensitivityMap(x, y, x_values, y_values, codes.reshape(rows, cols), limits, plan)
+
+
+def legend_html(legend, palette=PALETTE):
+    """Colour swatches with each category's share of the map."""
+    items = []
+    for i, (labels, share) in enumerate(legend):
+        name = " + ".join(labels) if labels else "None of the selected patterns"
+        items.append(
+            f'<span style="display:inline-flex;align-items:center;margin:0 14px 6px 0;">'
+            f'<span style="width:14px;height:14px;border-radius:3px;margin-right:6px;'
+            f'background:{palette[i % len(palette)]};border:1px solid #c9ced6;"></span>'
+            f'{name} <span style="color:#6b7280;margin-left:4px;">{share:.1%}</span></span>')
+    return f'<div style="display:flex;flex-wrap:wrap;">{"".join(items)}</div>'
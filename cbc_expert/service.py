@@ -0,0 +1,393 @@
+"""
+Local asyncio HTTP service exposing interpret_cbc as JSON.
+
+    python -m cbc_expert serve [--host 127.0.0.1] [--port 8787]
+
+Endpoints:
+    POST /interpret        one panel {"hgb": 11.5, "mcv": 72, "wbc": 8.5,
+                           "neutrophil_pct": 65, "platelets": 210, "sex": "Female"}
+                           plus optional "age" (years) and "lab" to select a
+                           reference-range profile
+    POST /interpret/bulk   {"panels": [panel, ...]} (or a bare JSON list)
+    GET  /stats            request counts, responses by status, batching and
+                           p50/p95/p99 latency
+    GET  /metrics          Prometheus text format (see cbc_expert.metrics)
+    GET  /healthz
+
+Panels arriving within window_ms of each other are coalesced into one
+batched evaluation. Backpressure: once max_pending panels are queued new
+requests get 503, bodies over max_body_bytes get 413, and bulk requests are
+capped at max_bulk panels. Standard library only; runs fully offline.
+"""
+
+import asyncio
+import json
+import math
+import sys
+import time
+from collections import Counter, deque
+from functools import lru_cache
+from http import HTTPStatus
+
+from . import metrics
+from .engine import CBC_RULES, INPUT_FIELDS, decode_patterns, decode_workup, render_summaries
+from .rules import reference_limits
+from .stream import SEX_CODES
+
+DEFAULT_PORT = 8787
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Below this many panels the scalar plan beats NumPy's per-call overhead.
+SCALAR_BATCH_LIMIT = 32
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+# ──────────────────────────────────────────────
+# PAYLOADS
+# ──────────────────────────────────────────────
+
+def parse_panel(doc):
+    """
+    JSON object -> input tuple in INPUT_FIELDS order followed by age and lab
+    (None when absent); raises HTTPError(400). Values must be finite numbers
+    (JSON allows 1e999, Infinity, NaN and arbitrarily large integers).
+    """
+    if not isinstance(doc, dict):
+        raise HTTPError(400, "panel must be a JSON object")
+    panel = []
+    for field in INPUT_FIELDS[:-1]:
+        v = doc.get(field)
+        if isinstance(v, bool) or not isinstance(v, (int, float)) or not _finite(v):
+            raise HTTPError(400, f"{field} must be a finite number")
+        panel.append(v)
+    sex = SEX_CODES.get(str(doc.get("sex", "")).strip().lower())
+    if sex is None:
+        raise HTTPError(400, "sex must be Female or Male")
+    panel.append(sex)
+    age, lab = doc.get("age"), doc.get("lab")
+    if age is not None and (isinstance(age, bool) or not isinstance(age, (int, float))
+                            or not _finite(age) or not 0 <= age < 150):
+        raise HTTPError(400, "age must be a number of years")
+    if lab is not None and not isinstance(lab, str):
+        raise HTTPError(400, "lab must be a string")
+    panel += (age, lab)
+    return tuple(panel)
+
+
+def _finite(v):
+    try:
+        return math.isfinite(v)
+    except OverflowError:          # an int too large for a float
+        return False
+
+
+@lru_cache(maxsize=None)
+def _patterns_json(code):
+    return json.dumps([{"label": label, "color": color} for label, color in decode_patterns(code)])
+
+
+@lru_cache(maxsize=None)
+def _workup_json(mask):
+    return json.dumps(decode_workup(mask))
+
+
+def result_json(panel, code, mask):
+    return (f'{{"patterns": {_patterns_json(code)}, '
+            f'"summaries": {json.dumps(render_summaries(code, *panel))}, '
+            f'"workup": {_workup_json(mask)}}}')
+
+
+# ──────────────────────────────────────────────
+# MICRO-BATCHING
+# ──────────────────────────────────────────────
+
+def evaluate_panels(panels):
+    """Returns a list of (pattern_code, workup_mask), one per panel."""
+    if len(panels) < SCALAR_BATCH_LIMIT:
+        results = []
+        for panel in panels:
+            values = dict(zip(INPUT_FIELDS, panel))
+            code, mask, _ = CBC_RULES.evaluate(values, reference_limits(*panel[5:]))
+            results.append((code, mask))
+            if metrics.ENABLED:
+                metrics.record_result(CBC_RULES, code, mask, "service")
+        return results
+
+    from .batch import interpret_cbc_batch
+    columns = list(zip(*panels))
+    # Age/lab columns only when some panel has them, so plain feeds keep the
+    # two-band np.where path.
+    if all(age is None for age in columns[6]) and all(lab is None for lab in columns[7]):
+        columns = columns[:6]
+    codes, masks = interpret_cbc_batch(*columns)
+    return list(zip(codes.tolist(), masks.tolist()))
+
+
+class MicroBatcher:
+    """Coalesces panels submitted within window_ms into one evaluation."""
+
+    def __init__(self, window_ms=2.0, max_batch=4096, max_pending=50_000):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.pending = 0
+        self.batches = 0
+        self.batched_panels = 0
+        self.rejected = 0
+        self.failed_batches = 0
+        self._queue = deque()
+        self._wakeup = asyncio.Event()
+
+    async def submit(self, panels):
+        if self.pending + len(panels) > self.max_pending:
+            self.rejected += 1
+            raise HTTPError(503, "server busy, retry later")
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((panels, future))
+        self.pending += len(panels)
+        self._wakeup.set()
+        return await future
+
+    async def run(self):
+        while True:
+            await self._wakeup.wait()
+            if self.pending < self.max_batch:
+                await asyncio.sleep(self.window)
+
+            batch, size = [], 0
+            while self._queue and (not batch or size + len(self._queue[0][0]) <= self.max_batch):
+                panels, future = self._queue.popleft()
+                batch.append((panels, future))
+                size += len(panels)
+            if not self._queue:
+                self._wakeup.clear()
+
+            self.pending -= size
+            self.batches += 1
+            self.batched_panels += size
+            try:
+                results = evaluate_panels([p for panels, _ in batch for p in panels])
+            except Exception:
+                # Re-evaluate request by request so a failure stays with the
+                # request that caused it.
+                self.failed_batches += 1
+                for panels, future in batch:
+                    try:
+                        result = evaluate_panels(panels)
+                    except Exception as exc:
+                        if not future.done():
+                            future.set_exception(exc)
+                    else:
+                        if not future.done():
+                            future.set_result(result)
+                continue
+            start = 0
+            for panels, future in batch:
+                if not future.done():
+                    future.set_result(results[start:start + len(panels)])
+                start += len(panels)
+
+
+# ──────────────────────────────────────────────
+# LATENCY
+# ──────────────────────────────────────────────
+
+class LatencyStats:
+    """Request count plus a sliding window of recent latencies."""
+
+    def __init__(self, window=10_000):
+        self.count = 0
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds):
+        self.count += 1
+        self.samples.append(seconds)
+
+    def summary(self):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return {"count": self.count}
+
+        def pct(q):
+            return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+        return {"count": self.count, "p50_ms": pct(0.50), "p95_ms": pct(0.95), "p99_ms": pct(0.99)}
+
+
+# ──────────────────────────────────────────────
+# HTTP SERVER
+# ──────────────────────────────────────────────
+
+class InterpretationService:
+
+    def __init__(self, window_ms=2.0, max_batch=4096, max_pending=50_000,
+                 max_bulk=10_000, max_body_bytes=8 * 1024 * 1024):
+        self.batcher_config = (window_ms, max_batch, max_pending)
+        self.max_bulk = max_bulk
+        self.max_body_bytes = max_body_bytes
+        self.latency = {}
+        self.responses = Counter()
+        self.started = time.time()
+        self.batcher = None
+        self._batcher_task = None
+        self.routes = {
+            ("POST", "/interpret"): self.interpret,
+            ("POST", "/interpret/bulk"): self.interpret_bulk,
+            ("GET", "/stats"): self.stats,
+            ("GET", "/metrics"): self.prometheus,
+            ("GET", "/healthz"): self.healthz,
+        }
+        self.content_types = {"/metrics": PROMETHEUS_CONTENT_TYPE}
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        self.batcher = MicroBatcher(*self.batcher_config)
+        self._batcher_task = asyncio.create_task(self.batcher.run())
+        return await asyncio.start_server(self.handle, host, port)
+
+    # ── Endpoints ──────────────────────────────────────────────────────────
+    async def interpret(self, body):
+        panel = parse_panel(_load_json(body))
+        (code, mask), = await self.batcher.submit([panel])
+        return result_json(panel, code, mask)
+
+    async def interpret_bulk(self, body):
+        doc = _load_json(body)
+        docs = doc.get("panels") if isinstance(doc, dict) else doc
+        if not isinstance(docs, list):
+            raise HTTPError(400, "expected a list of panels")
+        if len(docs) > self.max_bulk:
+            raise HTTPError(413, f"at most {self.max_bulk} panels per request")
+        panels = [parse_panel(d) for d in docs]
+        results = await self.batcher.submit(panels) if panels else []
+        return '{"results": [' + ", ".join(
+            result_json(panel, code, mask) for panel, (code, mask) in zip(panels, results)
+        ) + "]}"
+
+    async def stats(self, body):
+        b = self.batcher
+        return json.dumps({
+            "uptime_s": round(time.time() - self.started, 1),
+            "endpoints": {path: s.summary() for path, s in self.latency.items()},
+            "batches": b.batches,
+            "mean_batch_size": round(b.batched_panels / b.batches, 2) if b.batches else 0,
+            "pending": b.pending,
+            "rejected": b.rejected,
+            "failed_batches": b.failed_batches,
+            "responses": {str(status): n for status, n in sorted(self.responses.items())},
+        })
+
+    async def prometheus(self, body):
+        return metrics.REGISTRY.render()
+
+    async def healthz(self, body):
+        return '{"status": "ok"}'
+
+    # ── Connection handling ────────────────────────────────────────────────
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except asyncio.LimitOverrunError:
+                    await self._respond(writer, 431, _error_json("headers too large"), False)
+                    break
+                started = time.perf_counter()
+
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, target, version = (request_line.split(" ", 2) + ["", ""])[:3]
+                path = target.split("?", 1)[0]
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = (version == "HTTP/1.1"
+                              and headers.get("connection", "").lower() != "close")
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                    if length < 0:
+                        raise ValueError
+                except ValueError:
+                    await self._respond(writer, 400, _error_json("bad Content-Length"), False)
+                    break
+                if length > self.max_body_bytes:
+                    await self._respond(writer, 413, _error_json("request body too large"), False)
+                    break
+                try:
+                    body = await reader.readexactly(length) if length else b""
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break               # client closed mid-body
+
+                route = self.routes.get((method, path))
+                try:
+                    if route is None:
+                        raise HTTPError(404 if path not in {p for _, p in self.routes} else 405,
+                                        f"no route for {method} {path}")
+                    status, payload = 200, await route(body)
+                except HTTPError as exc:
+                    status, payload = exc.status, _error_json(str(exc))
+                except Exception as exc:
+                    print(f"error handling {method} {path}: {exc!r}", file=sys.stderr)
+                    status, payload = 500, _error_json("internal error")
+
+                content_type = "application/json"
+                if status == 200:
+                    content_type = self.content_types.get(path, content_type)
+                await self._respond(writer, status, payload, keep_alive, content_type)
+                self.responses[status] += 1
+                elapsed = time.perf_counter() - started
+                self.latency.setdefault(path if route else "other", LatencyStats()).record(elapsed)
+                if metrics.ENABLED:
+                    metrics.http_seconds.observe(elapsed, (path if route else "other",))
+                if not keep_alive:
+                    break
+        finally:
+            writer.close()
+
+    async def _respond(self, writer, status, payload, keep_alive,
+                       content_type="application/json"):
+        body = payload.encode()
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n")
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode() + b"\r\n" + body)
+        await writer.drain()
+
+
+def _load_json(body):
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise HTTPError(400, "body is not valid JSON") from None
+
+
+def _error_json(message):
+    return json.dumps({"error": message})
+
+
+def serve(host="127.0.0.1", port=DEFAULT_PORT, **options):
+    """Run the service until interrupted."""
+
+    async def main():
+        service = InterpretationService(**options)
+        server = await service.start(host, port)
+        bound = server.sockets[0].getsockname()
+        print(f"CBC interpretation service on http://{bound[0]}:{bound[1]}", flush=True)
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
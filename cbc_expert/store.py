@@ -0,0 +1,364 @@
+"""
+Longitudinal SQLite store of interpreted CBCs, with delta checks.
+
+    with PanelStore("cbc.sqlite") as store:
+        store.add("MRN001", "2024-03-01T08:00", 11.5, 72, 8.5, 65, 210, "Female")
+        store.add("MRN002", "2024-03-01T09:00", 11.5, 80, 9.0, 40, 300, "Male", age=6)
+        store.add_many(records)            # batched transactions
+        store.last_n("MRN001", 5)          # newest first
+
+Panels live in a WITHOUT ROWID table whose primary key is
+(patient_id, collected_at), so each patient's history is stored contiguously
+in key order: "last N" and "previous panel" are one B-tree seek plus a short
+range scan however large the table grows.
+
+Each panel may carry the patient's age and a lab, which select its
+reference-range profile (cbc_expert.ranges) as in interpret_cbc; both are
+stored with it. Delta checks (rules.DELTA_RULES) run in the same pass as the
+rule table, against the latest panel known for the patient before the new
+one. Deltas are fixed at insert time; back-filling an older panel does not
+recompute the deltas of panels collected after it.
+"""
+
+import math
+import sqlite3
+from bisect import bisect_left
+from datetime import datetime, timezone
+
+from .engine import CBC_RULES, INPUT_FIELDS
+from .rules import DELTA_RULES, reference_limits
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS panels (
+    patient_id      TEXT    NOT NULL,
+    collected_at    TEXT    NOT NULL,
+    hgb             REAL    NOT NULL,
+    mcv             REAL    NOT NULL,
+    wbc             REAL    NOT NULL,
+    neutrophil_pct  REAL    NOT NULL,
+    platelets       REAL    NOT NULL,
+    sex             TEXT    NOT NULL,
+    age             REAL,
+    lab             TEXT,
+    pattern_code    INTEGER NOT NULL,
+    workup_mask     INTEGER NOT NULL,
+    delta_code      INTEGER NOT NULL,
+    PRIMARY KEY (patient_id, collected_at)
+) WITHOUT ROWID
+"""
+
+COLUMNS = ("patient_id", "collected_at", *INPUT_FIELDS, "age", "lab",
+           "pattern_code", "workup_mask", "delta_code")
+
+# Columns added since the first release; stores created before get them on open.
+ADDED_COLUMNS = (("age", "REAL"), ("lab", "TEXT"))
+
+DEFAULT_BATCH_ROWS = 10_000
+
+
+# ──────────────────────────────────────────────
+# DELTA RULES
+# ──────────────────────────────────────────────
+
+class DeltaRules:
+    """
+    Delta checks against the previous panel. Fired rules are carried as a
+    delta code with bit i set for rules[i], like the pattern code.
+    """
+
+    def __init__(self, rules=DELTA_RULES):
+        self.rules = tuple(rules)
+        self.patterns = tuple(rule["pattern"] for rule in self.rules)
+
+    def evaluate(self, values, previous, hours):
+        """values/previous map INPUT_FIELDS to numbers; hours is the time between them."""
+        code = 0
+        for i, rule in enumerate(self.rules):
+            limit = rule.get("within_hours")
+            if limit is not None and hours > limit:
+                continue
+            current, prior, by = values[rule["field"]], previous[rule["field"]], rule["by"]
+            change = rule["change"]
+            # Rounded so that e.g. 12.3 -> 10.3 counts as a 2.0 g/dL drop.
+            if change == "drop":
+                fired = round(prior - current, 6) >= by
+            elif change == "rise":
+                fired = round(current - prior, 6) >= by
+            elif change == "fall_to":
+                fired = round(current - prior * by, 6) <= 0
+            elif change == "rise_to":
+                fired = round(current - prior * by, 6) >= 0
+            else:
+                raise ValueError(f"unknown delta change {change!r}")
+            if fired:
+                code |= 1 << i
+        return code
+
+    def decode(self, code):
+        return [p for i, p in enumerate(self.patterns) if code >> i & 1]
+
+    def summaries(self, code, values, previous, hours):
+        fields = dict(values, hours=hours, **{f"prev_{k}": v for k, v in previous.items()})
+        return [rule["summary"].format(**fields)
+                for i, rule in enumerate(self.rules) if code >> i & 1]
+
+
+DELTA_CHECKS = DeltaRules()
+
+
+def _moment(value):
+    """datetime or ISO-8601 text -> naive datetime; a UTC offset is converted to UTC."""
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def timestamp(value):
+    """
+    datetime or ISO-8601 text -> the canonical stored text, which sorts
+    chronologically: times with an offset are stored as UTC without one, and
+    times without one are taken to be UTC already.
+    """
+    return _moment(value).isoformat(sep="T", timespec="seconds")
+
+
+def hours_between(earlier, later):
+    return (_moment(later) - _moment(earlier)).total_seconds() / 3600
+
+
+def interpret_with_deltas(panel, previous=None, hours=None, plan=CBC_RULES, deltas=DELTA_CHECKS):
+    """
+    The rule table and the delta checks in one pass. panel is an
+    INPUT_FIELDS tuple, optionally followed by age and lab to select a
+    reference-range profile; previous is an INPUT_FIELDS tuple or None.
+
+    Returns:
+        (pattern_code, workup_mask, delta_code)
+    """
+    code, mask = plan.scalar_codes(*panel[:6], reference_limits(*panel[5:]))
+    delta = 0
+    if previous is not None:
+        delta = deltas.evaluate(dict(zip(INPUT_FIELDS, panel)),
+                                dict(zip(INPUT_FIELDS, previous)), hours)
+    return code, mask, delta
+
+
+def check_record(record):
+    """
+    (patient_id, collected_at, hgb, mcv, wbc, neutrophil_pct, platelets, sex
+    [, age[, lab]]) -> the same as stored: canonical timestamp, age and lab
+    always present (None when absent). Raises ValueError with a short reason
+    for a record that cannot be stored.
+    """
+    if not 8 <= len(record) <= 10:
+        raise ValueError(f"expected 8 to 10 fields, got {len(record)}")
+    patient_id, collected_at, *values = record[:8]
+    age, lab = (tuple(record[8:]) + (None, None))[:2]
+    if patient_id is None or not str(patient_id).strip():
+        raise ValueError("missing patient_id")
+    try:
+        at = timestamp(collected_at)
+    except (TypeError, ValueError):
+        raise ValueError(f"collected_at {collected_at!r} is not an ISO-8601 time") from None
+    panel = []
+    for field, v in zip(INPUT_FIELDS, values[:-1]):
+        if isinstance(v, bool) or not isinstance(v, (int, float)):
+            try:
+                v = float(v)
+            except (TypeError, ValueError):
+                raise ValueError(f"{field} must be a number") from None
+        if not math.isfinite(v):
+            raise ValueError(f"{field} must be a finite number")
+        panel.append(v)
+    if values[-1] not in ("Female", "Male"):
+        raise ValueError("sex must be Female or Male")
+    if age is not None:
+        try:
+            age = float(age)
+        except (TypeError, ValueError):
+            raise ValueError("age must be a number of years") from None
+        if age != age:
+            age = None              # NaN from a column of optional ages
+        elif not 0 <= age < 150:
+            raise ValueError("age must be a number of years")
+    if lab is not None and not isinstance(lab, str):
+        raise ValueError("lab must be a string")
+    return (str(patient_id), at, *panel, values[-1], age, lab or None)
+
+
+# ──────────────────────────────────────────────
+# STORE
+# ──────────────────────────────────────────────
+
+class PanelStore:
+
+    def __init__(self, path=":memory:", deltas=DELTA_CHECKS):
+        self.path = path
+        self.deltas = deltas
+        self.db = sqlite3.connect(path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("PRAGMA cache_size=-65536")
+        self.db.execute(SCHEMA)
+        present = {row[1] for row in self.db.execute("PRAGMA table_info(panels)")}
+        for name, kind in ADDED_COLUMNS:
+            if name not in present:
+                self.db.execute(f"ALTER TABLE panels ADD COLUMN {name} {kind}")
+        self._insert = (f"INSERT OR REPLACE INTO panels ({', '.join(COLUMNS)}) "
+                        f"VALUES ({', '.join('?' * len(COLUMNS))})")
+
+    def close(self):
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.db.execute("SELECT count(*) FROM panels").fetchone()[0]
+
+    # ── Reads ──────────────────────────────────────────────────────────────
+    def last_n(self, patient_id, n=5):
+        """The patient's n most recent panels, newest first, as dicts."""
+        rows = self.db.execute(
+            "SELECT * FROM panels WHERE patient_id = ? ORDER BY collected_at DESC LIMIT ?",
+            (patient_id, n)).fetchall()
+        return [dict(row) for row in rows]
+
+    def previous(self, patient_id, before):
+        """The latest panel collected strictly before `before`, or None."""
+        row = self.db.execute(
+            "SELECT * FROM panels WHERE patient_id = ? AND collected_at < ? "
+            "ORDER BY collected_at DESC LIMIT 1",
+            (patient_id, timestamp(before))).fetchone()
+        return dict(row) if row else None
+
+    def history(self, patient_id, since=None, until=None):
+        """All panels in [since, until], oldest first."""
+        rows = self.db.execute(
+            "SELECT * FROM panels WHERE patient_id = ? AND collected_at >= ? "
+            "AND collected_at <= ? ORDER BY collected_at",
+            (patient_id, timestamp(since) if since else "", timestamp(until) if until else "~"))
+        return [dict(row) for row in rows]
+
+    # ── Writes ─────────────────────────────────────────────────────────────
+    def add(self, patient_id, collected_at, hgb, mcv, wbc, neutrophil_pct, platelets, sex,
+            age=None, lab=None):
+        """
+        Interpret, delta-check against the previous panel and store one panel.
+        age and lab select the reference-range profile. Raises ValueError
+        for an invalid panel (see check_record).
+
+        Returns:
+            the stored row as a dict
+        """
+        record = check_record((patient_id, collected_at, hgb, mcv, wbc, neutrophil_pct,
+                               platelets, sex, age, lab))
+        patient_id, at, panel = record[0], record[1], record[2:]
+        prior = self.previous(patient_id, at)
+        if prior is None:
+            code, mask, delta = interpret_with_deltas(panel)
+        else:
+            code, mask, delta = interpret_with_deltas(
+                panel, tuple(prior[f] for f in INPUT_FIELDS), hours_between(prior["collected_at"], at),
+                deltas=self.deltas)
+        row = (*record, code, mask, delta)
+        with self.db:
+            self.db.execute(self._insert, row)
+        return dict(zip(COLUMNS, row))
+
+    def add_many(self, records, batch_rows=DEFAULT_BATCH_ROWS, rejected=None):
+        """
+        Bulk insert (patient_id, collected_at, hgb, mcv, wbc, neutrophil_pct,
+        platelets, sex[, age[, lab]]) records, one transaction per
+        batch_rows. Each batch is interpreted through the NumPy batch path;
+        previous panels come from the batch itself or from one indexed range
+        scan per patient.
+
+        Records check_record() refuses (a NaN value, a bad timestamp, ...)
+        are skipped before the insert, so they never abort a batch; pass a
+        list as `rejected` to collect them as (record, reason) pairs.
+
+        Returns the number of panels written: a key repeated within a batch
+        counts once, and a key already stored is replaced.
+        """
+        stored, batch = 0, []
+        for record in records:
+            try:
+                record = check_record(record)
+            except ValueError as exc:
+                if rejected is not None:
+                    rejected.append((record, str(exc)))
+                continue
+            batch.append(record)
+            if len(batch) >= batch_rows:
+                stored += self._add_batch(batch)
+                batch = []
+        if batch:
+            stored += self._add_batch(batch)
+        return stored
+
+    def _add_batch(self, records):
+        from .batch import interpret_cbc_batch
+
+        # One record per key, the last one given (as INSERT OR REPLACE
+        # would leave it), sorted by key only since age and lab may be None.
+        records = sorted({r[:2]: r for r in records}.values(), key=lambda r: r[:2])
+        columns = list(zip(*records))
+        ages, labs = columns[8], columns[9]
+        if all(a is None for a in ages) and all(lab is None for lab in labs):
+            ages = labs = None
+        codes, masks = interpret_cbc_batch(*columns[2:8], age=ages, lab=labs)
+        codes, masks = codes.tolist(), masks.tolist()
+
+        rows = []
+        start = 0
+        while start < len(records):
+            patient_id = records[start][0]
+            end = start
+            while end < len(records) and records[end][0] == patient_id:
+                end += 1
+            timeline = self._stored_timeline(patient_id, records[start][1], records[end - 1][1])
+            for i in range(start, end):
+                at, panel = records[i][1], records[i][2:8]
+                # Latest earlier panel, from the store or from this batch.
+                k = bisect_left(timeline, (at,))
+                delta = 0
+                if k:
+                    prior_at, prior = timeline[k - 1]
+                    delta = self.deltas.evaluate(
+                        dict(zip(INPUT_FIELDS, panel)), dict(zip(INPUT_FIELDS, prior)),
+                        hours_between(prior_at, at))
+                rows.append((*records[i], codes[i], masks[i], delta))
+                if k < len(timeline) and timeline[k][0] == at:
+                    timeline[k] = (at, panel)
+                else:
+                    timeline.insert(k, (at, panel))
+            start = end
+
+        with self.db:
+            return self.db.executemany(self._insert, rows).rowcount
+
+    def _stored_timeline(self, patient_id, first, last):
+        """
+        Stored (collected_at, panel) pairs relevant to a batch spanning
+        [first, last]: those inside it plus the latest one before it, oldest
+        first. One backwards index scan that stops past `first`.
+        """
+        cursor = self.db.execute(
+            f"SELECT collected_at, {', '.join(INPUT_FIELDS)} FROM panels "
+            f"WHERE patient_id = ? AND collected_at <= ? ORDER BY collected_at DESC",
+            (patient_id, last))
+        timeline = []
+        for row in cursor:
+            timeline.append((row[0], tuple(row[1:])))
+            if row[0] < first:
+                break
+        cursor.close()
+        timeline.reverse()
+        return timeline
@@ -0,0 +1,421 @@
+"""
+Constant-memory bulk interpretation of CSV/TSV lab exports.
+
+The pipeline is a chain of generators over raw blocks of lines:
+
+    read_blocks -> process_block (parse, interpret, render) -> output
+
+process_block is self-contained so blocks can be farmed out to a process
+pool (see cbc_expert.parallel). Each block carries the byte offset just past
+its last row, which is a safe point to resume from after an interruption.
+Rows are split on physical lines, so quoted fields containing newlines are
+not supported.
+"""
+
+import csv
+import io
+import json
+import math
+import os
+import sys
+import time
+from functools import lru_cache, partial
+
+from .engine import INPUT_FIELDS, decode_patterns, decode_workup
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+# Accepted header names per input, compared case-insensitively.
+COLUMN_ALIASES = {
+    "hgb":            ("hgb", "hb", "haemoglobin", "hemoglobin"),
+    "mcv":            ("mcv",),
+    "wbc":            ("wbc",),
+    "neutrophil_pct": ("neutrophil_pct", "neutrophils", "neut_pct", "neutrophil%", "neut%"),
+    "platelets":      ("platelets", "plt"),
+    "sex":            ("sex", "gender"),
+}
+
+# Optional inputs selecting a reference-range profile (cbc_expert.ranges);
+# used when the export has them.
+OPTIONAL_COLUMN_ALIASES = {
+    "age": ("age", "age_years"),
+    "lab": ("lab", "lab_id", "site"),
+}
+
+SEX_CODES = {"f": "Female", "female": "Female", "m": "Male", "male": "Male"}
+
+
+# ──────────────────────────────────────────────
+# READING
+# ──────────────────────────────────────────────
+
+def sniff_delimiter(path):
+    return "\t" if str(path).lower().endswith((".tsv", ".tab")) else ","
+
+
+def read_header(path, delimiter=None):
+    with open(path, "rb") as f:
+        return parse_header(f.readline(), delimiter or sniff_delimiter(path))
+
+
+def parse_header(header_line, delimiter):
+    return next(csv.reader([header_line.decode("utf-8-sig")], delimiter=delimiter))
+
+
+class UndecodedRow(list):
+    """A record from a line that was not valid UTF-8, decoded with U+FFFD; parse_rows() marks it invalid."""
+
+
+def parse_lines(lines, delimiter):
+    try:
+        return list(csv.reader([line.decode("utf-8") for line in lines], delimiter=delimiter))
+    except UnicodeDecodeError:
+        pass
+    # One bad byte must not abort the run: decode with replacement characters
+    # and tag the records built from the undecodable lines.
+    texts, bad = [], set()
+    for i, line in enumerate(lines):
+        try:
+            texts.append(line.decode("utf-8"))
+        except UnicodeDecodeError:
+            texts.append(line.decode("utf-8", "replace"))
+            bad.add(i)
+    rows, consumed = [], 0
+    reader = csv.reader(texts, delimiter=delimiter)
+    for row in reader:
+        if not bad.isdisjoint(range(consumed, reader.line_num)):
+            row = UndecodedRow(row)
+        consumed = reader.line_num
+        rows.append(row)
+    return rows
+
+
+def read_blocks(path, chunk_rows=DEFAULT_CHUNK_ROWS, start_offset=None):
+    """
+    Yields (header_line, lines, end_offset): undecoded data lines, at most
+    chunk_rows per block. When start_offset is given the header is still read
+    from the top of the file and data rows resume at that byte offset.
+    """
+    with open(path, "rb") as f:
+        header_line = f.readline()
+        offset = f.tell()
+        if start_offset and start_offset > offset:
+            f.seek(start_offset)
+            offset = start_offset
+
+        lines = []
+        for line in f:
+            offset += len(line)
+            if line.strip():
+                lines.append(line)
+            if len(lines) >= chunk_rows:
+                yield header_line, lines, offset
+                lines = []
+        if lines:
+            yield header_line, lines, offset
+
+
+def read_chunks(path, chunk_rows=DEFAULT_CHUNK_ROWS, delimiter=None, start_offset=None):
+    """Like read_blocks(), but yields (header, rows, end_offset) with parsed records."""
+    delimiter = delimiter or sniff_delimiter(path)
+    for header_line, lines, end_offset in read_blocks(path, chunk_rows, start_offset):
+        yield parse_header(header_line, delimiter), parse_lines(lines, delimiter), end_offset
+
+
+def resolve_columns(header, mapping=None):
+    """
+    Map each input field (plus age and lab, when present) to a column
+    index. `mapping` overrides the aliases with explicit {field: column name}
+    entries.
+    """
+    index = {name.strip().lower(): i for i, name in enumerate(header)}
+    resolved = {}
+    for field in INPUT_FIELDS:
+        if mapping and field in mapping:
+            candidates = (mapping[field],)
+        else:
+            candidates = COLUMN_ALIASES[field]
+        for name in candidates:
+            if name.strip().lower() in index:
+                resolved[field] = index[name.strip().lower()]
+                break
+        else:
+            raise ValueError(f"no column for {field!r} (tried {', '.join(candidates)})")
+    for field, aliases in OPTIONAL_COLUMN_ALIASES.items():
+        if mapping and field in mapping:
+            name = mapping[field].strip().lower()
+            if name not in index:
+                raise ValueError(f"no column {mapping[field]!r} for {field!r}")
+            resolved[field] = index[name]
+            continue
+        for name in aliases:
+            if name in index:
+                resolved[field] = index[name]
+                break
+    return resolved
+
+
+def _to_float(text):
+    """A finite float, else NaN ("inf" and "nan" parse but are not values)."""
+    try:
+        value = float(text)
+    except (TypeError, ValueError):
+        return math.nan
+    return value if math.isfinite(value) else math.nan
+
+
+def parse_rows(rows, columns):
+    """
+    Split parsed records into input columns.
+
+    Returns:
+        values : dict of field -> list (floats, NaN where unparseable or
+                 not finite; sex normalised), plus "age" (floats) and "lab" (str or None) when
+                 those columns were resolved
+        valid  : list of bools, False where any input is missing or invalid,
+                 or the line was not valid UTF-8
+    """
+    undecoded = [i for i, row in enumerate(rows) if type(row) is UndecodedRow]
+    width = max(columns.values()) + 1
+    if any(len(row) < width for row in rows):
+        rows = [row + [""] * (width - len(row)) for row in rows]
+
+    values = {}
+    for field in INPUT_FIELDS[:-1]:
+        i = columns[field]
+        texts = [row[i] for row in rows]
+        try:
+            column = [float(t) for t in texts]
+            # One C-level pass; only a column holding inf or NaN takes the slow path.
+            if not math.isfinite(sum(column)):
+                raise ValueError
+        except ValueError:
+            column = [_to_float(t) for t in texts]
+        values[field] = column
+    i = columns["sex"]
+    values["sex"] = [SEX_CODES.get(row[i].strip().lower()) for row in rows]
+    if "age" in columns:
+        i = columns["age"]
+        values["age"] = [_to_float(row[i]) for row in rows]
+    if "lab" in columns:
+        i = columns["lab"]
+        values["lab"] = [row[i].strip() or None for row in rows]
+
+    valid = [
+        h == h and m == m and w == w and n == n and p == p and s is not None
+        for h, m, w, n, p, s in zip(*(values[f] for f in INPUT_FIELDS))
+    ]
+    for i in undecoded:
+        valid[i] = False
+    return values, valid
+
+
+# ──────────────────────────────────────────────
+# INTERPRETING
+# ──────────────────────────────────────────────
+
+def interpret_rows(header, rows, columns):
+    """
+    Returns a chunk dict:
+        header, rows : as read
+        columns      : field -> column index
+        values       : field -> parsed list (see parse_rows)
+        valid        : list of bools
+        codes        : pattern codes (ints)
+        masks        : workup masks (ints)
+    """
+    from .batch import interpret_cbc_batch
+
+    values, valid = parse_rows(rows, columns)
+    codes, masks = interpret_cbc_batch(*(values[f] for f in INPUT_FIELDS),
+                                       age=values.get("age"), lab=values.get("lab"))
+    return {"header": header, "rows": rows, "columns": columns, "values": values,
+            "valid": valid, "codes": codes.tolist(), "masks": masks.tolist()}
+
+
+def interpret_chunks(chunks, mapping=None):
+    """Yields (chunk dict, end_offset) for each (header, rows, end_offset) chunk."""
+    columns = None
+    for header, rows, end_offset in chunks:
+        if columns is None:
+            columns = resolve_columns(header, mapping)
+        yield interpret_rows(header, rows, columns), end_offset
+
+
+@lru_cache(maxsize=None)
+def pattern_labels(code):
+    return tuple(label for label, _ in decode_patterns(code))
+
+
+@lru_cache(maxsize=None)
+def workup_labels(mask):
+    return tuple(item["label"] for item in decode_workup(mask))
+
+
+@lru_cache(maxsize=None)
+def _joined(labels):
+    return "; ".join(labels)
+
+
+# ──────────────────────────────────────────────
+# RENDERING
+# ──────────────────────────────────────────────
+
+def csv_header(keep=()):
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerow(
+        [*keep, *INPUT_FIELDS, "status", "patterns", "workup"])
+    return buf.getvalue()
+
+
+def render_csv(chunk, keep=()):
+    """CSV text for a chunk; numeric inputs are echoed as they appear in the source."""
+    header = chunk["header"]
+    take = [header.index(name) for name in keep] + [chunk["columns"][f] for f in INPUT_FIELDS[:-1]]
+    out_rows = []
+    for row, sex, ok, code, mask in zip(chunk["rows"], chunk["values"]["sex"],
+                                        chunk["valid"], chunk["codes"], chunk["masks"]):
+        line = [row[i] if i < len(row) else "" for i in take]
+        line.append(sex or "")
+        if ok:
+            line += ("ok", _joined(pattern_labels(code)), _joined(workup_labels(mask)))
+        else:
+            line += ("invalid", "", "")
+        out_rows.append(line)
+    buf = io.StringIO()
+    csv.writer(buf, lineterminator="\n").writerows(out_rows)
+    return buf.getvalue()
+
+
+def render_jsonl(chunk, keep=()):
+    """JSON Lines text for a chunk."""
+    keep_index = [chunk["header"].index(name) for name in keep]
+    values = chunk["values"]
+    lines = []
+    for i, row in enumerate(chunk["rows"]):
+        doc = {name: row[j] if j < len(row) else None for name, j in zip(keep, keep_index)}
+        for field in INPUT_FIELDS:
+            v = values[field][i]
+            doc[field] = None if v != v else v
+        if chunk["valid"][i]:
+            doc["status"] = "ok"
+            doc["patterns"] = pattern_labels(chunk["codes"][i])
+            doc["workup"] = workup_labels(chunk["masks"][i])
+        else:
+            doc["status"] = "invalid"
+        lines.append(json.dumps(doc, ensure_ascii=False))
+    return "\n".join(lines) + "\n"
+
+
+def process_block(block, fmt="csv", delimiter=",", mapping=None, keep=()):
+    """
+    Parse, interpret and render one block from read_blocks(). This is the
+    unit of work handed to pool workers, so it only takes picklable arguments.
+
+    Returns (text, rows, end_offset).
+    """
+    header_line, lines, end_offset = block
+    header = parse_header(header_line, delimiter)
+    rows = parse_lines(lines, delimiter)
+    chunk = interpret_rows(header, rows, resolve_columns(header, mapping))
+    if fmt == "jsonl":
+        text = render_jsonl(chunk, keep)
+    else:
+        text = render_csv(chunk, keep)
+    return text, len(rows), end_offset
+
+
+# ──────────────────────────────────────────────
+# DRIVER
+# ──────────────────────────────────────────────
+
+def read_checkpoint(path):
+    """
+    (input offset, output size) from a checkpoint file, or None when there
+    is none. The output size is None for checkpoints that did not record it.
+    """
+    try:
+        with open(path) as f:
+            fields = f.read().split()
+    except FileNotFoundError:
+        return None
+    offset = int(fields[0]) if fields else 0
+    return offset, int(fields[1]) if len(fields) > 1 else None
+
+
+def write_checkpoint(path, offset, output_size=None):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        f.write(str(offset) if output_size is None else f"{offset} {output_size}")
+    os.replace(tmp, path)
+
+
+def run_stream(input_path, output_path="-", fmt=None, delimiter=None, mapping=None,
+               keep=(), chunk_rows=DEFAULT_CHUNK_ROWS, start_offset=None,
+               checkpoint=None, workers=1, progress=sys.stderr):
+    """
+    Interpret input_path block by block and stream results to output_path
+    ("-" for stdout). With workers > 1 blocks are processed on a process pool
+    and written back in input order. With a checkpoint file the last
+    completed input offset, and the output file's size at that point, are
+    recorded after every block and picked up again on the next run; output
+    written after the last checkpoint (a block cut short by a crash) is
+    truncated away first, so no row appears twice. Writing to stdout, or
+    resuming from a bare start_offset, cannot undo that tail: output there
+    is at-least-once.
+
+    Returns a dict of run statistics.
+    """
+    output_size = None
+    if start_offset is None and checkpoint:
+        start_offset, output_size = read_checkpoint(checkpoint) or (None, None)
+    fmt = fmt or ("jsonl" if str(output_path).endswith((".jsonl", ".ndjson")) else "csv")
+    delimiter = delimiter or sniff_delimiter(input_path)
+    resuming = bool(start_offset)
+
+    # Fail on a bad mapping or passthrough column before any output is written.
+    header = read_header(input_path, delimiter)
+    resolve_columns(header, mapping)
+    missing = [name for name in keep if name not in header]
+    if missing:
+        raise ValueError(f"no column {missing[0]!r} to keep")
+
+    work = partial(process_block, fmt=fmt, delimiter=delimiter, mapping=mapping, keep=keep)
+    blocks = read_blocks(input_path, chunk_rows, start_offset)
+    if workers > 1:
+        from .parallel import imap_ordered
+        results = imap_ordered(work, blocks, workers)
+    else:
+        results = map(work, blocks)
+
+    if output_path == "-":
+        out = sys.stdout
+    else:
+        if resuming and output_size is not None and os.path.exists(output_path) \
+                and os.path.getsize(output_path) > output_size:
+            os.truncate(output_path, output_size)
+        out = open(output_path, "a" if resuming else "w", newline="", encoding="utf-8")
+
+    rows = 0
+    offset = start_offset or 0
+    started = time.perf_counter()
+    try:
+        if fmt == "csv" and not resuming:
+            out.write(csv_header(keep))
+        for text, n, offset in results:
+            out.write(text)
+            out.flush()
+            rows += n
+            if checkpoint:
+                write_checkpoint(checkpoint, offset,
+                                 None if out is sys.stdout else os.fstat(out.fileno()).st_size)
+            if progress:
+                rate = rows / max(time.perf_counter() - started, 1e-9)
+                print(f"{rows:,} rows  {rate:,.0f} rows/s  offset {offset}", file=progress)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = time.perf_counter() - started
+    return {"rows": rows, "seconds": elapsed, "rows_per_sec": rows / max(elapsed, 1e-9),
+            "end_offset": offset}
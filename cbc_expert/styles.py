@@ -0,0 +1,140 @@
+"""Dashboard stylesheet, shared by the Streamlit app and rendered reports."""
+
+CSS = """
+<style>
+@import url('https://fonts.googleapis.com/css2?family=DM+Serif+Display&family=DM+Mono:wght@400;500&family=DM+Sans:wght@300;400;500;600&display=swap');
+
+html, body, [class*="css"] { font-family: 'DM Sans', sans-serif; }
+
+.stApp {
+    background: #0d1117;
+    color: #e6edf3;
+}
+
+#MainMenu, footer, header { visibility: hidden; }
+.block-container { padding: 2rem 3rem 4rem; max-width: 1200px; }
+
+/* ── Dashboard header ── */
+.dash-header {
+    display: flex; align-items: center; gap: 1rem;
+    border-bottom: 1px solid #21262d;
+    padding-bottom: 1.2rem; margin-bottom: 2rem;
+}
+.dash-header .logo {
+    font-family: 'DM Serif Display', serif;
+    font-size: 1.9rem; color: #58a6ff; letter-spacing: -0.5px;
+}
+.dash-header .subtitle {
+    font-size: 0.78rem; color: #8b949e; letter-spacing: 0.08em;
+    text-transform: uppercase; font-weight: 500;
+}
+.dash-tag {
+    margin-left: auto;
+    background: #1c2f45; color: #58a6ff;
+    font-size: 0.7rem; font-family: 'DM Mono', monospace;
+    padding: 0.25rem 0.7rem; border-radius: 999px;
+    border: 1px solid #1f4068;
+}
+
+/* ── Cards ── */
+.card {
+    background: #161b22;
+    border: 1px solid #21262d;
+    border-radius: 12px;
+    padding: 1.4rem 1.6rem;
+    margin-bottom: 1rem;
+}
+.card-title {
+    font-size: 0.7rem; font-weight: 600; letter-spacing: 0.1em;
+    text-transform: uppercase; color: #8b949e;
+    margin-bottom: 1rem; display: flex; align-items: center; gap: 0.5rem;
+}
+.card-title::before {
+    content: ''; display: inline-block;
+    width: 8px; height: 8px; border-radius: 50%;
+    background: #58a6ff;
+}
+
+/* ── Pattern badges ── */
+.pattern-row { display: flex; flex-wrap: wrap; gap: 0.5rem; margin-bottom: 0.8rem; }
+.badge {
+    display: inline-block; font-size: 0.72rem; font-weight: 500;
+    padding: 0.3rem 0.8rem; border-radius: 999px;
+    font-family: 'DM Mono', monospace;
+}
+.badge-red    { background: #2d1a1a; color: #f85149; border: 1px solid #4d1f1f; }
+.badge-orange { background: #2d1f0d; color: #e3b341; border: 1px solid #4d3211; }
+.badge-blue   { background: #0d2040; color: #58a6ff; border: 1px solid #1f4068; }
+.badge-green  { background: #0d2a17; color: #3fb950; border: 1px solid #1a4a28; }
+.badge-gray   { background: #1c2128; color: #8b949e; border: 1px solid #2d333b; }
+
+/* ── Clinical Summary text ── */
+.summary-text {
+    font-size: 0.95rem; line-height: 1.7; color: #c9d1d9;
+    margin-bottom: 0.6rem;
+}
+.summary-normal  { color: #3fb950; font-weight: 600; }
+.summary-abnormal{ color: #f85149; font-weight: 600; }
+
+/* ── Workup checklist ── */
+.workup-item {
+    display: flex;
+    align-items: flex-start;
+    gap: 0.8rem;
+    padding: 0.65rem 0;
+    border-bottom: 1px solid #21262d;
+    font-size: 0.875rem;
+    color: #c9d1d9;
+}
+.workup-item:last-child {
+    border-bottom: none;
+}
+.workup-icon {
+    width: 22px; height: 22px; border-radius: 50%;
+    display: flex; align-items: center; justify-content: center;
+    font-size: 0.7rem; flex-shrink: 0; margin-top: 1px;
+    font-weight: 700;
+}
+.icon-red    { background: #2d1a1a; color: #f85149; }
+.icon-orange { background: #2d1f0d; color: #e3b341; }
+.icon-blue   { background: #0d2040; color: #58a6ff; }
+.icon-green  { background: #0d2a17; color: #3fb950; }
+
+.workup-content { display: flex; flex-direction: column; gap: 0.15rem; }
+.workup-label  { font-weight: 600; color: #e6edf3; font-size: 0.875rem; }
+.workup-reason { font-size: 0.76rem; color: #8b949e; }
+
+/* ── Parameter value grid ── */
+.param-grid {
+    display: grid;
+    grid-template-columns: repeat(4, 1fr);
+    gap: 0.8rem;
+    margin-bottom: 1rem;
+}
+.param-box {
+    background: #0d1117;
+    border: 1px solid #21262d;
+    border-radius: 8px;
+    padding: 0.75rem 1rem;
+    text-align: center;
+}
+.param-name  { font-size: 0.65rem; letter-spacing: 0.1em; text-transform: uppercase; color: #8b949e; }
+.param-value { font-family: 'DM Mono', monospace; font-size: 1.3rem; font-weight: 500; margin-top: 0.2rem; }
+.param-unit  { font-size: 0.65rem; color: #8b949e; }
+.val-normal  { color: #3fb950; }
+.val-abnormal{ color: #f85149; }
+.val-warn    { color: #e3b341; }
+
+/* ── Disclaimer ── */
+.disclaimer {
+    margin-top: 2rem;
+    padding: 0.8rem 1.2rem;
+    background: #161b22;
+    border: 1px solid #21262d;
+    border-radius: 8px;
+    font-size: 0.72rem;
+    color: #8b949e;
+    line-height: 1.6;
+}
+</style>
+"""
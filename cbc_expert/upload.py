@@ -0,0 +1,133 @@
+"""
+Bulk interpretation of an uploaded CSV/TSV for the dashboard's upload page.
+
+The whole file is interpreted in one batched pass into a DataFrame; the page
+then filters, sorts and slices that frame per rerun and renders cards only
+for the selected row. pandas is imported lazily, like NumPy elsewhere.
+"""
+
+from .engine import CBC_RULES, INPUT_FIELDS
+from .stream import (
+    _joined,
+    interpret_rows,
+    parse_header,
+    parse_lines,
+    pattern_labels,
+    resolve_columns,
+    sniff_delimiter,
+    workup_labels,
+)
+
+PAGE_SIZES = (50, 100, 250, 500, 1000)
+
+RESULT_COLUMNS = ("status", "patterns", "workup_items", "workup")
+
+
+def interpret_upload(data, name="upload.csv", mapping=None):
+    """
+    data is the raw file content (bytes). Input columns are matched as in the
+    bulk CLI; other source columns (patient IDs, dates) are carried through
+    as text, renamed "<name> (source)" where they would clash with a
+    result column. Raises ValueError for an empty or unreadable file.
+
+    Returns:
+        DataFrame with the source columns, the parsed INPUT_FIELDS (and age
+        and lab, when the file has them), status,
+        patterns, workup_items (count), workup, and the integer pattern
+        `code` and workup `mask` for filtering and card rendering
+    """
+    import pandas as pd
+
+    delimiter = sniff_delimiter(name)
+    lines = [line for line in data.splitlines(keepends=True) if line.strip()]
+    if not lines:
+        raise ValueError("the file is empty")
+    header_line, *lines = lines
+    header = parse_header(header_line, delimiter)
+    columns = resolve_columns(header, mapping)
+    chunk = interpret_rows(header, parse_lines(lines, delimiter), columns)
+
+    frame = {}
+    input_columns = set(columns.values())
+    reserved = {*INPUT_FIELDS, "age", "lab", *RESULT_COLUMNS, "code", "mask"}
+    for i, column in enumerate(header):
+        if i not in input_columns:
+            # A source column named like an input or result column (or
+            # repeated) is kept as "<name> (source)" rather than overwritten.
+            while column in reserved or column in frame:
+                column = f"{column} (source)"
+            frame[column] = [row[i] if i < len(row) else "" for row in chunk["rows"]]
+    for field in (*INPUT_FIELDS, "age", "lab"):
+        if field in chunk["values"]:
+            frame[field] = chunk["values"][field]
+
+    valid, codes, masks = chunk["valid"], chunk["codes"], chunk["masks"]
+    frame["status"] = ["ok" if ok else "invalid" for ok in valid]
+    frame["patterns"] = [_joined(pattern_labels(c)) if ok else "" for c, ok in zip(codes, valid)]
+    frame["workup_items"] = [len(workup_labels(m)) if ok else 0 for m, ok in zip(masks, valid)]
+    frame["workup"] = [_joined(workup_labels(m)) if ok else "" for m, ok in zip(masks, valid)]
+    frame["code"] = [c if ok else 0 for c, ok in zip(codes, valid)]
+    frame["mask"] = [m if ok else 0 for m, ok in zip(masks, valid)]
+    return pd.DataFrame(frame)
+
+
+def filter_results(frame, patterns=(), sex=None, status=None, search=None):
+    """
+    Rows with any of the given pattern labels (all rows when none), the given
+    sex and status, and `search` contained in any carried-through source
+    column. Pattern filtering is a bitmask test on the `code` column.
+    """
+    keep = None
+
+    def both(a, b):
+        return b if a is None else a & b
+
+    if patterns:
+        bits = 0
+        for label in patterns:
+            bits |= 1 << CBC_RULES.pattern_ids[label]
+        keep = both(keep, (frame["code"].to_numpy() & bits) != 0)
+    if sex:
+        keep = both(keep, (frame["sex"] == sex).to_numpy())
+    if status:
+        keep = both(keep, (frame["status"] == status).to_numpy())
+    if search:
+        text_columns = [c for c in frame.columns
+                        if c not in INPUT_FIELDS and c not in RESULT_COLUMNS
+                        and c not in ("code", "mask")]
+        hit = None
+        for column in text_columns:
+            match = frame[column].astype(str).str.contains(search, case=False, regex=False)
+            hit = match.to_numpy() if hit is None else hit | match.to_numpy()
+        if hit is not None:
+            keep = both(keep, hit)
+    return frame if keep is None else frame[keep]
+
+
+def page_of(frame, page, size):
+    """Rows of 1-based page `page`, plus the page count."""
+    pages = max(1, -(-len(frame) // size))
+    page = min(max(page, 1), pages)
+    return frame.iloc[(page - 1) * size:page * size], pages
+
+
+# Fields the dashboard widgets take as integers; shown without a trailing ".0".
+INTEGER_FIELDS = ("mcv", "neutrophil_pct", "platelets")
+
+
+def row_panel(row):
+    """
+    A result row -> (panel, pattern code, workup mask) for CardRenderer. The
+    panel is an INPUT_FIELDS tuple, followed by age and lab when the upload
+    has either column.
+    """
+    values = []
+    for field in INPUT_FIELDS[:-1]:
+        v = float(row[field])
+        values.append(int(v) if field in INTEGER_FIELDS and v.is_integer() else v)
+    panel = (*values, row["sex"])
+    if "age" in row.index or "lab" in row.index:
+        age, lab = row.get("age"), row.get("lab")
+        panel += (None if age is None or age != age else float(age),
+                  lab if isinstance(lab, str) and lab else None)
+    return panel, int(row["code"]), int(row["mask"])
@@ -0,0 +1,158 @@
+import hashlib
+import io
+
+import streamlit as st
+
+from cbc_expert import CSS, DISCLAIMER_HTML, INPUT_FIELDS, PATTERNS, card_renderer
+from cbc_expert.export import frame_sections, write_zip
+from cbc_expert.upload import PAGE_SIZES, filter_results, interpret_upload, page_of, row_panel
+
+# ──────────────────────────────────────────────
+# PAGE CONFIG
+# ──────────────────────────────────────────────
+st.set_page_config(
+    page_title="CBC Interpreter · Bulk Upload",
+    page_icon="🔬",
+    layout="wide",
+    initial_sidebar_state="collapsed",
+)
+st.markdown(CSS, unsafe_allow_html=True)
+
+
+# ──────────────────────────────────────────────
+# RUN LOGIC
+# ──────────────────────────────────────────────
+# One batched pass per distinct file; reruns (filters, paging, row
+# selection) reuse the interpreted frame.
+@st.cache_data(show_spinner="Interpreting panels…", max_entries=8)
+def interpreted(digest, name, _data):
+    return interpret_upload(_data, name)
+
+
+# ──────────────────────────────────────────────
+# RENDER: UPLOAD
+# ──────────────────────────────────────────────
+st.markdown('<div class="card"><div class="card-title">Bulk Upload</div>', unsafe_allow_html=True)
+upload = st.file_uploader(
+    "CBC panels (CSV or TSV)", type=["csv", "tsv", "tab", "txt"],
+    help="One panel per row with hgb, mcv, wbc, neutrophil_pct, platelets and sex columns "
+         "(common aliases such as hb, plt and gender are recognised)")
+st.markdown('</div>', unsafe_allow_html=True)
+
+if upload is None:
+    st.markdown(DISCLAIMER_HTML, unsafe_allow_html=True)
+    st.stop()
+
+data = upload.getvalue()
+digest = hashlib.sha1(data).hexdigest()
+try:
+    results = interpreted(digest, upload.name, data)
+except ValueError as exc:
+    st.error(f"Could not read {upload.name}: {exc}")
+    st.stop()
+
+
+# ──────────────────────────────────────────────
+# RENDER: FILTERS
+# ──────────────────────────────────────────────
+col_pat, col_sex, col_status, col_search = st.columns([3, 1, 1, 2])
+with col_pat:
+    patterns = st.multiselect("Patterns", [label for label, _ in PATTERNS],
+                              help="Rows with any of the selected patterns")
+with col_sex:
+    sex = st.selectbox("Sex", ["All", "Female", "Male"])
+with col_status:
+    status = st.selectbox("Status", ["All", "ok", "invalid"])
+with col_search:
+    search = st.text_input("Search", placeholder="patient ID or other source column")
+
+col_sort, col_order, col_size, col_page = st.columns([2, 1, 1, 1])
+sortable = [c for c in results.columns if c not in ("code", "mask")]
+with col_sort:
+    sort_by = st.selectbox("Sort by", ["(file order)"] + sortable)
+with col_order:
+    descending = st.toggle("Descending")
+with col_size:
+    page_size = st.selectbox("Rows per page", PAGE_SIZES, index=1)
+
+view = filter_results(results, patterns, None if sex == "All" else sex,
+                      None if status == "All" else status, search.strip())
+if sort_by != "(file order)":
+    view = view.sort_values(sort_by, ascending=not descending, kind="stable")
+
+pages = max(1, -(-len(view) // page_size))
+with col_page:
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, step=1)
+rows, _ = page_of(view, page, page_size)
+
+
+# ──────────────────────────────────────────────
+# RENDER: RESULTS TABLE
+# ──────────────────────────────────────────────
+invalid = int((results["status"] == "invalid").sum())
+col_count, col_export = st.columns([4, 1])
+with col_count:
+    st.caption(f"{len(results):,} panels · {invalid:,} invalid · {len(view):,} shown after filters")
+
+
+def reports_zip(frame=view):
+    buffer = io.BytesIO()
+    write_zip(frame_sections(frame), buffer)
+    return buffer.getvalue()
+
+
+with col_export:
+    # Rendered only when clicked: one printable report per valid row shown.
+    st.download_button("Reports (ZIP)", reports_zip,
+                       file_name=f"{upload.name.rsplit('.', 1)[0]}_reports.zip",
+                       mime="application/zip", on_click="ignore",
+                       disabled=not (view["status"] == "ok").any())
+
+event = st.dataframe(
+    rows,
+    column_order=[c for c in rows.columns if c not in ("code", "mask")],
+    column_config={
+        "hgb": st.column_config.NumberColumn("Hgb", format="%.1f"),
+        "mcv": st.column_config.NumberColumn("MCV", format="%d"),
+        "wbc": st.column_config.NumberColumn("WBC", format="%.1f"),
+        "neutrophil_pct": st.column_config.NumberColumn("Neut %", format="%d"),
+        "platelets": st.column_config.NumberColumn("PLT", format="%d"),
+        "workup_items": st.column_config.NumberColumn("Workup items"),
+    },
+    hide_index=True,
+    on_select="rerun",
+    selection_mode="single-row",
+    # A selection is a position in `rows`; a new key whenever the rows
+    # shown can change drops it instead of pointing at another patient.
+    key="results-" + hashlib.sha1(repr((
+        digest, patterns, sex, status, search.strip(), sort_by, descending,
+        page, page_size)).encode()).hexdigest(),
+)
+
+
+# ──────────────────────────────────────────────
+# RENDER: SELECTED PATIENT CARDS
+# ──────────────────────────────────────────────
+selected = [i for i in event.selection.rows if 0 <= i < len(rows)]
+if not selected:
+    st.caption("Select a row to show its clinical summary and suggested workup.")
+else:
+    row = rows.iloc[selected[0]]
+    if row["status"] != "ok":
+        st.warning("This row has missing or invalid inputs: " + ", ".join(
+            f for f in INPUT_FIELDS if row[f] is None or row[f] != row[f]))
+    else:
+        panel, code, mask = row_panel(row)
+        param_grid_html, summary_card_html, workup_card_html = card_renderer.cards(panel, code, mask)
+        st.markdown(param_grid_html, unsafe_allow_html=True)
+        left, right = st.columns([1, 1], gap="medium")
+        with left:
+            st.markdown(summary_card_html, unsafe_allow_html=True)
+        with right:
+            st.markdown(workup_card_html, unsafe_allow_html=True)
+
+
+# ──────────────────────────────────────────────
+# RENDER: DISCLAIMER
+# ──────────────────────────────────────────────
+st.markdown(DISCLAIMER_HTML, unsafe_allow_html=True)
@@ -0,0 +1,113 @@
+import time
+
+import streamlit as st
+
+from cbc_expert import CSS, DISCLAIMER_HTML, PATTERNS
+from cbc_expert.ranges import DEFAULT_LAB, reference_index
+from cbc_expert.sensitivity import (
+    AXES,
+    DEFAULT_FIXED,
+    DEFAULT_RESOLUTION,
+    SENSITIVITY_MAPS,
+    legend_html,
+    sensitivity_map,
+)
+
+CUSTOM = "Custom axes"
+
+# ──────────────────────────────────────────────
+# PAGE CONFIG
+# ──────────────────────────────────────────────
+st.set_page_config(
+    page_title="CBC Interpreter · Sensitivity Map",
+    page_icon="🔬",
+    layout="wide",
+    initial_sidebar_state="collapsed",
+)
+st.markdown(CSS, unsafe_allow_html=True)
+
+
+# ──────────────────────────────────────────────
+# RENDER: MAP SETTINGS
+# ──────────────────────────────────────────────
+st.markdown('<div class="card"><div class="card-title">Sensitivity Map</div>', unsafe_allow_html=True)
+
+col_map, col_sex, col_age, col_res = st.columns([3, 1, 1, 1])
+with col_map:
+    preset = st.selectbox("Map", [*SENSITIVITY_MAPS, CUSTOM])
+with col_sex:
+    sex = st.selectbox("Biological Sex", ["Female", "Male"])
+with col_age:
+    age = st.number_input("Age (years)", min_value=0.0, max_value=120.0, value=None,
+                          step=1.0, format="%.1f", placeholder="Adult")
+with col_res:
+    resolution = st.select_slider("Resolution", [250, 500, 1000, 1500, 2000],
+                                  value=DEFAULT_RESOLUTION,
+                                  help="Grid points per axis; 1000 is a million panels")
+
+labs = reference_index().labs
+lab = None
+if len(labs) > 1:
+    lab = st.selectbox("Lab", labs, index=labs.index(DEFAULT_LAB))
+
+fields = list(AXES)
+if preset == CUSTOM:
+    col_x, col_y, col_pat = st.columns([1, 1, 4])
+    with col_x:
+        x = st.selectbox("X axis", fields, format_func=lambda f: AXES[f][0], index=1)
+    with col_y:
+        y = st.selectbox("Y axis", [f for f in fields if f != x], format_func=lambda f: AXES[f][0])
+    with col_pat:
+        patterns = st.multiselect("Patterns", [label for label, _ in PATTERNS],
+                                  default=[label for label, _ in PATTERNS
+                                           if label != "CBC Within Normal Limits"])
+else:
+    spec = SENSITIVITY_MAPS[preset]
+    x, y, patterns = spec["x"], spec["y"], list(spec["patterns"])
+
+col_xr, col_yr = st.columns(2)
+with col_xr:
+    x_range = st.slider(f"{AXES[x][0]} range", *AXES[x][1:], value=AXES[x][1:], key=f"x-{x}")
+with col_yr:
+    y_range = st.slider(f"{AXES[y][0]} range", *AXES[y][1:], value=AXES[y][1:], key=f"y-{y}")
+
+held = [f for f in fields if f not in (x, y)]
+fixed = {}
+for column, field in zip(st.columns(len(held)), held):
+    with column:
+        fixed[field] = st.number_input(f"{AXES[field][0]} (held)", value=float(DEFAULT_FIXED[field]),
+                                       key=f"fixed-{field}")
+
+st.markdown('</div>', unsafe_allow_html=True)
+
+if x_range[0] >= x_range[1] or y_range[0] >= y_range[1]:
+    st.warning("Each axis range needs a lower and a higher bound.")
+    st.stop()
+
+
+# ──────────────────────────────────────────────
+# RUN LOGIC
+# ──────────────────────────────────────────────
+started = time.perf_counter()
+grid = sensitivity_map(x, y, sex, fixed, x_range, y_range, resolution, age, lab)
+index, legend = grid.categories(patterns)
+image = grid.image(index, legend)
+elapsed = time.perf_counter() - started
+
+
+# ──────────────────────────────────────────────
+# RENDER: HEATMAP
+# ──────────────────────────────────────────────
+st.markdown(legend_html(legend), unsafe_allow_html=True)
+st.image(image, caption=(f"x: {AXES[x][0]} {x_range[0]:g} → {x_range[1]:g} · "
+                         f"y: {AXES[y][0]} {y_range[0]:g} (bottom) → {y_range[1]:g} (top) · "
+                         "dark lines mark the reference limits"))
+limits = ", ".join(f"{name} {value:g}" for _, name, value in grid.thresholds())
+st.caption(f"{grid.codes.size:,} panels evaluated and drawn in {elapsed * 1000:,.0f} ms"
+           + (f" · limits: {limits}" if limits else ""))
+
+
+# ──────────────────────────────────────────────
+# RENDER: DISCLAIMER
+# ──────────────────────────────────────────────
+st.markdown(DISCLAIMER_HTML, unsafe_allow_html=True)
@@ -0,0 +1,97 @@
+import os
+
+import streamlit as st
+
+from cbc_expert import CSS, DISCLAIMER_HTML
+from cbc_expert.jobs import DEFAULT_DB, JobQueue
+
+REFRESH_SECONDS = 2
+
+# ──────────────────────────────────────────────
+# PAGE CONFIG
+# ──────────────────────────────────────────────
+st.set_page_config(
+    page_title="CBC Interpreter · Jobs",
+    page_icon="🔬",
+    layout="wide",
+    initial_sidebar_state="collapsed",
+)
+st.markdown(CSS, unsafe_allow_html=True)
+
+
+def _duration(seconds):
+    if seconds is None or seconds != seconds:
+        return "–"
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:d}:{minutes:02d}:{seconds:02d}"
+
+
+# ──────────────────────────────────────────────
+# RENDER: HEADER
+# ──────────────────────────────────────────────
+# Jobs are submitted from the command line only: the page runs with the
+# server's file permissions, so it never takes input or output paths.
+st.markdown('<div class="card"><div class="card-title">Bulk Jobs</div>', unsafe_allow_html=True)
+st.caption(f"Queue: {DEFAULT_DB} · submit with `python -m cbc_expert jobs submit FILE -o OUT`; "
+           "jobs run in workers started with `python -m cbc_expert jobs work -j N`")
+st.markdown('</div>', unsafe_allow_html=True)
+
+
+# ──────────────────────────────────────────────
+# RENDER: PROGRESS (refreshes on its own)
+# ──────────────────────────────────────────────
+@st.fragment(run_every=REFRESH_SECONDS)
+def job_table():
+    # Opening the queue creates it; leave that to the first `jobs submit`.
+    if not os.path.exists(DEFAULT_DB):
+        st.caption("No jobs yet.")
+        return
+    with JobQueue() as queue:
+        jobs = queue.status()
+        if not jobs:
+            st.caption("No jobs yet.")
+            return
+
+        col_job, col_cancel, col_retry, _ = st.columns([1, 1, 1, 3])
+        with col_job:
+            job_id = st.selectbox("Job", [j["id"] for j in jobs], label_visibility="collapsed")
+        with col_cancel:
+            if st.button("Cancel"):
+                changed = queue.cancel(job_id)
+                st.toast(f"Job {job_id} cancelled." if changed else f"Job {job_id} is not active.")
+                jobs = queue.status()
+        with col_retry:
+            if st.button("Retry"):
+                changed = queue.retry(job_id)
+                st.toast(f"Job {job_id} requeued." if changed else f"Job {job_id} has not failed.")
+                jobs = queue.status()
+
+    active = [j for j in jobs if j["state"] in ("queued", "running", "assembling")]
+    rate = sum(j["rows_per_sec"] for j in active if j["state"] == "running")
+    st.caption(f"{len(jobs):,} jobs · {len(active):,} active · {rate:,} rows/s across running jobs")
+
+    st.dataframe(
+        [{"job": j["id"], "state": j["state"], "progress": j["pct"] / 100,
+          "rows": j["rows_done"], "est. rows": j["est_rows"], "rows/s": j["rows_per_sec"],
+          "elapsed": _duration(j["elapsed_seconds"]), "ETA": _duration(j["eta_seconds"]),
+          "chunks": " · ".join(f"{n} {state}" for state, n in sorted(j["chunk_states"].items())),
+          "input": j["input"], "output": j["output"], "error": j["error"] or ""}
+         for j in jobs],
+        column_config={
+            "progress": st.column_config.ProgressColumn("Progress", format="percent",
+                                                        min_value=0, max_value=1),
+            "rows": st.column_config.NumberColumn("Rows", format="localized"),
+            "est. rows": st.column_config.NumberColumn("Est. rows", format="localized"),
+            "rows/s": st.column_config.NumberColumn("Rows/s", format="localized"),
+        },
+        hide_index=True,
+    )
+
+job_table()
+
+
+# ──────────────────────────────────────────────
+# RENDER: DISCLAIMER
+# ──────────────────────────────────────────────
+st.markdown(DISCLAIMER_HTML, unsafe_allow_html=True)
@@ -0,0 +1,218 @@
+"""
+Every interpretation path gives the same answer for the same panel.
+
+interpret_cbc is the reference. interpret_cbc_batch, interpret_cbc_cached,
+the streaming CSV path (process_block) and HL7 ingestion must agree with it
+row for row on panels at, just inside and just outside each reference
+limit, for both sexes and, with age-banded profiles loaded, every age band
+and lab. Non-finite values must be interpreted alike by the in-memory paths
+and rejected by the file and message paths.
+"""
+
+import itertools
+import json
+
+import pytest
+
+from cbc_expert import interpret_cbc, interpret_cbc_batch, interpret_cbc_cached, load_profiles
+from cbc_expert.engine import INPUT_FIELDS, decode_patterns, decode_workup
+from cbc_expert.hl7 import IngestStats, interpret_messages, message_spans
+from cbc_expert.stream import process_block
+
+NAN, INF = float("nan"), float("inf")
+
+# Values at, just inside and just outside the adult limits (and the
+# profile limits below).
+HGB = (10.0, 11.9, 12.0, 12.9, 13.0)
+MCV = (79.5, 79.6, 80, 100, 100.5)
+WBC = (3.9, 4.0, 11.0, 11.1)
+NEUTROPHIL_PCT = (70, 71)
+PLATELETS = (149, 150, 450, 451)
+SEXES = ("Female", "Male")
+
+BOUNDARY_PANELS = list(itertools.product(HGB, MCV, WBC, NEUTROPHIL_PCT, PLATELETS, SEXES))
+
+NON_FINITE_PANELS = [
+    tuple(bad if j == i else good for j, good in enumerate((11.0, 90, 8.0, 60, 200)))
+    + (sex,)
+    for i in range(5) for bad in (NAN, INF, -INF) for sex in SEXES
+]
+
+# Paediatric bands for the default lab and an adult-only second lab, with
+# limits moved onto the boundary values above.
+PROFILES = [
+    {"lab": "default", "sex": sex, "age_min": 0, "age_max": 2,
+     "limits": {"hgb_low": 11.9, "mcv_low": 79.6, "mcv_high": 100.5, "wbc_high": 11.1}}
+    for sex in SEXES
+] + [
+    {"lab": "default", "sex": sex, "age_min": 2, "age_max": 12,
+     "limits": {"hgb_low": 12.9, "mcv_low": 79.5, "wbc_low": 3.9, "plt_low": 149}}
+    for sex in SEXES
+] + [
+    {"lab": "north", "sex": sex, "age_min": 18, "age_max": None,
+     "limits": {"hgb_low": 11.9, "mcv_high": 99, "plt_high": 451}}
+    for sex in SEXES
+]
+AGES = (None, 0.0, 1.99, 2.0, 11.99, 12.0, 17.5, 18.0, 40.0)
+LABS = (None, "north", "elsewhere")
+
+
+@pytest.fixture
+def age_profiles(tmp_path):
+    path = tmp_path / "profiles.json"
+    path.write_text(json.dumps(PROFILES))
+    load_profiles(str(path))
+    yield
+    load_profiles()
+
+
+def labels(patterns):
+    return [label for label, _ in patterns]
+
+
+def expected(panels, ages=None, labs=None):
+    ages = ages or [None] * len(panels)
+    labs = labs or [None] * len(panels)
+    return [interpret_cbc(*panel, age, lab) for panel, age, lab in zip(panels, ages, labs)]
+
+
+# ──────────────────────────────────────────────
+# PATH ADAPTERS
+# ──────────────────────────────────────────────
+
+def via_batch(panels, ages=None, labs=None):
+    columns = list(zip(*panels))
+    age = None if ages is None else [NAN if a is None else a for a in ages]
+    codes, masks = interpret_cbc_batch(*columns, age=age, lab=labs)
+    return [(decode_patterns(code), decode_workup(mask)) for code, mask in zip(codes, masks)]
+
+
+def csv_cell(value):
+    return "" if value is None else repr(value) if isinstance(value, float) else str(value)
+
+
+def via_stream(panels, ages=None, labs=None):
+    """process_block() JSON Lines docs, one per panel."""
+    header = list(INPUT_FIELDS)
+    rows = [list(panel) for panel in panels]
+    if ages is not None:
+        header += ["age", "lab"]
+        rows = [row + [age, lab] for row, age, lab in zip(rows, ages, labs)]
+    lines = [(",".join(csv_cell(v) for v in row) + "\n").encode() for row in rows]
+    text, n, _ = process_block(((",".join(header) + "\n").encode(), lines, 0), "jsonl", ",")
+    assert n == len(panels)
+    return [json.loads(line) for line in text.splitlines()]
+
+
+def oru(i, panel):
+    *values, sex = panel
+    segments = [
+        f"MSH|^~\\&|ANALYZER|LAB|LIS|HOSP|20240301080000||ORU^R01|MSG{i:06d}|P|2.5",
+        f"PID|1||MRN{i:06d}^^^HOSP^MR||DOE^JANE||19800101|{sex[0]}",
+    ]
+    for k, (code, unit, value) in enumerate(zip(
+            ("718-7", "787-2", "6690-2", "770-8", "777-3"),
+            ("g/dL", "fL", "10*3/uL", "%", "10*3/uL"), values), 1):
+        segments.append(f"OBX|{k}|NM|{code}^^LN||{csv_cell(value)}|{unit}|||||F")
+    return ("\r".join(segments) + "\r").encode()
+
+
+def via_hl7(panels):
+    """control id -> (patterns, workup) for accepted messages, and the stats."""
+    data = b"".join(oru(i, panel) for i, panel in enumerate(panels))
+    stats = IngestStats()
+    results = {}
+    for batch in interpret_messages(((data, s, e) for s, e in message_spans(data)), stats=stats):
+        for control_id, code, mask in zip(batch["control_ids"], batch["codes"], batch["masks"]):
+            results[control_id] = (decode_patterns(code), decode_workup(mask))
+    return results, stats
+
+
+# ──────────────────────────────────────────────
+# BOUNDARY PANELS
+# ──────────────────────────────────────────────
+
+def test_batch_matches_scalar():
+    for panel, want, (patterns, workup) in zip(
+            BOUNDARY_PANELS, expected(BOUNDARY_PANELS), via_batch(BOUNDARY_PANELS)):
+        assert (patterns, workup) == (want[0], want[2]), panel
+
+
+def test_cached_matches_scalar():
+    for _ in range(2):              # the second pass is served from the cache
+        for panel in BOUNDARY_PANELS:
+            assert interpret_cbc_cached(*panel) == interpret_cbc(*panel), panel
+
+
+def test_stream_matches_scalar():
+    for panel, want, doc in zip(BOUNDARY_PANELS, expected(BOUNDARY_PANELS),
+                                via_stream(BOUNDARY_PANELS)):
+        assert doc["status"] == "ok", panel
+        assert doc["patterns"] == labels(want[0]), panel
+        assert doc["workup"] == [item["label"] for item in want[2]], panel
+
+
+def test_hl7_matches_scalar():
+    results, stats = via_hl7(BOUNDARY_PANELS)
+    assert not stats.malformed
+    for i, (panel, want) in enumerate(zip(BOUNDARY_PANELS, expected(BOUNDARY_PANELS))):
+        assert results[f"MSG{i:06d}"] == (want[0], want[2]), panel
+
+
+def test_age_bands_and_labs(age_profiles):
+    cases = list(itertools.product(BOUNDARY_PANELS[::7], AGES, LABS))
+    panels = [panel for panel, _, _ in cases]
+    ages = [age for _, age, _ in cases]
+    labs = [lab for _, _, lab in cases]
+    want = expected(panels, ages, labs)
+
+    for case, w, got in zip(cases, want, via_batch(panels, ages, labs)):
+        assert got == (w[0], w[2]), case
+    for case, w, doc in zip(cases, want, via_stream(panels, ages, labs)):
+        assert doc["patterns"] == labels(w[0]), case
+        assert doc["workup"] == [item["label"] for item in w[2]], case
+    for case, w in zip(cases, want):
+        assert interpret_cbc_cached(*case[0], case[1], case[2]) == w, case
+
+
+def test_age_bands_change_results(age_profiles):
+    # Guards the test above against profiles that never take effect.
+    panel = (11.95, 90, 8.0, 60, 200, "Female")
+    assert labels(interpret_cbc(*panel)[0]) == ["Normocytic Anaemia"]
+    assert labels(interpret_cbc(*panel, 1.0)[0]) == ["CBC Within Normal Limits"]
+    assert labels(interpret_cbc(*panel, None, "north")[0]) == ["CBC Within Normal Limits"]
+
+
+# ──────────────────────────────────────────────
+# NON-FINITE VALUES
+# ──────────────────────────────────────────────
+
+def test_non_finite_in_memory_paths_agree():
+    want = expected(NON_FINITE_PANELS)
+    for panel, w, got in zip(NON_FINITE_PANELS, want, via_batch(NON_FINITE_PANELS)):
+        assert got == (w[0], w[2]), panel
+        assert interpret_cbc_cached(*panel) == w, panel
+
+
+def test_non_finite_rejected_by_stream_and_hl7():
+    assert all(doc["status"] == "invalid" for doc in via_stream(NON_FINITE_PANELS))
+    results, stats = via_hl7(NON_FINITE_PANELS)
+    assert not results
+    assert sum(stats.malformed.values()) == len(NON_FINITE_PANELS)
+
+
+# ──────────────────────────────────────────────
+# CACHE
+# ──────────────────────────────────────────────
+
+def test_cache_follows_profile_reload(tmp_path):
+    panel = (11.5, 90, 8.0, 60, 200, "Female", 40.0, "north")
+    path = tmp_path / "profiles.json"
+    try:
+        for hgb_low in (11.0, 12.0):
+            path.write_text(json.dumps([{"lab": "north", "sex": "Female", "age_min": 18,
+                                         "age_max": None, "limits": {"hgb_low": hgb_low}}]))
+            load_profiles(str(path))
+            assert interpret_cbc_cached(*panel) == interpret_cbc(*panel)
+    finally:
+        load_profiles()